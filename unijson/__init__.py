@@ -14,6 +14,11 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-from .unijson import dump, dumps, load, loads, UniversalJSONEncoder, UniversalJSONDecoder
+from .unijson import dump, dumps, load, loads, load_path, load_mmap, UniversalJSONEncoder, UniversalJSONDecoder, \
+    LazyObject, materialize
+from .streaming import iter_dumps, iter_loads, dump_lines, load_lines, iter_items
+from .parallel import dumps_many, loads_many, dumps_parallel, dump_parallel, create_executor
+from .stats import CodecStats
+from .codec import Codec
 
 __version__ = "1.0.0"
@@ -0,0 +1,228 @@
+"""
+Copyright (c) 2018 Bastien Pietropaoli
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+asyncio versions of `dump()` / `load()` working with `asyncio.StreamWriter` /
+`asyncio.StreamReader`. Requires Python 3.6+, hence not imported by default:
+    `from unijson import aio`
+"""
+
+import asyncio, functools
+
+from .unijson import dumps, loads, UniversalJSONEncoder, UniversalJSONDecoder
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# ---------------------
+# Single JSON documents:
+# ---------------------
+
+
+async def dump(obj, writer, executor=None, chunk_size=65536, encoding="utf-8", **kwargs):
+    """
+    Serialise a given object into a JSON formatted stream without blocking the event
+    loop for the whole serialisation: the JSON string is written chunk by chunk and
+    the control is given back to the event loop after each chunk (waiting for the
+    stream to be drained if its buffer is full).
+    Args:
+        obj (object): The object to serialise.
+        writer (asyncio.StreamWriter): The stream to write to (or any object with
+            a .write() method and a .drain() coroutine).
+        executor (concurrent.futures.Executor): If provided, the object is serialised
+            in this executor instead of the event loop. Use `None` to serialise it
+            in the event loop (by batches of items, see
+            `UniversalJSONEncoder.iterencode_batches()`). Documents that can't be
+            serialised chunk by chunk (with a type table, columns, references, a
+            schema or a backend) are then serialised in the default executor of the
+            event loop.
+        chunk_size (int): The number of characters to write at once.
+        encoding (str): The encoding used to write to the stream.
+        kwargs (**): Keyword arguments normally passed to `unijson.dumps()`.
+    """
+    encoder = UniversalJSONEncoder(**kwargs)
+    if executor is not None or encoder._encodes_at_once():
+        loop = _get_running_loop()
+        chunks = (await loop.run_in_executor(executor, functools.partial(dumps, obj, **kwargs)),)
+    else:
+        chunks = encoder.iterencode_batches(obj)
+
+    size, buf = 0, []
+    for chunk in chunks:
+        buf.append(chunk)
+        size += len(chunk)
+        if size >= chunk_size:
+            s = "".join(buf)
+            end = len(s) - len(s) % chunk_size
+            for i in range(0, end, chunk_size):
+                writer.write(s[i:i + chunk_size].encode(encoding))
+                await _drain(writer)
+            size, buf = len(s) - end, [s[end:]]
+    if size:
+        writer.write("".join(buf).encode(encoding))
+        await _drain(writer)
+
+
+async def load(reader, executor=None, encoding="utf-8", **kwargs):
+    """
+    Deserialise a JSON formatted stream into a Python object. The whole stream is read
+    (until EOF) before being decoded.
+    Args:
+        reader (asyncio.StreamReader): The stream to read from.
+        executor (concurrent.futures.Executor): If provided, the JSON document is
+            deserialised in this executor instead of the event loop.
+        encoding (str): The encoding of the stream.
+        kwargs (**): Keyword arguments normally passed to `unijson.loads()`.
+    Return:
+        object - A Python object corresponding to the JSON document.
+    """
+    s = (await reader.read()).decode(encoding)
+    if executor is None:
+        return loads(s, **kwargs)
+    loop = _get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(loads, s, **kwargs))
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# -----------------------------------------
+# Newline-delimited JSON (one object/line):
+# -----------------------------------------
+
+
+async def dump_lines(objs, writer, encoding="utf-8", **kwargs):
+    """
+    Serialise the given objects into a newline-delimited JSON stream (one JSON object
+    per line), waiting for the stream to be drained after each line.
+    Args:
+        objs (iterable): The objects to serialise.
+        writer (asyncio.StreamWriter): The stream to write to (or any object with
+            a .write() method and a .drain() coroutine).
+        encoding (str): The encoding used to write to the stream.
+        kwargs (**): Keyword arguments normally passed to `unijson.dumps()` except
+            for `indent`.
+    Return:
+        int - The number of objects written.
+    """
+    if kwargs.get("indent") is not None:
+        raise ValueError("Newline-delimited JSON can't be indented.")
+    encode = UniversalJSONEncoder(**kwargs).encode
+    n = 0
+    for obj in objs:
+        writer.write((encode(obj) + "\n").encode(encoding))
+        n += 1
+        await _drain(writer)
+    return n
+
+
+async def load_lines(reader, executor=None, batch_size=256, encoding="utf-8", **kwargs):
+    """
+    Deserialise a newline-delimited JSON stream (one JSON object per line), reading it
+    line by line. Empty lines are ignored. Lines can be longer than the limit of the
+    stream reader.
+    Args:
+        reader (asyncio.StreamReader): The stream to read from.
+        executor (concurrent.futures.Executor): If provided, the lines are deserialised
+            in this executor instead of the event loop, by batches.
+        batch_size (int): The number of lines deserialised at once in the executor.
+        encoding (str): The encoding of the stream.
+        kwargs (**): Keyword arguments normally passed to `unijson.loads()`.
+    Return:
+        async generator - The Python objects found in the stream, in order.
+    """
+    if executor is None:
+        decode = UniversalJSONDecoder(**kwargs).decode
+        while True:
+            line = await _readline(reader)
+            if not line:
+                return
+            line = line.decode(encoding)
+            if line.strip():
+                yield decode(line)
+
+    loop = _get_running_loop()
+    eof = False
+    while not eof:
+        lines = []
+        while len(lines) < batch_size:
+            line = await _readline(reader)
+            if not line:
+                eof = True
+                break
+            lines.append(line.decode(encoding))
+        if lines:
+            for o in await loop.run_in_executor(executor, functools.partial(_loads_lines, lines, kwargs)):
+                yield o
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# --------
+# Helpers:
+# --------
+
+
+def _get_running_loop():
+    """Get the event loop running the current coroutine."""
+    if hasattr(asyncio, "get_running_loop"):
+        return asyncio.get_running_loop()
+    return asyncio.get_event_loop() # Python 3.6
+
+
+async def _readline(reader):
+    """
+    Read a line from a stream, even if it's longer than the limit of the stream reader
+    (`reader.readline()` raises a ValueError in that case).
+    Args:
+        reader (asyncio.StreamReader): The stream to read from.
+    Return:
+        bytes - The line (with its line break), empty at the end of the stream.
+    """
+    parts = []
+    while True:
+        try:
+            parts.append(await reader.readuntil(b"\n"))
+        except asyncio.IncompleteReadError as e:
+            parts.append(e.partial) # Last line, without line break
+        except asyncio.LimitOverrunError as e:
+            # The part of the line already buffered is taken to read the rest:
+            parts.append(await reader.readexactly(e.consumed))
+            continue
+        return b"".join(parts)
+
+
+def _loads_lines(lines, kwargs):
+    """Deserialise a batch of lines with a single decoder (in an executor)."""
+    decode = UniversalJSONDecoder(**kwargs).decode
+    return [decode(line) for line in lines if line.strip()]
+
+
+async def _drain(writer):
+    """
+    Wait for the stream to be drained if its buffer is full and give the control back
+    to the event loop (which `drain()` alone doesn't do if the buffer isn't full).
+    Args:
+        writer (asyncio.StreamWriter): The stream written to.
+    """
+    await writer.drain()
+    await asyncio.sleep(0)
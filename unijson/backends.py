@@ -0,0 +1,302 @@
+"""
+Copyright (c) 2018 Bastien Pietropaoli
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+The JSON libraries the universal encoder / decoder can run on top of (see the
+`backend` option of `UniversalJSONEncoder` / `UniversalJSONDecoder`):
+ - "json": The standard library (default).
+ - "simplejson": simplejson, if installed.
+ - "orjson": orjson, if installed.
+ - "auto": The fastest library installed giving the same results as the standard
+   library for the options used.
+"""
+
+from __future__ import absolute_import
+import importlib, json
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# ---------
+# Backends:
+# ---------
+
+
+class Backend(object):
+    """
+    A JSON library the universal encoder / decoder can use to write / parse the
+    documents while still encoding / decoding the objects themselves. To add one,
+    subclass it and register an instance with `register_backend()`.
+    """
+    # The name of the backend (the value of the `backend` option):
+    name = None
+    # The module to import to use the backend (None if there is nothing to import):
+    module = None
+    # Whether the documents written are decoded to the same objects as the documents
+    # written with the standard library (required to be picked automatically):
+    exact_encoding = True
+
+    def available(self):
+        """
+        Check whether the backend can be used.
+        Return:
+            bool - True if its module can be imported.
+        """
+        installed = self.__dict__.get("_installed")
+        if installed is None:
+            installed = True
+            if self.module is not None:
+                try:
+                    importlib.import_module(self.module)
+                except ImportError:
+                    installed = False
+            self._installed = installed # Only checked once
+        return installed
+
+
+    def bind_encoder(self, encoder):
+        """
+        Create the function writing the documents of an encoder.
+        Args:
+            encoder (UniversalJSONEncoder): The encoder, configured with its options.
+                Its `default()` method encodes the objects not natively supported.
+        Return:
+            function or None - The function taking an object and returning its JSON
+                string, or None to use the standard library.
+        Raises:
+            ValueError - If the options of the encoder are not supported.
+        """
+        raise NotImplementedError()
+
+
+    def bind_decoder(self, decoder):
+        """
+        Create the function parsing the documents of a decoder.
+        Args:
+            decoder (UniversalJSONDecoder): The decoder, configured with its options.
+                Its `universal_decoder()` method must be called on every JSON object,
+                innermost first.
+        Return:
+            function or None - The function taking a JSON string and returning the
+                decoded object, or None to use the standard library.
+        Raises:
+            ValueError - If the options of the decoder are not supported.
+        """
+        raise NotImplementedError()
+
+
+class JSONBackend(Backend):
+    """The standard library (json module)."""
+    name = "json"
+
+    def bind_encoder(self, encoder):
+        return None
+
+    def bind_decoder(self, decoder):
+        return None
+
+
+class SimpleJSONBackend(Backend):
+    """
+    simplejson, configured to write the same documents as the standard library
+    (tuples, named tuples and decimals included). Supports all the options of the
+    standard library. Usually not faster than the standard library with its C
+    accelerators, hence never picked automatically.
+    """
+    name = "simplejson"
+    module = "simplejson"
+
+    def bind_encoder(self, encoder):
+        import simplejson
+        return simplejson.JSONEncoder(skipkeys=encoder.skipkeys, ensure_ascii=encoder.ensure_ascii,
+                                      check_circular=encoder.check_circular, allow_nan=encoder.allow_nan,
+                                      sort_keys=encoder.sort_keys, indent=encoder.indent,
+                                      separators=(encoder.item_separator, encoder.key_separator),
+                                      default=encoder.default, use_decimal=False, namedtuple_as_object=False,
+                                      tuple_as_array=True, iterable_as_array=False, for_json=False).encode
+
+    def bind_decoder(self, decoder):
+        import simplejson
+        return simplejson.JSONDecoder(object_hook=decoder.universal_decoder, parse_float=decoder.parse_float,
+                                      parse_int=decoder.parse_int, parse_constant=decoder.parse_constant,
+                                      strict=decoder.strict, object_pairs_hook=decoder.object_pairs_hook).decode
+
+
+# Used to find numbers that may not fit in 64 bits (19 digits or more) quickly:
+# the digits are all replaced with "0" in the UTF-8 document before searching.
+_DIGITS = bytes.maketrans(b"123456789", b"000000000") if hasattr(bytes, "maketrans") else None
+_LONG_NUMBER = b"0" * 19
+
+
+class OrjsonBackend(Backend):
+    """
+    orjson, much faster than the standard library. orjson can't call a function on
+    every JSON object while parsing, so it only parses the documents without any
+    object to rebuild (no key starting with "__"). The others, as well as the
+    documents it rejects (e.g. with NaN), are parsed with the standard library.
+    The documents are written by orjson with the following differences:
+     - They are compact (no spaces) and non-ASCII characters are not escaped.
+       Only `indent=2` is supported for indentation.
+     - NaN and infinities are written as null.
+     - Enums and UUIDs are written as their value (like dataclasses and datetimes,
+       they are encoded by the universal encoder with the standard library).
+    The documents with numbers of 19 digits or more are parsed with the standard
+    library as well (orjson turns integers over 64 bits into floats).
+    Because of the latter two, it's only picked automatically for decoding.
+    Documents orjson can't write (e.g. integers over 64 bits) are written with the
+    standard library.
+    """
+    name = "orjson"
+    module = "orjson"
+    exact_encoding = False
+
+    def bind_encoder(self, encoder):
+        if encoder.skipkeys or encoder.indent not in (None, 2):
+            raise ValueError("orjson doesn't support skipkeys nor indentations other than 2.")
+        import orjson
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if encoder.indent == 2:
+            option |= orjson.OPT_INDENT_2
+        if encoder.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        dumps, error, encode_object = orjson.dumps, orjson.JSONEncodeError, encoder.default
+        # Named tuples are passed to default() by orjson, they don't have to be found:
+        named_tuples, encoder._find_named_tuples = encoder._named_tuples, False
+
+        def default(o):
+            # Subclasses of tuple and float are native for the standard library (named
+            # tuples aside with the named_tuples option, objects then):
+            if isinstance(o, tuple) and not (named_tuples and hasattr(type(o), "_fields")):
+                return list(o)
+            if isinstance(o, float):
+                return float(o)
+            return encode_object(o)
+
+        def encode(o):
+            try:
+                return dumps(o, default=default, option=option).decode("utf-8")
+            except error:
+                pass
+            # Written (or the error raised) by the standard library, from scratch:
+            if encoder._refs is not None:
+                encoder._refs = {}
+            if not named_tuples:
+                return "".join(json.JSONEncoder.iterencode(encoder, o, True))
+            encoder._find_named_tuples = True
+            try:
+                return "".join(json.JSONEncoder.iterencode(encoder, encoder._encode_named_tuples(o), True))
+            finally:
+                encoder._find_named_tuples = False
+        return encode
+
+    def bind_decoder(self, decoder):
+        if decoder.parse_float is not float or decoder.parse_int is not int or decoder.object_pairs_hook is not None:
+            raise ValueError("orjson doesn't support parse_float, parse_int and object_pairs_hook.")
+        import orjson
+        loads, error = orjson.loads, orjson.JSONDecodeError
+
+        def decode(s):
+            # Documents without any key starting with "__", even escaped, only hold
+            # native types (see `UniversalJSONDecoder.universal_decoder()`). orjson
+            # turns integers over 64 bits into floats, numbers that long are avoided:
+            if '"__' not in s and "\\u005" not in s and \
+                    _LONG_NUMBER not in s.encode("utf-8", "surrogatepass").translate(_DIGITS):
+                try:
+                    return loads(s)
+                except error:
+                    pass # Errors and extensions (NaN...) handled by the standard library
+            return json.JSONDecoder.decode(decoder, s)
+        return decode
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# ---------------------
+# Selection of backends:
+# ---------------------
+
+
+# The backends per name:
+_backends = {}
+# The order in which the backends are considered by "auto" (fastest first):
+_preferences = ["orjson", "json", "simplejson"]
+
+
+def register_backend(backend, preference=None):
+    """
+    Register a backend, replacing the backend with the same name if there is one.
+    Args:
+        backend (Backend): The backend.
+        preference (int): The position of the backend in the order in which they are
+            considered by "auto" (0 for first). Default: None (last).
+    """
+    if not isinstance(backend, Backend) or not backend.name:
+        raise ValueError("Expected a Backend with a name, a %s was passed instead." % type(backend))
+    _backends[backend.name] = backend
+    if backend.name in _preferences:
+        _preferences.remove(backend.name)
+    _preferences.insert(len(_preferences) if preference is None else preference, backend.name)
+
+
+def available_backends():
+    """
+    Give the backends that can be used.
+    Return:
+        list of str - The names of the backends installed, in the order in which they
+            are considered by "auto".
+    """
+    return [name for name in _preferences if _backends[name].available()]
+
+
+def bind(backend, coder):
+    """
+    Create the function writing / parsing the documents of an encoder / decoder.
+    Args:
+        backend (str or Backend): The backend (or its name) or "auto".
+        coder (UniversalJSONEncoder or UniversalJSONDecoder): The encoder / decoder.
+    Return:
+        function or None - The function, None to use the standard library.
+    Raises:
+        ValueError - If the backend is unknown, not installed or doesn't support the
+            options of the encoder / decoder.
+    """
+    encoding = isinstance(coder, json.JSONEncoder)
+    if backend == "auto":
+        for name in _preferences:
+            b = _backends[name]
+            if (encoding and not b.exact_encoding) or not b.available():
+                continue
+            try:
+                return b.bind_encoder(coder) if encoding else b.bind_decoder(coder)
+            except ValueError:
+                continue
+        return None
+
+    if not isinstance(backend, Backend):
+        if backend not in _backends:
+            raise ValueError("Unknown backend %s, expected one of: %s." % (backend, ", ".join(sorted(_backends))))
+        backend = _backends[backend]
+    if not backend.available():
+        raise ValueError("Backend %s is not installed." % backend.name)
+    return backend.bind_encoder(coder) if encoding else backend.bind_decoder(coder)
+
+
+for _backend in (JSONBackend(), SimpleJSONBackend(), OrjsonBackend()):
+    _backends[_backend.name] = _backend
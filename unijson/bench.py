@@ -0,0 +1,560 @@
+"""
+Copyright (c) 2018 Bastien Pietropaoli
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Benchmarks for the unijson package. Run them with:
+    `python -m unijson.bench`
+The results can also be saved as JSON to compare releases:
+    `python -m unijson.bench --json results.json`
+"""
+
+from __future__ import absolute_import, print_function
+import argparse, json, os, platform, subprocess, sys, timeit
+import datetime
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# --------
+# Helpers:
+# --------
+
+
+def _best_time(func, repeat=5, number=1):
+    """
+    Measure the execution time of a function.
+    Args:
+        func (function): The function to time (takes no argument).
+        repeat (int): The number of measures to take.
+        number (int): The number of calls per measure.
+    Return:
+        float - The best time measured for a single call (in seconds).
+    """
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def _peak_memory(func):
+    """
+    Measure the peak memory allocated while running a function.
+    Args:
+        func (function): The function to run (takes no argument).
+    Return:
+        int - The peak memory allocated (in bytes), or None if `tracemalloc` is
+            not available (Python < 3.4).
+    """
+    try:
+        import tracemalloc
+    except ImportError:
+        return None
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _measure(payload, dumps_kwargs=None, loads_kwargs=None, dumps=None, loads=None):
+    """
+    Measure how a payload is encoded and decoded.
+    Args:
+        payload (object): The object to encode.
+        dumps_kwargs (dict): The keyword arguments to pass to `dumps()`.
+        loads_kwargs (dict): The keyword arguments to pass to `loads()`.
+        dumps (function): The encoding function. Default: `unijson.dumps()`.
+        loads (function): The decoding function. Default: `unijson.loads()`.
+    Return:
+        dict - The time taken to encode and decode the payload (in seconds), the
+            size of the JSON string and the peak memory used to encode and decode
+            it (in bytes).
+    """
+    import unijson
+    dumps = dumps or unijson.dumps
+    loads = loads or unijson.loads
+    dumps_kwargs = dumps_kwargs or {}
+    loads_kwargs = loads_kwargs or {}
+
+    s = dumps(payload, **dumps_kwargs)
+    return {"encode": _best_time(lambda: dumps(payload, **dumps_kwargs)),
+            "decode": _best_time(lambda: loads(s, **loads_kwargs)),
+            "size": len(s),
+            "encode_memory": _peak_memory(lambda: dumps(payload, **dumps_kwargs)),
+            "decode_memory": _peak_memory(lambda: loads(s, **loads_kwargs))}
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# ------------
+# Import time:
+# ------------
+
+
+# Prints the time taken to import the given module in a fresh interpreter:
+_IMPORT_SCRIPT = "import time; t = time.time(); import %s; print(time.time() - t)"
+
+
+def bench_import(module="unijson", repeat=10):
+    """
+    Measure the time taken to import a module in a fresh interpreter. Each run
+    uses a new process so that nothing is already cached in `sys.modules`.
+    Args:
+        module (str): The name of the module to import.
+        repeat (int): The number of interpreters to start.
+    Return:
+        float - The best import time measured (in seconds).
+    """
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (root, env.get("PYTHONPATH")) if p)
+
+    timings = []
+    for _ in range(repeat):
+        out = subprocess.check_output([sys.executable, "-c", _IMPORT_SCRIPT % module], env=env)
+        timings.append(float(out.decode().strip()))
+    return min(timings)
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# ---------------
+# Native objects:
+# ---------------
+
+
+def bench_overhead(n=10000):
+    """
+    Compare the standard `json` module with unijson on a payload made of native
+    JSON types only, which measures the overhead of unijson itself.
+    Args:
+        n (int): The number of records (small dictionaries) in the payload.
+    Return:
+        dict - The measures for each library (see `_measure()`).
+    """
+    payload = [{"id": i, "name": "r%d" % i, "value": i * 0.5, "tags": ["a", "b"], "flag": i % 2 == 0}
+               for i in range(n)]
+    return {"json": _measure(payload, dumps=json.dumps, loads=json.loads),
+            "unijson": _measure(payload)}
+
+
+def bench_structures(n=100000, depth=200):
+    """
+    Measure the encoding and decoding of large lists and deeply nested structures.
+    Args:
+        n (int): The number of items in the large lists.
+        depth (int): The number of nested levels.
+    Return:
+        dict - The measures for each structure (see `_measure()`).
+    """
+    nested = None
+    for i in range(depth):
+        nested = {"level": i, "child": [nested]}
+
+    results = {}
+    for name, payload in (("list_of_ints", list(range(n))),
+                          ("list_of_floats", [i * 0.1 for i in range(n)]),
+                          ("list_of_strings", ["item %d" % i for i in range(n)]),
+                          ("deep_nesting", [nested] * 50)):
+        results[name] = _measure(payload)
+    return results
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# ---------------
+# Custom classes:
+# ---------------
+
+
+class Record(object):
+    """Small custom object used in the benchmarks, encoded through its __dict__."""
+    def __init__(self, name, value, flag):
+        self.name = name
+        self.value = value
+        self.flag = flag
+
+
+class EncodedRecord(Record):
+    """Small custom object defining its own encoding / decoding methods."""
+    def __json_encode__(self):
+        return {"name": self.name, "value": self.value, "flag": self.flag}
+
+    @staticmethod
+    def __json_decode__(d):
+        return EncodedRecord(d["name"], d["value"], d["flag"])
+
+
+class RegisteredRecord(Record):
+    """Small custom object using registered encoding / decoding functions."""
+    pass
+
+
+def json_encode_registered_record(o):
+    """Encoding function registered for `RegisteredRecord`."""
+    return {"name": o.name, "value": o.value, "flag": o.flag}
+
+
+def json_decode_registered_record(d):
+    """Decoding function registered for `RegisteredRecord`."""
+    return RegisteredRecord(d["name"], d["value"], d["flag"])
+
+
+def _typed_records():
+    """
+    Give the dataclass used in the benchmarks (see `_records()`), defined here only
+    since dataclasses require Python 3.7+.
+    Return:
+        type - The dataclass.
+    """
+    from unijson import bench
+    if not hasattr(bench, "TypedRecord"):
+        import dataclasses, typing
+        @dataclasses.dataclass
+        class TypedRecord(object):
+            """Small dataclass used in the benchmarks, with a nested typed field."""
+            name: str
+            value: float
+            flag: bool
+            children: typing.List["TypedRecord"] = dataclasses.field(default_factory=list)
+        TypedRecord.__module__ = bench.__name__
+        TypedRecord.__qualname__ = "TypedRecord"
+        bench.TypedRecord = TypedRecord
+    return bench.TypedRecord
+
+
+def _records():
+    """
+    Give the custom classes used in the benchmarks. They're not used directly since
+    this module is `__main__` when running the benchmarks and unijson needs to find
+    them in `unijson.bench`.
+    Return:
+        module - The `unijson.bench` module.
+    """
+    import unijson
+    from unijson import bench
+    unijson.UniversalJSONEncoder.register(bench.RegisteredRecord, bench.json_encode_registered_record)
+    unijson.UniversalJSONDecoder.register(bench.RegisteredRecord, bench.json_decode_registered_record)
+    return bench
+
+
+def bench_custom_classes(n=10000):
+    """
+    Compare the different ways custom objects can be encoded / decoded: through
+    their `__dict__`, their own `__json_encode__()` / `__json_decode__()` methods or
+    registered functions.
+    Args:
+        n (int): The number of custom objects in the payload.
+    Return:
+        dict - The measures for each way (see `_measure()`).
+    """
+    bench = _records()
+    results = {}
+    for name, cls in (("__dict__", bench.Record), ("__json_encode__", bench.EncodedRecord),
+                      ("registered", bench.RegisteredRecord)):
+        results[name] = _measure([cls("r%d" % i, i * 0.5, i % 2 == 0) for i in range(n)])
+    return results
+
+
+def bench_schemas(n=10000):
+    """
+    Compare dataclasses encoded with their type tags and with a schema (see
+    `unijson.schema`).
+    Args:
+        n (int): The number of dataclasses in the payload (each with a child).
+    Return:
+        dict - The measures for each mode (see `_measure()`).
+    """
+    import typing
+    TypedRecord = _typed_records()
+    payload = [TypedRecord("r%d" % i, i * 0.5, i % 2 == 0, [TypedRecord("c%d" % i, 0.0, True)]) for i in range(n)]
+    schema = {"schema": typing.List[TypedRecord]}
+    return {"tags": _measure(payload), "schema": _measure(payload, schema, schema)}
+
+
+def bench_compact_formats(n=10000):
+    """
+    Compare the default format with the type table and the columnar formats on a
+    list of small objects of the same class.
+    Args:
+        n (int): The number of small objects in the payload.
+    Return:
+        dict - The measures for each mode (see `_measure()`).
+    """
+    bench = _records()
+    payload = [bench.Record("r%d" % i, i * 0.5, i % 2 == 0) for i in range(n)]
+
+    results = {}
+    for mode, kwargs in (("default", {}), ("type_table", {"type_table": True}), ("columnar", {"columnar": True}),
+                         ("type_table+columnar", {"type_table": True, "columnar": True})):
+        results[mode] = _measure(payload, kwargs)
+    return results
+
+
+def bench_references(n=1000, shared=10):
+    """
+    Compare the default format with the references on a list of objects sharing
+    a few other objects.
+    Args:
+        n (int): The number of objects in the payload.
+        shared (int): The number of objects shared by all the others.
+    Return:
+        dict - The measures for each mode (see `_measure()`).
+    """
+    bench = _records()
+    common = [bench.Record("shared%d" % i, list(range(20)), True) for i in range(shared)]
+    payload = [bench.Record("r%d" % i, common, i % 2 == 0) for i in range(n)]
+    return {"default": _measure(payload), "references": _measure(payload, {"references": True})}
+
+
+def bench_binary(n=10000):
+    """
+    Compare the JSON and the binary formats on a list of small objects.
+    Args:
+        n (int): The number of small objects in the payload.
+    Return:
+        dict - The measures for each format (see `_measure()`).
+    """
+    from unijson.binary import dumpb, loadb
+    bench = _records()
+    payload = [bench.Record("r%d" % i, [i, i * 0.5], i % 2 == 0) for i in range(n)]
+    return {"json": _measure(payload), "binary": _measure(payload, dumps=dumpb, loads=loadb)}
+
+
+def bench_arrays(n=100000):
+    """
+    Compare a list of floats with the same numbers in an array (from module array)
+    and in a NumPy array (if installed), encoded as raw buffers.
+    Args:
+        n (int): The number of floats in the payload.
+    Return:
+        dict - The measures for each container (see `_measure()`).
+    """
+    import array
+    payload = [i * 0.5 for i in range(n)]
+    results = {"list": _measure(payload), "array": _measure(array.array("d", payload))}
+    try:
+        import numpy
+    except ImportError:
+        return results
+    results["numpy"] = _measure(numpy.array(payload))
+    return results
+
+
+def bench_small_documents(n=10000):
+    """
+    Compare `unijson.dumps()` / `unijson.loads()`, which create a new encoder /
+    decoder for every document, with a `Codec` reusing them, on many small documents.
+    Args:
+        n (int): The number of small documents.
+    Return:
+        dict - The measures for each way, for all the documents (see `_measure()`).
+    """
+    import unijson
+    bench = _records()
+    codec = unijson.Codec()
+    payload = [bench.Record("r%d" % i, i * 0.5, i % 2 == 0) for i in range(n)]
+
+    def measure(dumps, loads):
+        return _measure(payload, dumps=lambda docs: "\n".join([dumps(d) for d in docs]),
+                        loads=lambda s: [loads(line) for line in s.split("\n")])
+    return {"functions": measure(unijson.dumps, unijson.loads), "codec": measure(codec.dumps, codec.loads)}
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# ---------
+# Backends:
+# ---------
+
+
+def bench_backends(n=10000):
+    """
+    Compare the JSON libraries installed (see `unijson.backends`) on a payload of
+    native types only and on a payload of custom objects.
+    Args:
+        n (int): The number of records (or objects) in each payload.
+    Return:
+        dict - The measures for each backend and payload (see `_measure()`).
+    """
+    from unijson.backends import available_backends
+    bench = _records()
+    payloads = (("native", [{"id": i, "name": "r%d" % i, "value": i * 0.5, "tags": ["a", "b"]} for i in range(n)]),
+                ("objects", [bench.Record("r%d" % i, i * 0.5, i % 2 == 0) for i in range(n)]))
+
+    results = {}
+    for backend in available_backends() + ["auto"]:
+        for name, payload in payloads:
+            results["%s/%s" % (backend, name)] = _measure(payload, {"backend": backend}, {"backend": backend})
+    return results
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# ------------
+# Compression:
+# ------------
+
+
+def bench_compression(n=100000):
+    """
+    Compare compressing a document while it's written / decompressing it while it's
+    read (`compression` option) with compressing / decompressing the whole JSON
+    string afterwards, for each format.
+    Args:
+        n (int): The number of records in the payload.
+    Return:
+        dict - The measures for each way and format (see `_measure()`), the size
+            being the size of the compressed document.
+    """
+    import io, gzip
+    import unijson
+    payload = [{"id": i, "name": "r%d" % i, "value": i * 0.5, "tags": ["a", "b"]} for i in range(n)]
+
+    def dumps(o, **kwargs):
+        fp = io.BytesIO()
+        unijson.dump(o, fp, **kwargs)
+        return fp.getvalue()
+
+    results = {"afterwards/gzip": _measure(payload, dumps=lambda o: gzip.compress(unijson.dumps(o).encode("utf-8"), 6),
+                                           loads=lambda b: unijson.loads(gzip.decompress(b)))}
+    for compression in ("gzip", "zlib", "bz2", "lzma"):
+        results["streaming/" + compression] = _measure(payload, {"compression": compression}, {"compression": "auto"},
+                                                       dumps=dumps, loads=lambda b, **kw: unijson.load(io.BytesIO(b), **kw))
+    return results
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# -----------------
+# Datetimes codecs:
+# -----------------
+
+
+def bench_datetimes(n=10000):
+    """
+    Compare the default and the compact ISO 8601 codecs for datetimes and times,
+    using several timezones.
+    Args:
+        n (int): The number of datetimes (and times) in the payload.
+    Return:
+        dict - The measures for each mode (see `_measure()`).
+    """
+    import pytz
+    zones = [pytz.timezone(tz) for tz in ("Europe/Dublin", "America/New_York", "Asia/Kolkata", "UTC")]
+    start = datetime.datetime(2018, 8, 13, 18, 53, 42)
+    payload = []
+    for i in range(n):
+        d = zones[i % len(zones)].localize(start + datetime.timedelta(seconds=i))
+        payload.append(d)
+        payload.append(d.timetz())
+
+    return {"default": _measure(payload), "iso": _measure(payload, {"iso_datetimes": True})}
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# All the benchmarks with their titles, in the order they are run:
+BENCHMARKS = (("Native objects", bench_overhead),
+              ("Structures", bench_structures),
+              ("Custom classes", bench_custom_classes),
+              ("Schemas", bench_schemas),
+              ("Compact formats", bench_compact_formats),
+              ("Shared objects", bench_references),
+              ("Binary format", bench_binary),
+              ("Arrays", bench_arrays),
+              ("Small documents", bench_small_documents),
+              ("Backends", bench_backends),
+              ("Compression", bench_compression),
+              ("Datetimes", bench_datetimes))
+
+
+def run():
+    """
+    Run all the benchmarks.
+    Return:
+        dict - The results of all the benchmarks and information about the
+            environment they were run in, ready to be dumped as JSON.
+    """
+    import unijson
+    results = {"environment": {"python": platform.python_version(),
+                               "implementation": platform.python_implementation(),
+                               "platform": platform.platform(),
+                               "unijson": unijson.__version__},
+               "import": dict((module, bench_import(module)) for module in ("json", "unijson")),
+               "benchmarks": {}}
+    for title, bench in BENCHMARKS:
+        results["benchmarks"][title] = bench()
+    return results
+
+
+def _format_memory(size):
+    """Format a memory size (in bytes) for the table printed by `main()`."""
+    return "%8.2f MB" % (size / 1048576.0) if size is not None else "%11s" % "n/a"
+
+
+def main(argv=None):
+    """
+    Run all the benchmarks, print their results and optionally save them as JSON.
+    Args:
+        argv (list of str): The command line arguments. Default: `sys.argv[1:]`.
+    """
+    parser = argparse.ArgumentParser(prog="python -m unijson.bench", description="Benchmarks for unijson.")
+    parser.add_argument("--json", metavar="FILE", help="Save the results as JSON in FILE ('-' for stdout).")
+    args = parser.parse_args(argv)
+
+    results = run()
+    if args.json == "-":
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        print()
+        return
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    print("Import time:")
+    for module, t in sorted(results["import"].items()):
+        print("  %-20s %8.2f ms" % (module, t * 1000))
+    for title, _ in BENCHMARKS:
+        print("%s (encode / decode / size / encode memory / decode memory):" % title)
+        for mode, r in sorted(results["benchmarks"][title].items()):
+            print("  %-20s %8.2f ms %8.2f ms %10d B %s %s" % (mode, r["encode"] * 1000, r["decode"] * 1000, r["size"],
+                                                             _format_memory(r["encode_memory"]),
+                                                             _format_memory(r["decode_memory"])))
+
+
+if __name__ == "__main__":
+    main()
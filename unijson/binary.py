@@ -0,0 +1,281 @@
+"""
+Copyright (c) 2018 Bastien Pietropaoli
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+A compact binary format for internal traffic, encoding objects exactly like
+`unijson.dumps()` does (same registered functions, `__json_encode__()` /
+`__json_decode__()` methods and metadata) but with binary numbers and lengths and
+with repeated strings written only once. Requires Python 3.8+, hence not imported
+by default:
+    `from unijson.binary import dumpb, loadb`
+
+The format is the 4 bytes b"UJB\\x01" followed by a pickle (protocol 5) made only
+of native types (None, bool, int, float, str, bytes, bytearray, list, tuple, set,
+frozenset, dict) and of the dictionaries returned by the universal encoder, marked
+to be rebuilt by the universal decoder. The native types are written and read by
+the C implementation of pickle without calling back into Python, which is what
+makes the format faster than JSON: unlike JSON, tuples, sets and frozensets stay as
+they are and the keys of dictionaries keep their types. The subclasses of the native
+types are written as the native types (e.g. an OrderedDict as a dict, an IntEnum as
+an int), like with JSON. The pickle is read with an unpickler that can't load any
+class or function but the universal decoder (see "Restricting Globals" in the
+documentation of pickle). That isn't enough on its own: the opcodes adding items to
+lists, dictionaries and sets or setting the state of an object (APPEND, SETITEM,
+ADDITEMS, BUILD...) would call the methods of any object on the stack, including
+the objects rebuilt by the universal decoder. A pickle holding objects is therefore
+loaded twice: first with placeholders instead of the objects, on which all those
+opcodes fail, and only then with the universal decoder (see `loadb()`). The C
+unpickler does both passes, without calling back into Python for the native values.
+"""
+
+import io, pickle
+
+from .unijson import UniversalJSONEncoder, UniversalJSONDecoder, LazyObject, _is_named_tuple, _replace_references
+
+
+# Beginning of every document (format version 1):
+MAGIC = b"UJB\x01"
+
+# The version of the pickle protocol used (5 for bytearrays, older ones reduce them):
+_PROTOCOL = 5
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# ----------------------------------------
+# API similar to `dumps()` / `loads()`:
+# ----------------------------------------
+
+
+def dumpb(obj, **kwargs):
+    """
+    Serialise a given object into the unijson binary format. The objects are encoded
+    like `unijson.dumps()` would encode them. Unlike JSON, tuples, sets, frozensets,
+    bytes and the keys of dictionaries keep their types (the functions registered for
+    them aren't used) and a list / dictionary found several times is only encoded
+    once (and shared once decoded).
+    Args:
+        obj (object): The object to serialise.
+        kwargs (**): Keyword arguments normally passed to `unijson.dumps()`. Those
+            only affecting the text output (e.g. `indent`, `skipkeys`) are ignored.
+            `type_table` and `columnar` are not supported since repeated strings are
+            already written only once.
+    Return:
+        bytes - The serialised object.
+    Raises:
+        ValueError - If `type_table` or `columnar` is requested or if a circular
+            reference is found (without the `references` option).
+        TypeError - If an object can't be encoded.
+    """
+    encoder = UniversalJSONEncoder(**kwargs)
+    if encoder.type_table or encoder.columnar:
+        raise ValueError("The binary format doesn't support type_table and columnar, strings are already "
+                         "written only once.")
+
+    f = io.BytesIO()
+    f.write(MAGIC)
+    if encoder.references:
+        encoder._refs = {}
+    try:
+        _BinaryPickler(f, encoder).dump(obj)
+    finally:
+        encoder._refs = None
+    return f.getvalue()
+
+
+def loadb(b, **kwargs):
+    """
+    Deserialise an object serialised with `dumpb()`. The objects are decoded like
+    `unijson.loads()` would decode them.
+    Args:
+        b (bytes-like object): The serialised object.
+        kwargs (**): Keyword arguments normally passed to `unijson.loads()`.
+    Return:
+        object - The deserialised object.
+    Raises:
+        ValueError - If the data is not in the unijson binary format or uses opcodes
+            on other objects than lists, dictionaries and sets.
+    """
+    f = io.BytesIO(b)
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not in the unijson binary format (or unsupported version).")
+
+    decoder = UniversalJSONDecoder(**kwargs)
+    try:
+        # Checked with placeholders first, the objects are only decoded once nothing
+        # but native containers have been modified by the pickle:
+        unpickler = _BinaryUnpickler(f, None)
+        o = unpickler.load()
+        if unpickler.marked:
+            f.seek(len(MAGIC))
+            o = _BinaryUnpickler(f, decoder).load()
+    except ValueError:
+        raise # Already explicit (e.g. a module not allowed)
+    except Exception as e: # Including the MemoryError of a length larger than the data
+        raise ValueError("Invalid unijson binary data: %s" % (e,))
+    if f.read(1):
+        raise ValueError("Extra data after the end of the object (at byte %d)." % (f.tell() - 1))
+    if decoder._unresolved:
+        o = _replace_references(o, decoder._refs)
+    return o
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# --------
+# Helpers:
+# --------
+
+
+def _object(d):
+    """
+    Marks the dictionaries returned by the universal encoder in the pickles. Never
+    called: the unpickler replaces it with the universal decoder.
+    """
+    raise RuntimeError("unijson binary data must be loaded with unijson.binary.loadb().")
+
+
+def _native(value):
+    """
+    Marks the values of the subclasses of the native types converted to the native
+    types. The unpickler returns the value as is.
+    """
+    return value
+
+
+# The native types whose subclasses are converted (with exact instances as results)
+# before the universal encoder is tried, like the JSON encoder does:
+_NATIVE_TYPES = ((str, str.__str__), (int, int.__int__), (float, float.__float__),
+                 (list, list), (tuple, tuple), (dict, dict))
+
+
+def _shared_object(d):
+    """
+    Marks the dictionaries returned by the universal encoder with the `references`
+    option (which may be references to other objects, `__ref__`, or be referred to,
+    `__id__`). Never called, like `_object()`.
+    """
+    raise RuntimeError("unijson binary data must be loaded with unijson.binary.loadb().")
+
+
+class _BinaryPickler(pickle.Pickler):
+    """Pickler encoding the objects not natively supported with the universal encoder."""
+
+    def __init__(self, f, encoder):
+        """
+        Constructor of the pickler.
+        Args:
+            f (file-like object): The binary file to write to.
+            encoder (UniversalJSONEncoder): The encoder to use.
+        """
+        pickle.Pickler.__init__(self, f, protocol=_PROTOCOL)
+        self.default = encoder.default
+        # Named tuples are passed to `reducer_override()`, they don't have to be found:
+        self.named_tuples, encoder._find_named_tuples = encoder._named_tuples, False
+        # The ids of the objects already reduced and of the values already converted to
+        # native types, to detect cycles (see `reducer_override()`):
+        self.reduced = None if encoder.references else set()
+        self.converted = set()
+
+
+    def reducer_override(self, obj):
+        """
+        Called by the pickler for the objects that are not natively supported.
+        Args:
+            obj (object): The object to pickle.
+        Return:
+            tuple - The function marking the dictionary (or the native value) and the
+                dictionary itself.
+        Raises:
+            ValueError - If the object contains itself (without the `references` option).
+        """
+        if obj is _object or obj is _shared_object or obj is _native:
+            return NotImplemented # The markers themselves are pickled by name
+        if type(obj) is LazyObject:
+            obj = obj._materialize()
+
+        # Subclasses of the native types (the exact types never get here), named tuples
+        # aside with the named_tuples option (objects, like with JSON):
+        for t, convert in _NATIVE_TYPES:
+            if isinstance(obj, t) and not (self.named_tuples and _is_named_tuple(type(obj))):
+                if id(obj) in self.converted:
+                    raise ValueError("Circular reference detected.")
+                self.converted.add(id(obj))
+                return _native, (convert(obj),)
+
+        # Objects are memoised by the pickler once reduced, they can only be reduced
+        # again while they're still being pickled, i.e. if they contain themselves:
+        if self.reduced is not None:
+            if id(obj) in self.reduced:
+                raise ValueError("Circular reference detected (see the references option).")
+            self.reduced.add(id(obj))
+            return _object, (self.default(obj),)
+        return _shared_object, (self.default(obj),)
+
+
+class _Placeholder(Exception):
+    """
+    Stands for the values marked in a pickle while it's checked (see `loadb()`): it
+    has no `append()`, `extend()`, `__setitem__()` nor `add()`, isn't callable and
+    refuses any state, so the opcodes meant for the native containers fail on it (and
+    on the markers themselves) instead of calling an object. An exception only because
+    its constructor takes any argument without calling back into Python.
+    """
+    __slots__ = ()
+
+    def __setstate__(self, state):
+        raise pickle.UnpicklingError("BUILD is not allowed in unijson binary data.")
+
+
+class _BinaryUnpickler(pickle.Unpickler):
+    """Unpickler only able to rebuild native types and objects with the universal decoder."""
+
+    def __init__(self, f, decoder):
+        """
+        Constructor of the unpickler.
+        Args:
+            f (file-like object): The binary file to read from.
+            decoder (UniversalJSONDecoder): The decoder to use, None to check the
+                pickle with placeholders instead of the marked values.
+        """
+        pickle.Unpickler.__init__(self, f)
+        self.decoder = decoder
+        # Whether any marker was found (see `loadb()`):
+        self.marked = False
+
+
+    def find_class(self, module, name):
+        """
+        Called by the unpickler for every class / function it needs.
+        Raises:
+            UnpicklingError - For anything else than the marker of the objects.
+        """
+        if module == __name__ and name in ("_object", "_native", "_shared_object") and self.decoder is None:
+            self.marked = True
+            return _Placeholder
+        if module == __name__ and name == "_object":
+            return self.decoder.universal_decoder
+        if module == __name__ and name == "_native":
+            return _native
+        if module == __name__ and name == "_shared_object":
+            self.decoder._references = True # Encoded with the references option
+            return self.decoder.universal_decoder
+        raise pickle.UnpicklingError("%s.%s is not allowed in unijson binary data." % (module, name))
+
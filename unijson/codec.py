@@ -0,0 +1,302 @@
+"""
+Copyright (c) 2018 Bastien Pietropaoli
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+import threading
+
+from .unijson import UniversalJSONEncoder, UniversalJSONDecoder, _check_registration, _decode_buffer
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# ------------------------
+# Codecs with own registry:
+# ------------------------
+
+
+# Maximum number of encoders / decoders kept per thread and per codec (one per set
+# of options used):
+_MAX_CACHED = 32
+
+
+class _Registry(object):
+    """
+    Immutable snapshot of the registered functions of a codec, with the caches
+    derived from them (compiled plans and resolved classes). Registering a function
+    replaces the whole snapshot, so that the encoders / decoders using the previous
+    one can keep reading it without any lock.
+    """
+    __slots__ = ("encoders", "iso_encoders", "decoders", "plans", "iso_plans", "classes")
+
+    def __init__(self, encoders, decoders):
+        """
+        Constructor of the snapshot.
+        Args:
+            encoders (dict): The encoding functions per type (not modified afterwards).
+            decoders (dict): The decoding functions per type (not modified afterwards).
+        """
+        self.encoders = encoders
+        self.iso_encoders = dict(encoders)
+        self.iso_encoders.update(UniversalJSONEncoder._iso_encoders)
+        self.decoders = decoders
+        # Filled by the encoders / decoders as they go (see UniversalJSONEncoder._compile_plan()
+        # and UniversalJSONDecoder._resolve_class()):
+        self.plans = {}
+        self.iso_plans = {}
+        self.classes = {}
+
+
+class Codec(object):
+    """
+    Encoder / decoder with its own registered functions, so that different parts of
+    an application can encode the same types differently without interfering with
+    each other (or with `UniversalJSONEncoder.register()` /
+    `UniversalJSONDecoder.register()`).
+
+    A codec can be shared by many threads: registering a function replaces a snapshot
+    of the registry instead of modifying it, so encoding and decoding never wait for
+    a lock. The encoders / decoders are reused from one call to the next (one per
+    thread and per set of options) instead of being created for every document.
+
+    How to use this class:
+        `codec = Codec()`
+        `codec.register_encoder(MyClass, encode_my_class)`
+        `codec.register_decoder(MyClass, decode_my_class)`
+        `s = codec.dumps(obj)`
+        `obj = codec.loads(s)`
+    A codec can also be passed to the other functions of unijson:
+        `unijson.dump_lines(objs, fp, codec=codec)`
+    Including those of `unijson.parallel`: a codec is pickled with its registered
+    functions (which need to be picklable) to be sent to other processes.
+    """
+
+    def __init__(self, inherit=True):
+        """
+        Constructor of the codec.
+        Args:
+            inherit (bool): If True, the codec starts with the functions registered
+                globally at the time it's created (including the codecs for dates
+                and times). Functions registered globally afterwards are not seen
+                by the codec. If False, it starts empty. Default: True.
+        """
+        if inherit:
+            registry = _Registry(dict(UniversalJSONEncoder._encoders), dict(UniversalJSONDecoder._decoders))
+        else:
+            registry = _Registry({}, {})
+        self._registry = registry
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+
+    def __reduce__(self):
+        """
+        Pickle the codec as a snapshot of its registered functions (without its caches
+        and locks, rebuilt by `_restore_codec()`).
+        """
+        registry = self._registry
+        return _restore_codec, (registry.encoders, registry.decoders)
+
+
+    def register_encoder(self, obj_type, encoding_function):
+        """
+        Register a function as an encoder for the provided type/class in this codec
+        only (see `UniversalJSONEncoder.register()`).
+        Args:
+            obj_type (type or str): The type to be encoded by the provided encoder
+                (or its qualified name).
+            encoding_function (function): The function to use as an encoder for the
+                provided type. Takes a single argument, a returns a dictionnary.
+        """
+        _check_registration(obj_type, encoding_function)
+        with self._lock:
+            encoders = dict(self._registry.encoders)
+            encoders[obj_type] = encoding_function
+            self._registry = _Registry(encoders, self._registry.decoders)
+
+
+    def register_decoder(self, obj_type, decoding_function):
+        """
+        Register a function as a decoder for the provided type/class in this codec
+        only (see `UniversalJSONDecoder.register()`).
+        Args:
+            obj_type (type or str): The type to be decoded by the provided decoder
+                (or its qualified name).
+            decoding_function (function): The function to use as a decoder for the
+                provided type. Takes a single argument, a returns an object.
+        """
+        _check_registration(obj_type, decoding_function)
+        with self._lock:
+            decoders = dict(self._registry.decoders)
+            decoders[obj_type] = decoding_function
+            self._registry = _Registry(self._registry.encoders, decoders)
+
+
+    def encoder(self, **kwargs):
+        """
+        Create a new encoder using the functions registered in this codec.
+        Args:
+            kwargs (**): The arguments of the `UniversalJSONEncoder`.
+        Return:
+            UniversalJSONEncoder - The encoder.
+        """
+        return UniversalJSONEncoder(codec=self, **kwargs)
+
+
+    def decoder(self, **kwargs):
+        """
+        Create a new decoder using the functions registered in this codec.
+        Args:
+            kwargs (**): The arguments of the `UniversalJSONDecoder`.
+        Return:
+            UniversalJSONDecoder - The decoder.
+        """
+        return UniversalJSONDecoder(codec=self, **kwargs)
+
+
+    def dumps(self, obj, **kwargs):
+        """
+        Serialise a given object into a JSON formatted string.
+        Args:
+            obj (object): The object to serialise.
+            kwargs (**): The arguments of the `UniversalJSONEncoder`.
+        Return:
+            str - The object serialised into a JSON string.
+        """
+        key, encoder = self._acquire("encoders", self.encoder, kwargs)
+        try:
+            return encoder.encode(obj)
+        finally:
+            self._release("encoders", key, encoder)
+
+
+    def dump(self, obj, fp, compression=None, compresslevel=None, **kwargs):
+        """
+        Serialise a given object into a JSON formatted file / stream.
+        Args:
+            obj (object): The object to serialise.
+            fp (file-like object): A .write()-supporting file-like object.
+            compression (str): The compression format, if any (see `unijson.dump()`).
+            compresslevel (int): The compression level. Default: None.
+            kwargs (**): The arguments of the `UniversalJSONEncoder`.
+        """
+        key, encoder = self._acquire("encoders", self.encoder, kwargs)
+        try:
+            if compression is not None:
+                from .compression import compressed_writer
+                with compressed_writer(fp, compression, compresslevel) as f:
+                    for chunk in encoder.iterencode_batches(obj):
+                        f.write(chunk)
+            else:
+                for chunk in encoder.iterencode(obj):
+                    fp.write(chunk)
+        finally:
+            self._release("encoders", key, encoder)
+
+
+    def loads(self, s, **kwargs):
+        """
+        Deserialise a given JSON formatted string into a Python object.
+        Args:
+            s (str, bytes, bytearray or memoryview): The JSON formatted string to
+                decode (see `unijson.loads()`).
+            kwargs (**): The arguments of the `UniversalJSONDecoder`.
+        Return:
+            object - A Python object corresponding to the provided JSON formatted string.
+        Raises:
+            TypeError - If `s` is not a string or a bytes-like object.
+        """
+        if isinstance(s, (bytes, bytearray, memoryview)) and not isinstance(s, str):
+            s = _decode_buffer(s)
+        elif not isinstance(s, str):
+            raise TypeError("The JSON object must be str, bytes, bytearray or memoryview, not %s." % type(s).__name__)
+
+        key, decoder = self._acquire("decoders", self.decoder, kwargs)
+        try:
+            return decoder.decode(s)
+        finally:
+            self._release("decoders", key, decoder)
+
+
+    def load(self, fp, compression=None, **kwargs):
+        """
+        Deserialise a given JSON formatted stream / file into a Python object.
+        Args:
+            fp (file-like object): A .read()-supporting file-like object.
+            compression (str): The compression format, if any, or "auto" (see
+                `unijson.load()`, the whole JSON string is decompressed first).
+            kwargs (**): The arguments of the `UniversalJSONDecoder`.
+        Return:
+            object - A Python object corresponding to the provided JSON formatted stream / file.
+        """
+        if compression is not None:
+            from .compression import decompressed_reader
+            fp = decompressed_reader(fp, compression)
+        return self.loads(fp.read(), **kwargs)
+
+
+    def _acquire(self, kind, create, kwargs):
+        """
+        Take an encoder / decoder of the current thread for the given options, or
+        create one if there is none (or if it's already in use, e.g. by a function
+        registered in this codec that encodes / decodes something itself).
+        Args:
+            kind (str): "encoders" or "decoders".
+            create (function): Creates an encoder / decoder from the options.
+            kwargs (dict): The options.
+        Return:
+            tuple - The key of the options (None if the encoder / decoder can't be
+                reused) and the encoder / decoder.
+        """
+        registry = self._registry
+        cache = getattr(self._local, kind, None)
+        if cache is None or cache[0] is not registry:
+            # First call in this thread or a function was registered since the last one:
+            cache = (registry, {})
+            setattr(self._local, kind, cache)
+        try:
+            key = tuple(sorted(kwargs.items()))
+            instance = cache[1].pop(key, None)
+        except TypeError:
+            return None, create(**kwargs) # Options that can't be used as a key (e.g. lists)
+        if instance is None:
+            instance = create(**kwargs)
+        return key, instance
+
+
+    def _release(self, kind, key, instance):
+        """
+        Give back an encoder / decoder taken with `_acquire()` to be reused.
+        Args:
+            kind (str): "encoders" or "decoders".
+            key (tuple): The key of its options.
+            instance (object): The encoder / decoder.
+        """
+        cache = getattr(self._local, kind)
+        if key is None or instance._registry is not cache[0]:
+            return # Not reusable, or a function was registered in the meantime
+        if len(cache[1]) >= _MAX_CACHED:
+            cache[1].clear()
+        cache[1][key] = instance
+
+
+def _restore_codec(encoders, decoders):
+    """Rebuild a pickled codec from its registered functions (see `Codec.__reduce__()`)."""
+    codec = Codec(inherit=False)
+    codec._registry = _Registry(encoders, decoders)
+    return codec
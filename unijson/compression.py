@@ -0,0 +1,265 @@
+"""
+Copyright (c) 2018 Bastien Pietropaoli
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Compression of the JSON documents while they are written / read (see the
+`compression` argument of `unijson.dump()`, `unijson.load()` and their streaming
+versions). The formats available are those of the standard library:
+ - "gzip": gzip files (.gz), as written by `gzip.open()`.
+ - "zlib": zlib streams.
+ - "bz2": bzip2 files (.bz2).
+ - "lzma": xz files (.xz).
+When reading, "auto" detects the format from the first bytes of the file / stream
+(files that are not compressed are read as they are).
+"""
+
+from __future__ import absolute_import
+import io, re, zlib
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# ---------------------------
+# Compressed files / streams:
+# ---------------------------
+
+
+# The number of bytes read / written at once from / to the underlying file / stream:
+_CHUNK_SIZE = 65536
+
+
+def _gzip_compressor(level):
+    return zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 31)
+
+def _zlib_compressor(level):
+    return zlib.compressobj(-1 if level is None else level)
+
+def _bz2_compressor(level):
+    import bz2
+    return bz2.BZ2Compressor(9 if level is None else level)
+
+def _lzma_compressor(level):
+    import lzma
+    return lzma.LZMACompressor(preset=level)
+
+def _bz2_decompressor():
+    import bz2
+    return bz2.BZ2Decompressor()
+
+def _lzma_decompressor():
+    import lzma
+    return lzma.LZMADecompressor()
+
+
+# The compressor (taking the compression level, None for the default one) and the
+# decompressor of each format:
+_FORMATS = {"gzip": (_gzip_compressor, lambda: zlib.decompressobj(31)),
+            "zlib": (_zlib_compressor, zlib.decompressobj),
+            "bz2": (_bz2_compressor, _bz2_decompressor),
+            "lzma": (_lzma_compressor, _lzma_decompressor)}
+
+
+# Beginning of a JSON document (whitespaces then the first character of a value):
+_JSON_START = re.compile(rb'[ \t\n\r]*[{\["\-0-9tfnNI]')
+
+
+def detect_compression(head):
+    """
+    Find the compression format of a file / stream from its first bytes. JSON
+    documents can't start with any of the magic numbers of gzip, bzip2 and xz. The
+    header of zlib streams can look like the beginning of a number (e.g. "80") so
+    anything starting like a JSON document is considered not compressed first.
+    Args:
+        head (bytes): The first bytes of the file / stream (at least 6).
+    Return:
+        str or None - The name of the format, or None if it's not compressed.
+    """
+    if head[:2] == b"\x1f\x8b":
+        return "gzip"
+    if head[:3] == b"BZh":
+        return "bz2"
+    if head[:6] == b"\xfd7zXZ\x00":
+        return "lzma"
+    if _JSON_START.match(head):
+        return None
+    # Deflate method and header checksum (the first two bytes are a multiple of 31):
+    b = bytearray(head[:2])
+    if len(b) == 2 and b[0] & 0x0f == 8 and (b[0] << 8 | b[1]) % 31 == 0:
+        return "zlib"
+    return None
+
+
+def compressed_writer(fp, compression, level=None):
+    """
+    Wrap a binary file / stream into a text one compressing what's written to it
+    (encoded in UTF-8) as it goes. Closing the text file / stream finishes the
+    compressed stream but doesn't close the underlying one:
+        `with compressed_writer(fp, "gzip") as f:`
+        `    f.write(s)`
+    Args:
+        fp (file-like object): A .write()-supporting binary file-like object.
+        compression (str): The format ("gzip", "zlib", "bz2" or "lzma").
+        level (int): The compression level (0-9, 1-9 for bz2). Default: None
+            (6, like the command line tools, 9 for bz2).
+    Return:
+        io.TextIOWrapper - The text file / stream to write to.
+    Raises:
+        ValueError - If the format is unknown.
+    """
+    compressor = _get_format(compression)[0](level)
+    return io.TextIOWrapper(io.BufferedWriter(_CompressedStream(fp, compressor), _CHUNK_SIZE), encoding="utf-8", newline="")
+
+
+def decompressed_reader(fp, compression="auto"):
+    """
+    Wrap a binary file / stream into a text one decompressing it (decoding it as
+    UTF-8) as it's read, chunk by chunk. Concatenated compressed streams are read
+    one after the other (like `gzip.open()` does). Closing the text file / stream
+    doesn't close the underlying one.
+    Args:
+        fp (file-like object): A .read()-supporting binary file-like object.
+        compression (str): The format ("gzip", "zlib", "bz2" or "lzma"), or "auto"
+            to detect it from the first bytes (see `detect_compression()`).
+            Default: "auto".
+    Return:
+        io.TextIOWrapper - The text file / stream to read from.
+    Raises:
+        ValueError - If the format is unknown.
+    """
+    if compression != "auto":
+        _get_format(compression)
+    return io.TextIOWrapper(io.BufferedReader(_DecompressedStream(fp, compression), _CHUNK_SIZE), encoding="utf-8", newline="")
+
+
+def _get_format(compression):
+    """Get the compressor and decompressor of a format, raising a ValueError if it's unknown."""
+    try:
+        return _FORMATS[compression]
+    except (KeyError, TypeError):
+        raise ValueError("Unknown compression %r, expected one of: %s." % (compression, ", ".join(sorted(_FORMATS))))
+
+
+class _CompressedStream(io.RawIOBase):
+    """Raw binary stream compressing the bytes written to it into another stream."""
+
+    def __init__(self, fp, compressor):
+        """
+        Constructor of the stream.
+        Args:
+            fp (file-like object): The binary file / stream receiving the compressed bytes.
+            compressor (object): A compressor from zlib, bz2 or lzma.
+        """
+        io.RawIOBase.__init__(self)
+        self.fp = fp
+        self.compressor = compressor
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        data = self.compressor.compress(b)
+        if data:
+            self.fp.write(data)
+        return len(b)
+
+    def close(self):
+        if not self.closed:
+            try:
+                io.RawIOBase.close(self)
+            finally:
+                self.fp.write(self.compressor.flush())
+                if hasattr(self.fp, "flush"):
+                    self.fp.flush()
+
+
+class _DecompressedStream(io.RawIOBase):
+    """Raw binary stream decompressing another stream as it's read."""
+
+    def __init__(self, fp, compression):
+        """
+        Constructor of the stream.
+        Args:
+            fp (file-like object): The binary file / stream to decompress.
+            compression (str): The format or "auto".
+        """
+        io.RawIOBase.__init__(self)
+        self.fp = fp
+        self.compression = compression
+        self.decompressor = None
+        # The compressed bytes not given to the decompressor yet (the unconsumed tail
+        # for zlib, the others keep it themselves), and whether the decompressor may
+        # have more to give without new input:
+        self.input = b""
+        self.more = False
+        self.buf = b""
+        self.pos = 0
+        self.eof = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self.pos == len(self.buf):
+            if self.eof:
+                return 0
+            self.fill()
+        n = min(len(b), len(self.buf) - self.pos)
+        b[:n] = self.buf[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+    def fill(self):
+        """
+        Decompress the next part of the underlying file / stream (at most `_CHUNK_SIZE`
+        bytes at once, however compressible it is), reading it as needed.
+        """
+        while True:
+            d = self.decompressor
+            if d is not None and d.eof:
+                # Next concatenated stream (if any):
+                self.input, self.more, self.decompressor, d = d.unused_data, False, None, None
+            if not self.input and not self.more:
+                chunk = self.fp.read(_CHUNK_SIZE)
+                if self.compression == "auto":
+                    while chunk and len(chunk) < 6: # Enough bytes for the magic numbers
+                        more = self.fp.read(_CHUNK_SIZE)
+                        if not more:
+                            break
+                        chunk += more
+                    self.compression = detect_compression(chunk)
+                if not chunk:
+                    self.eof = True
+                    if d is not None:
+                        raise EOFError("Compressed file ended before the end-of-stream marker was reached.")
+                    return
+                if self.compression is None:
+                    self.buf, self.pos = chunk, 0 # Not compressed
+                    return
+                self.input = chunk
+
+            if d is None:
+                d = self.decompressor = _FORMATS[self.compression][1]()
+            data = d.decompress(self.input, _CHUNK_SIZE)
+            if hasattr(d, "unconsumed_tail"): # zlib
+                self.input = d.unconsumed_tail
+                self.more = len(data) == _CHUNK_SIZE
+            else:
+                self.input = b""
+                self.more = not d.eof and not d.needs_input
+            if data:
+                self.buf, self.pos = data, 0
+                return
@@ -0,0 +1,354 @@
+"""
+Copyright (c) 2018 Bastien Pietropaoli
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+import pickle, warnings
+from itertools import chain, repeat
+
+from .unijson import UniversalJSONEncoder, UniversalJSONDecoder
+from .stats import CodecStats
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# --------------------------
+# Batch encoding / decoding:
+# --------------------------
+
+
+def dumps_many(objs, executor=None, workers=None, chunksize=256, min_batch=1024, **kwargs):
+    """
+    Serialise many independent objects into JSON formatted strings using a pool of
+    processes. The results are in the same order as the objects. Small batches
+    are serialised in the current process since it's faster than sending them to
+    other processes. The statistics collected by the processes (`stats` option) are
+    merged into the given `CodecStats`, its hooks are not called for them.
+    Args:
+        objs (iterable): The objects to serialise. They need to be picklable.
+        executor (concurrent.futures.Executor): The pool of processes to use. If
+            None, a pool is created for this call only (see `create_executor()`).
+        workers (int): The number of processes of the pool created if no executor
+            is provided. Default: the number of CPUs.
+        chunksize (int): The number of objects sent to a process at once.
+        min_batch (int): The minimum number of objects for the pool to be used.
+        kwargs (**): Keyword arguments normally passed to `unijson.dumps()`.
+    Return:
+        list of str - The objects serialised into JSON strings.
+    """
+    return _map_chunks(_dumps_chunk, list(objs), executor, workers, chunksize, min_batch, kwargs)
+
+
+def loads_many(strings, executor=None, workers=None, chunksize=256, min_batch=1024, **kwargs):
+    """
+    Deserialise many independent JSON formatted strings using a pool of processes.
+    The results are in the same order as the strings. Small batches are deserialised
+    in the current process since it's faster than sending them to other processes.
+    The statistics are collected like with `dumps_many()`.
+    Args:
+        strings (iterable of str): The JSON formatted strings to decode.
+        executor (concurrent.futures.Executor): The pool of processes to use. If
+            None, a pool is created for this call only (see `create_executor()`).
+        workers (int): The number of processes of the pool created if no executor
+            is provided. Default: the number of CPUs.
+        chunksize (int): The number of strings sent to a process at once.
+        min_batch (int): The minimum number of strings for the pool to be used.
+        kwargs (**): Keyword arguments normally passed to `unijson.loads()`.
+    Return:
+        list - The Python objects corresponding to the provided strings.
+    """
+    return _map_chunks(_loads_chunk, list(strings), executor, workers, chunksize, min_batch, kwargs)
+
+
+def dumps_parallel(obj, executor=None, workers=None, chunksize=2048, min_batch=8192, **kwargs):
+    """
+    Serialise a single large list or dictionary into a JSON formatted string using
+    a pool of processes: its items are split into shards encoded by the processes
+    and the JSON fragments are put together in order (see `dump_parallel()`).
+    Args:
+        obj (object): The object to serialise.
+        executor (concurrent.futures.Executor): The pool of processes to use. If
+            None, a pool is created for this call only (see `create_executor()`).
+        workers (int): The number of processes of the pool created if no executor
+            is provided. Default: the number of CPUs.
+        chunksize (int): The number of items per shard.
+        min_batch (int): The minimum number of items for the pool to be used.
+        kwargs (**): Keyword arguments normally passed to `unijson.dumps()`.
+    Return:
+        str - The object serialised into a JSON string.
+    Raises:
+        ValueError - If options applying to the whole document are given.
+    """
+    return "".join(_iterencode_shards(obj, executor, workers, chunksize, min_batch, kwargs))
+
+
+def dump_parallel(obj, fp, executor=None, workers=None, chunksize=2048, min_batch=8192, compression=None,
+                  compresslevel=None, **kwargs):
+    """
+    Serialise a single large list or dictionary into a JSON formatted file / stream
+    using a pool of processes. The items of the list (or of the dictionary) are split
+    into shards sent to the processes, each encoded with the registered functions,
+    and the JSON fragments are written in order as they come back. The result is
+    the same as `unijson.dump()`.
+    Other objects, dictionaries with keys that are not str and documents with less
+    than `min_batch` items are serialised in the current process. The options
+    applying to the whole document (`type_table`, `references`, `columnar` and
+    `schema`) can't be used. The statistics are collected like with `dumps_many()`.
+    Args:
+        obj (object): The object to serialise. Its items need to be picklable.
+        fp (file-like object): A .write()-supporting file-like object (binary
+            if `compression` is given).
+        executor (concurrent.futures.Executor): The pool of processes to use. If
+            None, a pool is created for this call only (see `create_executor()`).
+        workers (int): The number of processes of the pool created if no executor
+            is provided. Default: the number of CPUs.
+        chunksize (int): The number of items per shard.
+        min_batch (int): The minimum number of items for the pool to be used.
+        compression (str): The compression format, if any (see `unijson.dump()`).
+        compresslevel (int): The compression level. Default: None.
+        kwargs (**): Keyword arguments normally passed to `unijson.dump()`.
+    Raises:
+        ValueError - If options applying to the whole document are given.
+    """
+    chunks = _iterencode_shards(obj, executor, workers, chunksize, min_batch, kwargs)
+    if compression is not None:
+        from .compression import compressed_writer
+        with compressed_writer(fp, compression, compresslevel) as f:
+            for chunk in chunks:
+                f.write(chunk)
+        return
+    for chunk in chunks:
+        fp.write(chunk)
+
+
+def create_executor(workers=None):
+    """
+    Create a pool of processes able to encode / decode objects exactly like the
+    current process would: the encoding / decoding functions registered so far
+    are registered in each process of the pool when it starts. Functions that can't
+    be pickled (e.g. lambdas) can't be sent to the processes and are ignored with
+    a warning.
+    Args:
+        workers (int): The number of processes. Default: the number of CPUs.
+    Return:
+        concurrent.futures.ProcessPoolExecutor - The pool of processes.
+    """
+    # Only imported when needed since it's slow to import:
+    from concurrent.futures import ProcessPoolExecutor
+
+    encoders = _picklable_items(UniversalJSONEncoder._encoders)
+    decoders = _picklable_items(UniversalJSONDecoder._decoders)
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(encoders, decoders))
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# --------------------------------
+# What runs in the pool processes:
+# --------------------------------
+
+
+def _init_worker(encoders, decoders):
+    """
+    Register the given encoding / decoding functions in a process of the pool.
+    Args:
+        encoders (dict): The encoding functions, per type.
+        decoders (dict): The decoding functions, per type.
+    """
+    for t, f in encoders.items():
+        UniversalJSONEncoder.register(t, f)
+    for t, f in decoders.items():
+        UniversalJSONDecoder.register(t, f)
+
+
+def _dumps_chunk(objs, kwargs):
+    """Serialise a chunk of objects with a single encoder."""
+    encode = UniversalJSONEncoder(**kwargs).encode
+    return [encode(o) for o in objs]
+
+
+def _dumps_shard(items, as_dict, kwargs):
+    """
+    Serialise a shard of a list (or of the items of a dictionary) into a JSON
+    fragment: the encoded list / dictionary without its brackets.
+    """
+    encoder = UniversalJSONEncoder(**kwargs)
+    s = encoder.encode(dict(items) if as_dict else items)
+    # Indented documents end with a line break before the closing bracket:
+    return s[1:-2] if encoder.indent is not None else s[1:-1]
+
+
+def _loads_chunk(strings, kwargs):
+    """Deserialise a chunk of strings with a single decoder."""
+    decode = UniversalJSONDecoder(**kwargs).decode
+    return [decode(s) for s in strings]
+
+
+def _with_stats(func, kwargs, *args):
+    """
+    Call one of the functions above collecting the statistics of the encoder / decoder
+    in this process (see `_run()`).
+    Args:
+        func (function): The function, taking the given arguments then the keyword
+            arguments of the encoder / decoder.
+        kwargs (dict): The keyword arguments of the encoder / decoder (without `stats`).
+        args (*): The other arguments of the function.
+    Return:
+        tuple - The result of the function and the statistics collected (a snapshot).
+    """
+    stats = CodecStats()
+    kwargs = dict(kwargs, stats=stats)
+    return func(*(args + (kwargs,))), stats.snapshot()
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# --------
+# Helpers:
+# --------
+
+
+def _map_chunks(func, items, executor, workers, chunksize, min_batch, kwargs):
+    """
+    Apply a function working on chunks of items to all the given items using a pool
+    of processes (or in the current process if there are not enough items).
+    Args:
+        func (function): The function to apply to each chunk, with the keyword arguments.
+        items (list): The items to process.
+        executor (concurrent.futures.Executor): The pool of processes to use (or None).
+        workers (int): The number of processes of the pool if it has to be created.
+        chunksize (int): The number of items per chunk.
+        min_batch (int): The minimum number of items for the pool to be used.
+        kwargs (dict): The keyword arguments to pass to the function.
+    Return:
+        list - The results for all items, in order.
+    """
+    if len(items) < min_batch:
+        return func(items, kwargs)
+
+    chunks = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+    if executor is not None:
+        return list(chain.from_iterable(_run(executor, func, kwargs, chunks)))
+    with create_executor(workers) as executor:
+        return list(chain.from_iterable(_run(executor, func, kwargs, chunks)))
+
+
+def _run(executor, func, kwargs, *iterables):
+    """
+    Map one of the functions running in the pool processes over the given iterables,
+    like `executor.map()`. The keyword arguments of the encoder / decoder are given
+    last. Statistics can't be shared between processes: if a `CodecStats` is given
+    (`stats`), each process collects its own and they are merged into it as the
+    results come back.
+    Args:
+        executor (concurrent.futures.Executor): The pool of processes to use.
+        func (function): The function to apply.
+        kwargs (dict): The keyword arguments of the encoder / decoder.
+        iterables (*): The other arguments of the function.
+    Return:
+        generator - The results, in order.
+    """
+    stats = kwargs.get("stats")
+    if stats is None:
+        for result in executor.map(func, *(iterables + (repeat(kwargs),))):
+            yield result
+        return
+    kwargs = dict((k, v) for k, v in kwargs.items() if k != "stats")
+    for result, snapshot in executor.map(_with_stats, repeat(func), repeat(kwargs), *iterables):
+        stats.merge(snapshot)
+        yield result
+
+
+def _iterencode_shards(obj, executor, workers, chunksize, min_batch, kwargs):
+    """
+    Encode a list or a dictionary with a pool of processes, shard by shard (see
+    `dump_parallel()`).
+    Args:
+        obj (object): The object to serialise.
+        executor (concurrent.futures.Executor): The pool of processes to use (or None).
+        workers (int): The number of processes of the pool if it has to be created.
+        chunksize (int): The number of items per shard.
+        min_batch (int): The minimum number of items for the pool to be used.
+        kwargs (dict): The keyword arguments of the encoder.
+    Return:
+        iterable - The chunks of the JSON string, in order.
+    Raises:
+        ValueError - If options applying to the whole document are given.
+    """
+    encoder = UniversalJSONEncoder(**kwargs)
+    if encoder.type_table or encoder.references or encoder.columnar or encoder._schema_encode is not None:
+        raise ValueError("Documents with a type table, references, columns or a schema can't be split.")
+
+    t, items = type(obj), None
+    if t is list or t is tuple:
+        items, brackets = obj, "[]"
+    elif t is dict and all(isinstance(k, str) for k in obj):
+        items, brackets = sorted(obj.items()) if encoder.sort_keys else list(obj.items()), "{}"
+    if not items or len(items) < min_batch:
+        return encoder.iterencode_batches(obj)
+
+    shards = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+    closing = brackets[1] if encoder.indent is None else "\n" + brackets[1]
+    return _stitch(shards, brackets == "{}", kwargs, executor, workers, brackets[0], encoder.item_separator, closing)
+
+
+def _stitch(shards, as_dict, kwargs, executor, workers, opening, separator, closing):
+    """
+    Generator of the JSON fragments of the shards encoded by a pool of processes,
+    in order, between the brackets of the list / dictionary and separated by the
+    item separator (see `_iterencode_shards()`).
+    """
+    if executor is None:
+        with create_executor(workers) as executor:
+            for chunk in _stitch(shards, as_dict, kwargs, executor, workers, opening, separator, closing):
+                yield chunk
+        return
+
+    yield opening
+    for i, fragment in enumerate(_run(executor, _dumps_shard, kwargs, shards, repeat(as_dict))):
+        if i:
+            yield separator
+        yield fragment
+    yield closing
+
+
+def _picklable_items(registry):
+    """
+    Select the items of a registry of encoding / decoding functions that can be
+    sent to other processes.
+    Args:
+        registry (dict): The encoding / decoding functions, per type.
+    Return:
+        dict - The items of the registry that can be pickled.
+    """
+    result = {}
+    for t, f in registry.items():
+        try:
+            pickle.dumps((t, f))
+        except Exception:
+            warnings.warn("Function %s registered for type %s can't be sent to other processes." % \
+                (getattr(f, "__name__", f), t))
+        else:
+            result[t] = f
+    return result
@@ -0,0 +1,328 @@
+"""
+Copyright (c) 2018 Bastien Pietropaoli
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Codecs generated from the type annotations of dataclasses and NamedTuples (see the
+`schema` option of `UniversalJSONEncoder` / `UniversalJSONDecoder`). Requires
+Python 3.7+, imported only when a schema is used.
+
+When the type of a document is known by both sides, its dataclasses and NamedTuples
+are written as plain JSON objects, without `__class__` / `__module__`, and rebuilt
+from the schema. The fields are read once per class to generate a function encoding
+and another decoding its objects, nested typed fields included:
+    `@dataclass
+     class Point:
+         x: float
+         y: float
+         tags: List[str] = field(default_factory=list)`
+    `unijson.dumps(points, schema=List[Point])`
+    `unijson.loads(s, schema=List[Point])`
+
+Supported annotations: dataclasses, NamedTuples, `List`, `Sequence`, `Tuple`, `Set`,
+`FrozenSet`, `Dict` / `Mapping` (with str keys) and `Optional` of those. Values of
+other types (`Any`, `Union`, datetimes...) and instances of subclasses of the classes
+declared are encoded / decoded as usual, with their type tags. The fields missing
+from a document take their default value (a KeyError is raised if they have none),
+the keys that are not fields are ignored. A field defaulting to None is optional.
+
+Without a schema, dataclasses and NamedTuples keep their type tags and are encoded /
+decoded by functions generated the same way (see `compile_tagged()`), only reading
+their fields and passing them to their constructor: the values of the fields are
+left to the universal encoder / decoder, with their own type tags.
+"""
+
+import dataclasses, typing
+
+from .unijson import _is_named_tuple
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# --------
+# Schemas:
+# --------
+
+
+class Schema(object):
+    """
+    The functions encoding / decoding the values of a given type. Get them with
+    `compile_schema()`.
+    """
+    __slots__ = ("type", "encode", "decode")
+
+    def __init__(self, tp, encode=None, decode=None):
+        """
+        Constructor of the schema.
+        Args:
+            tp (type): The type (or annotation).
+            encode (function): Takes a value and returns it with the objects of the
+                schema replaced with plain dictionaries (None if nothing to do).
+            decode (function): Takes a decoded JSON value and returns it with the
+                plain dictionaries replaced with the objects of the schema (None if
+                nothing to do).
+        """
+        self.type = tp
+        self.encode = encode
+        self.decode = decode
+
+
+# The schemas compiled so far per type:
+_schemas = {}
+
+
+def compile_schema(tp):
+    """
+    Get the schema of a type, generating its functions the first time.
+    Args:
+        tp (type): A dataclass, a NamedTuple or an annotation from `typing`.
+    Return:
+        Schema - The schema.
+    """
+    schema = _schemas.get(tp)
+    if schema is None:
+        schema = _compile(tp)
+        _schemas[tp] = schema
+    return schema
+
+
+def _compile(tp):
+    """
+    Generate the functions of the schema of a type.
+    Args:
+        tp (type): A dataclass, a NamedTuple or an annotation from `typing`.
+    Return:
+        Schema - The schema.
+    """
+    if isinstance(tp, type) and (dataclasses.is_dataclass(tp) or _is_named_tuple(tp)):
+        return _compile_class(tp)
+
+    origin, args = _get_origin(tp), _get_args(tp)
+    if origin is typing.Union or _is_union_type(origin):
+        others = [a for a in args if a is not type(None)]
+        if len(others) != len(args) and len(others) == 1:
+            return _compile_optional(tp, compile_schema(others[0]))
+        return Schema(tp) # Encoded with type tags
+
+    if origin in (list, tuple, set, frozenset) or _is_abstract(origin, "Sequence", "Set"):
+        return _compile_collection(tp, origin, args)
+    if origin is dict or _is_abstract(origin, "Mapping"):
+        values = compile_schema(args[1]) if len(args) == 2 else Schema(typing.Any)
+        encode, decode = values.encode, values.decode
+        return Schema(tp, None if encode is None else lambda x: {k: encode(v) for k, v in x.items()},
+                      None if decode is None else lambda x: {k: decode(v) for k, v in x.items()})
+    if tp in (tuple, set, frozenset):
+        return _compile_collection(tp, tp, ())
+    return Schema(tp) # Native types, Any, and other types encoded with type tags
+
+
+def _compile_optional(tp, inner):
+    """Generate the functions of `Optional[T]` from the schema of T."""
+    encode, decode = inner.encode, inner.decode
+    return Schema(tp, None if encode is None else lambda x: None if x is None else encode(x),
+                  None if decode is None else lambda x: None if x is None else decode(x))
+
+
+def _compile_collection(tp, origin, args):
+    """
+    Generate the functions of a list, tuple or set. They're all encoded as JSON arrays.
+    Args:
+        tp (type): The annotation.
+        origin (type): The collection (list, tuple, set, frozenset or an abstract
+            collection).
+        args (tuple): The annotations of the items.
+    Return:
+        Schema - The schema.
+    """
+    if origin is tuple and args and args[-1] is not Ellipsis and args != ((),):
+        # Tuple[A, B, ...]: one schema per position
+        schemas = [compile_schema(a) for a in args]
+        encoders = [s.encode or _identity for s in schemas]
+        decoders = [s.decode or _identity for s in schemas]
+        encode = None
+        if any(s.encode is not None for s in schemas):
+            encode = lambda x: [e(v) for e, v in zip(encoders, x)]
+        return Schema(tp, encode, lambda x: tuple([d(v) for d, v in zip(decoders, x)]))
+
+    items = compile_schema(args[0]) if args and args[0] is not Ellipsis else Schema(typing.Any)
+    encode, decode = items.encode, items.decode
+    build = origin if origin in (tuple, set, frozenset) else (set if _is_abstract(origin, "Set") else None)
+    if encode is None:
+        encoder = list if build in (set, frozenset) else None
+    else:
+        encoder = lambda x: [encode(v) for v in x]
+    if decode is None:
+        decoder = build
+    elif build is None:
+        decoder = lambda x: [decode(v) for v in x]
+    else:
+        decoder = lambda x: build([decode(v) for v in x])
+    return Schema(tp, encoder, decoder)
+
+
+def _compile_class(cls):
+    """
+    Generate the functions of a dataclass or a NamedTuple from its fields. The objects
+    are encoded as JSON objects with one key per field, and rebuilt by passing the
+    fields to the constructor (the fields not taken by the constructor are set after).
+    Args:
+        cls (type): The dataclass or NamedTuple.
+    Return:
+        Schema - The schema.
+    """
+    schema = Schema(cls)
+    # Recursive types refer to the schema before its functions are generated:
+    schema.encode = lambda o: schema.encode(o)
+    schema.decode = lambda d: schema.decode(d)
+    _schemas[cls] = schema
+    try:
+        _generate_class_functions(cls, schema)
+    except BaseException:
+        del _schemas[cls]
+        raise
+    return schema
+
+
+# The schemas of the classes encoded with their type tags, per class (see `compile_tagged()`):
+_tagged = {}
+
+
+def compile_tagged(cls):
+    """
+    Get the functions encoding / decoding the objects of a dataclass or a NamedTuple
+    with their type tags, without a schema: the objects are encoded as JSON objects
+    with one key per field and rebuilt from them like with a schema, but the values
+    of the fields are left as they are (to the universal encoder / decoder).
+    Args:
+        cls (type): The dataclass or NamedTuple.
+    Return:
+        Schema - The schema of the class (generated the first time).
+    """
+    schema = _tagged.get(cls)
+    if schema is None:
+        schema = Schema(cls)
+        _generate_class_functions(cls, schema, typed=False)
+        _tagged[cls] = schema
+    return schema
+
+
+# Default value of the fields with a default factory (see `_generate_class_functions()`):
+_FACTORY = object()
+
+
+def _generate_class_functions(cls, schema, typed=True):
+    """
+    Generate the functions of a dataclass or a NamedTuple (see `_compile_class()`).
+    Args:
+        cls (type): The dataclass or NamedTuple.
+        schema (Schema): Its schema, receiving the functions.
+        typed (bool): Whether the fields are encoded / decoded according to their
+            annotations (False to leave them as they are, see `compile_tagged()`).
+    """
+    hints = typing.get_type_hints(cls) if typed else {}
+    # (name, taken by the constructor, default value, _FACTORY or MISSING) of each field:
+    if dataclasses.is_dataclass(cls):
+        fields = [(f.name, f.init, f.default if f.default_factory is dataclasses.MISSING else _FACTORY)
+                  for f in dataclasses.fields(cls)]
+    else:
+        fields = [(name, True, cls._field_defaults.get(name, dataclasses.MISSING)) for name in cls._fields]
+
+    namespace = {"cls": cls, "set_field": object.__setattr__}
+    items, required, optional, late = [], [], [], []
+    for i, (name, init, default) in enumerate(fields):
+        hint = hints.get(name, typing.Any)
+        if default is None:
+            hint = typing.Optional[hint] # Fields defaulting to None are optional
+        field = compile_schema(hint)
+        value = "o.%s" % name
+        if field.encode is not None:
+            namespace["encode_%d" % i] = field.encode
+            value = "encode_%d(%s)" % (i, value)
+        items.append("%r: %s" % (name, value))
+
+        value = "d[%r]" % name
+        if field.decode is not None:
+            namespace["decode_%d" % i] = field.decode
+            value = "decode_%d(%s)" % (i, value)
+        if not init:
+            late.append("    if %r in d:\n        set_field(o, %r, %s)\n" % (name, name, value))
+        elif default is dataclasses.MISSING:
+            required.append((name, value))
+        else:
+            # Left to the constructor if missing (which calls the default factory):
+            optional.append("    if %r in d:\n        kwargs[%r] = %s\n" % (name, name, value))
+
+    # Instances of subclasses are left to the universal encoder (with their type tags),
+    # as well as the objects already decoded from their type tags. The names of the
+    # functions are fixed (the name of the class may not be an identifier):
+    encode = ("def encode(o):\n"
+              "    if type(o) is not cls:\n"
+              "        return o\n"
+              "    return {%s}\n" % ", ".join(items))
+    decode = ("def decode(d):\n"
+              "    if type(d) is not dict:\n"
+              "        return d\n")
+    if optional:
+        decode += "    kwargs = {%s}\n" % ", ".join("%r: %s" % r for r in required)
+        decode += "".join(optional)
+        decode += "    o = cls(**kwargs)\n"
+    else:
+        decode += "    o = cls(%s)\n" % ", ".join("%s=%s" % r for r in required)
+    decode += "".join(late) + "    return o\n"
+
+    exec(encode + decode, namespace)
+    schema.encode = namespace["encode"]
+    schema.decode = namespace["decode"]
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# --------
+# Helpers:
+# --------
+
+
+def _identity(x):
+    return x
+
+
+def _get_origin(tp):
+    """Get the unsubscripted version of an annotation (e.g. list for List[int])."""
+    if hasattr(typing, "get_origin"):
+        return typing.get_origin(tp)
+    return getattr(tp, "__origin__", None)
+
+
+def _get_args(tp):
+    """Get the arguments of an annotation (e.g. (int,) for List[int])."""
+    if hasattr(typing, "get_args"):
+        return typing.get_args(tp)
+    return getattr(tp, "__args__", ())
+
+
+def _is_union_type(origin):
+    """Check whether an origin is the type of `A | B` annotations (Python 3.10+)."""
+    return origin is not None and getattr(origin, "__module__", None) == "types" and origin.__name__ == "UnionType"
+
+
+def _is_abstract(origin, *names):
+    """Check whether an origin is one of the given abstract base classes of `collections.abc`."""
+    import collections.abc
+    return any(origin is getattr(collections.abc, name) or origin is getattr(collections.abc, "Mutable" + name)
+               for name in names)
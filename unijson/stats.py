@@ -0,0 +1,171 @@
+"""
+Copyright (c) 2018 Bastien Pietropaoli
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+import copy, threading
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# ----------------------------------
+# Statistics of encoding / decoding:
+# ----------------------------------
+
+
+class CodecStats(object):
+    """
+    Statistics about the objects encoded / decoded by unijson. Pass an instance to
+    the encoder / decoder (also usable with `unijson.dumps()` / `unijson.loads()`)
+    to collect them:
+        `stats = CodecStats()`
+        `unijson.dumps(obj, stats=stats)`
+        `stats.snapshot()`
+
+    For each type (identified by its module and class, e.g. "datetime.datetime"),
+    the following are counted separately for encoding and decoding:
+     - The number of objects and the cumulative time spent on them
+     - The method that worked, per name (e.g. "_copy_dict" when the __dict__ of the
+       object was used because nothing else was provided, "raw" when the object was
+       left as a raw dictionary because nothing worked)
+     - The methods that failed before another one worked, per name
+    The modules imported to decode objects are counted as well.
+
+    The same instance can be shared by several encoders / decoders, including in
+    different threads. With `unijson.parallel`, the statistics of the objects encoded
+    / decoded by the pool of processes are merged into it once they come back (see
+    `merge()`).
+
+    Hooks can be added to be notified of every event as it happens. A hook is a
+    function taking 4 arguments:
+     - event (str): "encode", "decode", "encode_failure", "decode_failure" or "import".
+     - name (str): The name of the type ("module.Class") or of the module imported.
+     - method (str): The name of the method that worked (or failed). None for imports.
+     - elapsed (float): The time spent (in seconds). None for failures.
+    """
+
+    def __init__(self, hooks=()):
+        """
+        Constructor of the statistics.
+        Args:
+            hooks (iterable of function): Functions to call for every event (see
+                the class documentation).
+        """
+        self.hooks = list(hooks)
+        self._lock = threading.Lock()
+        self.reset()
+
+
+    def reset(self):
+        """Forget all the statistics collected so far (the hooks are kept)."""
+        with self._lock:
+            self._stats = {"encode": {}, "decode": {}, "imports": {}}
+
+
+    def snapshot(self):
+        """
+        Get the statistics collected so far.
+        Return:
+            dict - A copy of the statistics, JSON serialisable. For instance:
+                `{"encode": {"datetime.date": {"calls": 2, "time": 1.2e-05,
+                                               "methods": {"json_encode_date": 2},
+                                               "failures": {}}},
+                  "decode": {...},
+                  "imports": {"pytz": {"calls": 1, "time": 0.01}}}`
+        """
+        with self._lock:
+            return copy.deepcopy(self._stats)
+
+
+    def record(self, event, name, method, elapsed):
+        """
+        Record an object that was encoded / decoded.
+        Args:
+            event (str): "encode" or "decode".
+            name (str): The name of the type ("module.Class").
+            method (str): The name of the method that worked.
+            elapsed (float): The time spent on the object (in seconds).
+        """
+        with self._lock:
+            s = self._type_stats(event, name)
+            s["calls"] += 1
+            s["time"] += elapsed
+            s["methods"][method] = s["methods"].get(method, 0) + 1
+        for hook in self.hooks:
+            hook(event, name, method, elapsed)
+
+
+    def record_failure(self, event, name, method):
+        """
+        Record a method that failed to encode / decode an object.
+        Args:
+            event (str): "encode" or "decode".
+            name (str): The name of the type ("module.Class").
+            method (str): The name of the method that failed.
+        """
+        with self._lock:
+            failures = self._type_stats(event, name)["failures"]
+            failures[method] = failures.get(method, 0) + 1
+        for hook in self.hooks:
+            hook(event + "_failure", name, method, None)
+
+
+    def record_import(self, module, elapsed):
+        """
+        Record a module imported to decode an object.
+        Args:
+            module (str): The name of the module.
+            elapsed (float): The time spent importing it (in seconds).
+        """
+        with self._lock:
+            s = self._stats["imports"].setdefault(module, {"calls": 0, "time": 0.0})
+            s["calls"] += 1
+            s["time"] += elapsed
+        for hook in self.hooks:
+            hook("import", module, None, elapsed)
+
+
+    def merge(self, snapshot):
+        """
+        Add statistics collected by another instance (e.g. in another process) to
+        these ones. The hooks are not called.
+        Args:
+            snapshot (dict): The statistics to add, as returned by `snapshot()`.
+        """
+        with self._lock:
+            for event in ("encode", "decode"):
+                for name, other in snapshot[event].items():
+                    s = self._type_stats(event, name)
+                    s["calls"] += other["calls"]
+                    s["time"] += other["time"]
+                    for key in ("methods", "failures"):
+                        for method, n in other[key].items():
+                            s[key][method] = s[key].get(method, 0) + n
+            for module, other in snapshot["imports"].items():
+                s = self._stats["imports"].setdefault(module, {"calls": 0, "time": 0.0})
+                s["calls"] += other["calls"]
+                s["time"] += other["time"]
+
+
+    def _type_stats(self, event, name):
+        """Get the statistics of a type, creating them if necessary (lock held)."""
+        s = self._stats[event].get(name)
+        if s is None:
+            s = self._stats[event][name] = {"calls": 0, "time": 0.0, "methods": {}, "failures": {}}
+        return s
+
@@ -0,0 +1,372 @@
+"""
+Copyright (c) 2018 Bastien Pietropaoli
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+import codecs, json, re
+
+from .unijson import UniversalJSONEncoder, UniversalJSONDecoder, _HEADER_KEYS, _decode_buffer, _read_header
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# -----------------------------------------
+# Newline-delimited JSON (one object/line):
+# -----------------------------------------
+
+
+def iter_dumps(objs, **kwargs):
+    """
+    Serialise the given objects into JSON formatted strings, one by one. A single
+    `UniversalJSONEncoder` is used for all the objects. Takes the same keyword
+    arguments as `unijson.dumps()` except for `indent` since the resulting strings
+    are meant to be written on a single line.
+    Args:
+        objs (iterable): The objects to serialise.
+        kwargs (**): Keyword arguments normally passed to `unijson.dumps()`.
+    Return:
+        generator - The objects serialised into JSON strings (without line breaks).
+    Raises:
+        ValueError - If an `indent` is provided.
+    """
+    if kwargs.get("indent") is not None:
+        raise ValueError("Newline-delimited JSON can't be indented.")
+    encode = UniversalJSONEncoder(**kwargs).encode
+    for obj in objs:
+        yield encode(obj)
+
+
+def dump_lines(objs, fp, buffer_size=65536, compression=None, compresslevel=None, **kwargs):
+    """
+    Serialise the given objects into a newline-delimited JSON file / stream (one
+    JSON object per line). The lines are written as they are produced so the whole
+    file never has to be held in memory.
+    Args:
+        objs (iterable): The objects to serialise.
+        fp (file-like object): A .write()-supporting file-like object (binary
+            if `compression` is given).
+        buffer_size (int): The number of characters to accumulate before writing
+            them to the file / stream.
+        compression (str): If provided, the lines are compressed as they are
+            written (see `unijson.dump()`). Default: None.
+        compresslevel (int): The compression level. Default: None.
+        kwargs (**): Keyword arguments normally passed to `unijson.dumps()` except
+            for `indent`.
+    Return:
+        int - The number of objects written.
+    """
+    if compression is not None:
+        from .compression import compressed_writer
+        with compressed_writer(fp, compression, compresslevel) as f:
+            return dump_lines(objs, f, buffer_size, **kwargs)
+    n, size, buf = 0, 0, []
+    for s in iter_dumps(objs, **kwargs):
+        buf.append(s)
+        buf.append("\n")
+        n += 1
+        size += len(s) + 1
+        if size >= buffer_size:
+            fp.write("".join(buf))
+            size, buf = 0, []
+    if buf:
+        fp.write("".join(buf))
+    return n
+
+
+def iter_loads(lines, **kwargs):
+    """
+    Deserialise the given JSON formatted strings, one by one. A single
+    `UniversalJSONDecoder` is used for all the strings. Empty lines are ignored.
+    Args:
+        lines (iterable of str / bytes): The JSON formatted strings to decode (bytes
+            are decoded in UTF-8, 16 or 32, detected like `json.loads()` does).
+        kwargs (**): Keyword arguments normally passed to `unijson.loads()`.
+    Return:
+        generator - The Python objects corresponding to the provided strings.
+    """
+    decode = UniversalJSONDecoder(**kwargs).decode
+    for line in lines:
+        if isinstance(line, (bytes, bytearray)):
+            line = _decode_buffer(line)
+        if line.strip():
+            yield decode(line)
+
+
+def load_lines(fp, compression=None, **kwargs):
+    """
+    Deserialise a newline-delimited JSON file / stream (one JSON object per line),
+    reading it line by line.
+    Args:
+        fp (file-like object): A file-like object that can be iterated over lines
+            (text or binary).
+        compression (str): If provided, the (binary) file / stream is decompressed
+            as it's read (see `unijson.load()`). Default: None.
+        kwargs (**): Keyword arguments normally passed to `unijson.loads()`.
+    Return:
+        generator - The Python objects found in the file / stream, in order.
+    """
+    if compression is not None:
+        from .compression import decompressed_reader
+        fp = decompressed_reader(fp, compression)
+    return iter_loads(fp, **kwargs)
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# ---------------------------------
+# Incremental decoding of an array:
+# ---------------------------------
+
+
+def iter_items(fp, path=(), chunk_size=65536, compression=None, **kwargs):
+    """
+    Deserialise the items of a JSON array one by one while reading the file / stream
+    chunk by chunk. The array can be the whole document or be found inside of it by
+    following the given path. Only one item is decoded at a time so the memory used
+    is proportional to the size of an item rather than the size of the document.
+    Items are decoded exactly like `unijson.load()` would decode them. The path
+    starts from the data of documents with a header (see `UniversalJSONEncoder.iterencode()`).
+    An array encoded in columns (see the `columnar` option) is decoded at once.
+    Args:
+        fp (file-like object): A .read()-supporting file-like object (text or binary,
+            in which case it should be encoded in UTF-8).
+        path (sequence of str/int): The keys (for objects) and indices (for arrays)
+            leading to the array. Default: the document itself is the array.
+        chunk_size (int): The number of characters to read at once.
+        compression (str): If provided, the (binary) file / stream is decompressed
+            as it's read (see `unijson.load()`). Default: None.
+        kwargs (**): Keyword arguments normally passed to `unijson.load()`.
+    Return:
+        generator - The Python objects corresponding to the items of the array.
+    Raises:
+        KeyError - If a key of the path can't be found.
+        IndexError - If an index of the path is out of range.
+        ValueError - If the document is not valid JSON, the path doesn't lead to an
+            array or goes through an array encoded in columns.
+    """
+    if compression is not None:
+        from .compression import decompressed_reader
+        fp = decompressed_reader(fp, compression)
+    reader = _IncrementalReader(fp, chunk_size)
+    decoder = UniversalJSONDecoder(**kwargs)
+    reader.mark = reader.pos
+    header = _read_header(_iter_header(reader))
+    if header is None:
+        reader.pos = reader.mark # Plain data
+    reader.mark = None
+    decoder._use_header(header)
+
+    # Go through the document until the array is found:
+    for key in path:
+        if isinstance(key, int):
+            if decoder._columnar and reader.peek() == "{":
+                raise ValueError("Index %d of path %r is in an array encoded in columns." % (key, path))
+            reader.expect("[")
+            found = reader.peek() != "]"
+            for _ in range(key):
+                reader.skip()
+                found = reader.expect(",]") == ","
+                if not found:
+                    break
+            if not found:
+                raise IndexError("Index %d out of range in path %r." % (key, path))
+        else:
+            reader.expect("{")
+            found = reader.peek() != "}"
+            while found:
+                k = reader.skip()
+                reader.expect(":")
+                if k == key:
+                    break
+                reader.skip()
+                found = reader.expect(",}") == ","
+            if not found:
+                raise KeyError("Key %s not found in path %r." % (key, path))
+
+    # Decode the items one by one:
+    if decoder._columnar and reader.peek() == "{":
+        items = reader.value(decoder)
+        if not isinstance(items, list):
+            raise ValueError("Expected an array at path %r, found an object instead." % (path,))
+        for item in items:
+            yield item
+        return
+    reader.expect("[")
+    if reader.peek() == "]":
+        return
+    while True:
+        yield reader.value(decoder)
+        if reader.expect(",]") == "]":
+            return
+
+
+def _iter_header(reader):
+    """
+    Go through the keys at the beginning of a document that could be its header (see
+    `unijson.unijson._read_header()`), leaving the reader at the beginning of the data.
+    Args:
+        reader (_IncrementalReader): The reader, at the beginning of the document.
+    Return:
+        generator - The (key, raw value) pairs, up to `__data__` (with None as value).
+    """
+    if reader.peek() != "{":
+        return
+    reader.expect("{")
+    while reader.peek() == '"':
+        key = reader.skip()
+        if key != "__data__" and key not in _HEADER_KEYS:
+            return
+        reader.expect(":")
+        if key == "__data__":
+            yield key, None
+            return
+        yield key, reader.skip()
+        if reader.peek() != ",":
+            return
+        reader.expect(",")
+
+
+# Whitespaces allowed between JSON tokens:
+_WHITESPACES = re.compile(r"[ \t\n\r]*")
+# Characters ending a number (and the first characters of the numbers):
+_DELIMITER = re.compile(r"[ \t\n\r,\]}:]")
+_NUMBER_START = "-0123456789"
+
+
+class _IncrementalReader(object):
+    """
+    Buffer over a file / stream used to decode a JSON document piece by piece.
+    The part of the buffer already consumed is dropped whenever more data is read
+    (except from the position marked, if any).
+    """
+
+    def __init__(self, fp, chunk_size):
+        """
+        Constructor of the reader.
+        Args:
+            fp (file-like object): A .read()-supporting file-like object.
+            chunk_size (int): The minimum number of characters to read at once.
+        """
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.mark = None
+        self.eof = False
+        self._bytes_decoder = None
+        self._skip_decoder = json.JSONDecoder()
+
+
+    def fill(self, size=0):
+        """
+        Read more data from the file / stream.
+        Args:
+            size (int): The number of characters to read (at least `chunk_size`).
+        Return:
+            bool - False if the end of the file / stream was reached.
+        """
+        if self.eof:
+            return False
+        chunk = self.fp.read(max(size, self.chunk_size))
+        if not chunk:
+            self.eof = True
+        if isinstance(chunk, bytes):
+            # The end of the chunk may be the beginning of a character (nothing decoded):
+            if self._bytes_decoder is None:
+                self._bytes_decoder = codecs.getincrementaldecoder("utf-8")()
+            chunk = self._bytes_decoder.decode(chunk, final=self.eof)
+        if self.eof:
+            return False
+        start = self.pos if self.mark is None else self.mark
+        self.buf = self.buf[start:] + chunk
+        self.pos -= start
+        if self.mark is not None:
+            self.mark = 0
+        return True
+
+
+    def peek(self):
+        """
+        Skip the whitespaces and return the next character without consuming it.
+        Return:
+            str - The next character ("" at the end of the file / stream).
+        """
+        while True:
+            self.pos = _WHITESPACES.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+
+    def expect(self, chars):
+        """
+        Consume the next character, which has to be one of the given characters.
+        Args:
+            chars (str): The characters allowed.
+        Return:
+            str - The character consumed.
+        Raises:
+            ValueError - If another character was found.
+        """
+        c = self.peek()
+        if not c or c not in chars:
+            raise ValueError("Expected one of %r, found %r instead." % (tuple(chars), c))
+        self.pos += 1
+        return c
+
+
+    def value(self, decoder):
+        """
+        Decode the next JSON value, reading more data until it's complete. Only the
+        syntax errors (e.g. an unterminated string) mean that more data is needed,
+        the errors of the decoder itself (e.g. a module not allowed) are raised
+        without reading any further.
+        Args:
+            decoder (json.JSONDecoder): The decoder to use.
+        Return:
+            object - The decoded value.
+        """
+        self.peek()
+        while True:
+            try:
+                obj, end = decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Incomplete value, read at least as much as what's already buffered
+                # so that a large value isn't parsed again for every single chunk:
+                if not self.fill(len(self.buf) - self.pos):
+                    raise
+                continue
+            # Numbers could continue in the next chunk (e.g. "1." is parsed as 1),
+            # unless they're followed by a delimiter (other values end by themselves):
+            if self.buf[self.pos] in _NUMBER_START and _DELIMITER.search(self.buf, end) is None and self.fill():
+                continue
+            self.pos = end
+            return obj
+
+
+    def skip(self):
+        """
+        Decode the next JSON value without reconstructing any object.
+        Return:
+            object - The raw value.
+        """
+        return self.value(self._skip_decoder)
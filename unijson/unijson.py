@@ -15,16 +15,15 @@ limitations under the License.
 """
 
 from __future__ import absolute_import
-import sys, warnings
+import os, sys, warnings
 
 # Core features:
 import json
-import types, importlib, re, __main__
+import gc, importlib, itertools, operator, re, timeit, types, __main__
 
 # Convertible types:
-import datetime, pytz
-# Used to parse datetimes/dates/times:
-import parse
+import array, base64, binascii, datetime, struct
+# Remark: pytz and parse are only imported when their codecs are actually needed.
 
 
 #########################################################################################
@@ -53,7 +52,7 @@ def dumps(obj, **kwargs):
     return json.dumps(obj, cls = UniversalJSONEncoder, **kwargs)
 
 
-def dump(obj, fp, **kwargs):
+def dump(obj, fp, compression=None, compresslevel=None, **kwargs):
     """
     Serialise a given object into a JSON formatted file / stream. This function
     uses the `UniversalJSONEncoder` instead of the default JSON encoder provided
@@ -61,10 +60,22 @@ def dump(obj, fp, **kwargs):
     except for `cls` that is used to pass our custom encoder.
     Args:
         obj (object): The object to serialise.
-        fp (file-like object): A .write()-supporting file-like object.
+        fp (file-like object): A .write()-supporting file-like object (binary
+            if `compression` is given).
+        compression (str): If provided, the JSON string is encoded in UTF-8 and
+            compressed as it's produced with "gzip", "zlib", "bz2" or "lzma"
+            (see `unijson.compression`). Default: None.
+        compresslevel (int): The compression level. Default: None (the default
+            level of the format).
         kwargs (**): Keyword arguments normally passed to `json.dump()` except
             for `cls`. Unpredictable behaviour might occur if `cls` is passed.
     """
+    if compression is not None:
+        from .compression import compressed_writer
+        with compressed_writer(fp, compression, compresslevel) as f:
+            for chunk in UniversalJSONEncoder(**kwargs).iterencode_batches(obj):
+                f.write(chunk)
+        return
     json.dump(obj, fp, cls = UniversalJSONEncoder, **kwargs)
 
 
@@ -74,28 +85,103 @@ def loads(s, **kwargs):
     `UniversalJSONDecoder`. Takes the same keyword arguments as `json.loads()`
     except for `cls` that is used to pass our custom decoder.
     Args:
-        s (str): The JSON formatted string to decode.
+        s (str, bytes, bytearray or memoryview): The JSON formatted string to decode.
+            Binary data is decoded directly into a str, its encoding (UTF-8, 16
+            or 32) being detected like `json.loads()` does.
         kwargs (**): Keyword arguments normally passed to `json.loads()` except
             for `cls`. Unpredictable behaviour might occur if `cls` is passed.
     Return:
         object - A Python object corresponding to the provided JSON formatted string.
     """
+    if isinstance(s, memoryview):
+        s = _decode_buffer(s)
     return json.loads(s, cls = UniversalJSONDecoder, **kwargs)
 
 
-def load(fp, **kwargs):
+def load(fp, compression=None, **kwargs):
     """
     Deserialise a given JSON formatted stream / file into a Python object using
     the `UniversalJSONDecoder`. Takes the same keyword arguments as `json.load()`
     except for `cls` that is used to pass our custom decoder.
     Args:
         fp (file-like object): A .write()-supporting file-like object.
+        compression (str): If provided, the (binary) stream / file is decompressed
+            with "gzip", "zlib", "bz2", "lzma" or "auto" to detect the format from
+            its first bytes (see `unijson.compression`). The whole JSON string is
+            decompressed before being decoded (see `unijson.iter_items()` and
+            `unijson.load_lines()` to decode large files chunk by chunk).
+            Default: None.
         kwargs (**): Keyword arguments normally passed to `json.load()` except
             for `cls`. Unpredictable behaviour might occur if `cls` is passed.
     Return:
         object - A Python object corresponding to the provided JSON formatted stream / file.
     """
-    return json.load(fp, cls = UniversalJSONDecoder, **kwargs)
+    if compression is not None:
+        from .compression import decompressed_reader
+        return json.loads(decompressed_reader(fp, compression).read(), cls = UniversalJSONDecoder, **kwargs)
+    s = fp.read()
+    if isinstance(s, (bytes, bytearray)) and not isinstance(s, str):
+        # Decoded here so that the bytes are freed before the document is decoded:
+        s = _decode_buffer(s)
+    return json.loads(s, cls = UniversalJSONDecoder, **kwargs)
+
+
+def load_path(fp, pointer, **kwargs):
+    """
+    Deserialise only the value found at a given JSON Pointer (RFC 6901) in a JSON
+    formatted stream / file. The rest of the document is parsed without building
+    any object (see the `select` option of the `UniversalJSONDecoder`).
+    Args:
+        fp (file-like object): A .read()-supporting file-like object.
+        pointer (str): The JSON Pointer (e.g. "/config/limits").
+        kwargs (**): Keyword arguments normally passed to `json.load()` except
+            for `cls`. Unpredictable behaviour might occur if `cls` is passed.
+    Return:
+        object - A Python object corresponding to the selected value.
+    Raises:
+        KeyError - If a key of the pointer can't be found.
+        IndexError - If an index of the pointer is out of range.
+    """
+    return load(fp, select=[pointer], **kwargs)[0]
+
+
+def load_mmap(path, **kwargs):
+    """
+    Deserialise a given JSON formatted file into a Python object using the
+    `UniversalJSONDecoder`. The file is memory-mapped and decoded directly into
+    the str given to the decoder, without reading it into an intermediate buffer
+    first, which halves the memory used for large files compared to `load()`.
+    Args:
+        path (str): The path of the file. Its encoding (UTF-8, 16 or 32) is
+            detected like `json.loads()` does.
+        kwargs (**): Keyword arguments normally passed to `json.loads()` except
+            for `cls`. Unpredictable behaviour might occur if `cls` is passed.
+    Return:
+        object - A Python object corresponding to the provided JSON formatted file.
+    """
+    import mmap
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            s = "" # Empty files can't be memory-mapped (the decoder raises the error)
+        else:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                s = _decode_buffer(m)
+            finally:
+                m.close()
+    return json.loads(s, cls = UniversalJSONDecoder, **kwargs)
+
+
+def _decode_buffer(b):
+    """
+    Decode a JSON document held in a buffer into a str, detecting its encoding like
+    `json.loads()` does for bytes.
+    Args:
+        b (bytes-like object): The buffer (memoryview, mmap...).
+    Return:
+        str - The decoded document.
+    """
+    return str(b, json.detect_encoding(bytes(b[:4])), "surrogatepass")
 
 
 #########################################################################################
@@ -108,6 +194,31 @@ def load(fp, **kwargs):
 # ----------------------------
 
 
+# Types natively supported by the JSON encoder (None aside):
+_JSON_TYPES = (str, int, float, list, tuple, dict)
+_JSON_CONTAINERS = (list, tuple, dict)
+# Types of the values that can't contain anything (see `_has_named_tuples()` and
+# `UniversalJSONEncoder._columnarize()`):
+_SCALAR_TYPES = frozenset([str, int, float, bool, type(None)])
+# Clock used to collect statistics (see `unijson.stats.CodecStats`):
+_timer = timeit.default_timer
+
+
+def _check_registration(obj_type, function):
+    """
+    Check the arguments given to register an encoding / decoding function.
+    Args:
+        obj_type (type or str): The type (or its qualified name).
+        function (function): The encoding / decoding function.
+    Raises:
+        ValueError - If the type or the function is invalid.
+    """
+    if not isinstance(obj_type, (type, str)):
+        raise ValueError("Expected a type/class, a %s was passed instead." % type(obj_type))
+    if not callable(function):
+        raise ValueError("Expected a function, a %s was passed instead." % type(function))
+
+
 class UniversalJSONEncoder(json.JSONEncoder):
     """
     A universal JSON encoder for Python objects. This encoder will work with
@@ -134,6 +245,11 @@ class UniversalJSONEncoder(json.JSONEncoder):
     """
     # The registered encoding functions:
     _encoders = {}
+    # The encoding functions replacing them when using compact ISO 8601 datetimes:
+    _iso_encoders = {}
+    # The compiled encoding plans (see `_compile_plan()`), with and without ISO datetimes:
+    _plans = {}
+    _iso_plans = {}
 
     @staticmethod
     def register(obj_type, encoding_function):
@@ -142,29 +258,307 @@ class UniversalJSONEncoder(json.JSONEncoder):
         encoder should take a single argument (the object to serialise) and return
         a JSON serialisable dictionnary (by the standard of this serialiser).
         Passing a new encoding function to a type already registered will overwrite
-        the previously registered encoding function.
+        the previously registered encoding function. The function is also used for
+        the subclasses of the provided type unless they have their own.
         Args:
             type (obj_type): The type to be encoded by the provided encoder. Can be
-                easily obtained by simply providing a class directly.
+                easily obtained by simply providing a class directly. The qualified
+                name of the type (e.g. "pytz.tzinfo.BaseTzInfo") can be provided
+                instead so that its module does not have to be imported beforehand.
             encoding_function (function): The function to use as an encoder for the
                 provided type. Takes a single argument, a returns a dictionnary.
         """
-        if not isinstance(obj_type, type):
-            raise ValueError("Expected a type/class, a %s was passed instead." % type(obj_type))
-        if not callable(encoding_function):
-            raise ValueError("Expected a function, a %s was passed instead." % type(encoding_function))
-
+        _check_registration(obj_type, encoding_function)
         UniversalJSONEncoder._encoders[obj_type] = encoding_function
+        UniversalJSONEncoder._plans.clear()
+        UniversalJSONEncoder._iso_plans.clear()
+
+
+    def __init__(self, *args, **kwargs):
+        """
+        Constructor of the encoder. Takes the same arguments as `json.JSONEncoder`
+        plus the following keyword arguments:
+        Args:
+            iso_datetimes (bool): If True, datetimes and times are encoded as a single
+                ISO 8601 string (followed by the name of their timezone if it comes
+                from pytz) instead of a string and a nested timezone object. Faster
+                and more compact. Decoding them requires Python 3.7+. Default: False.
+            type_table (bool): If True, the classes and modules of the objects are
+                written once in a table at the beginning of the document and the
+                objects only refer to them by their index in that table (`__type__`).
+                More compact for documents with many objects of the same classes.
+                The whole document is kept in memory until the table is complete.
+                Default: False.
+            columnar (bool or int): If True, runs of objects of the same class with
+                the same attributes in lists are encoded as a single object holding
+                a list of values per attribute (`__columns__`). If an int, it's the
+                minimum length of the runs (default: 4). The whole document is kept
+                in memory until it's known whether it has columns. Default: False.
+            references (bool): If True, an object found several times in the document
+                is only encoded the first time (with an `__id__`) and then referred to
+                (`{"__ref__": id}`), so that the decoder rebuilds the same shared
+                objects. Cycles going through objects are supported too. Only applies
+                to the objects that are not natively supported by JSON (not to lists
+                and dictionaries). Can't be combined with `columnar`. Default: False.
+            stats (unijson.stats.CodecStats): If provided, statistics about the
+                objects encoded are collected in it. Default: None.
+            codec (unijson.codec.Codec): If provided, the encoding functions registered
+                in that codec are used instead of those registered globally. Default: None.
+            backend (str or unijson.backends.Backend): The JSON library writing the
+                documents: "json" (standard library), "simplejson", "orjson" or "auto"
+                (the fastest one installed writing the same documents as the standard
+                library, see `unijson.backends`). Default: "json".
+            schema (type): The type of the documents (a dataclass, a NamedTuple or an
+                annotation such as `List[MyDataclass]`, see `unijson.schema`). Its
+                dataclasses and NamedTuples are encoded without `__class__` and
+                `__module__`, the decoder needs the same schema. Requires Python 3.7+.
+                Default: None.
+            named_tuples (bool): If True, NamedTuples are encoded like any other class
+                (as JSON objects with their type tags, rebuilt as such) instead of JSON
+                arrays. The standard library writes them without calling `default()`,
+                so every document is searched for them (in its lists, tuples and
+                dictionaries), which costs a little even without any. Default: False.
+        Raises:
+            ValueError - If both `references` and `columnar` are requested, or if the
+                backend is unknown, not installed or doesn't support the options.
+        """
+        codec = kwargs.pop("codec", None)
+        backend = kwargs.pop("backend", None)
+        schema = kwargs.pop("schema", None)
+        self.iso_datetimes = kwargs.pop("iso_datetimes", False)
+        self.stats = kwargs.pop("stats", None)
+        self.type_table = kwargs.pop("type_table", False)
+        self.columnar = kwargs.pop("columnar", False)
+        self.references = kwargs.pop("references", False)
+        named_tuples = kwargs.pop("named_tuples", False)
+        if self.references and self.columnar:
+            raise ValueError("Objects encoded in columns can't be referred to, references and columnar "
+                             "can't be used together.")
+        json.JSONEncoder.__init__(self, *args, **kwargs)
+        if self.references:
+            # The JSON encoder would also flag the objects referred to while being
+            # encoded, the lists / dictionaries containing themselves are detected
+            # by `_check_cycles()` instead:
+            self.check_circular = False
+        # The registry of the codec (a snapshot, see `unijson.codec.Codec`):
+        self._registry = None if codec is None else codec._registry
+        if self._registry is not None:
+            if self.iso_datetimes:
+                self._encoders, self._plans = self._registry.iso_encoders, self._registry.iso_plans
+            else:
+                self._encoders, self._plans = self._registry.encoders, self._registry.plans
+        elif self.iso_datetimes:
+            self._encoders = dict(UniversalJSONEncoder._encoders)
+            self._encoders.update(UniversalJSONEncoder._iso_encoders)
+            self._plans = UniversalJSONEncoder._iso_plans
+        # The function converting the objects of the schema into dictionaries:
+        self._schema_encode = None
+        if schema is not None:
+            from .schema import compile_schema
+            self._schema_encode = compile_schema(schema).encode
+        # Whether the named tuples are encoded as objects and whether they have to be
+        # replaced before the documents are written, in the values returned by `default()`
+        # as well: the standard library writes them as arrays, without calling `default()`
+        # (see `_encode_named_tuples()`):
+        self._named_tuples = self._find_named_tuples = named_tuples
+        # The function writing the documents if it's not the standard library:
+        self._write = None
+        if backend is not None and backend != "json":
+            from .backends import bind
+            self._write = bind(backend, self)
+        # The ids of the (module, class) in the type table of the document being encoded:
+        self._type_ids = None
+        # The ids of the objects already encoded in the document, with the objects
+        # themselves (kept alive until the end so that their id() can't be reused):
+        self._refs = None
+        # The features used by the document being encoded (see `iterencode()`):
+        self._features = None
+
+
+    def iterencode(self, o, _one_shot=False):
+        """
+        Encode the given object and yield each string representation as available.
+        Extends the default behaviour to add the type table and to encode lists in
+        columns if it's requested. The document is then preceded by a header listing
+        the features it uses (`__features__`: "columnar", "references") and its type table
+        (`__types__`), the object itself being the value of `__data__`.
+        Args:
+            o (object): The object to serialise.
+        Return:
+            generator - The chunks of the JSON string.
+        """
+        if self._schema_encode is not None:
+            o = self._schema_encode(o)
+        if not self.type_table and not self.references and not self.columnar:
+            if self._find_named_tuples and _has_named_tuples((o,)):
+                o = self._encode_named_tuples(o)
+            if self._write is not None:
+                return (self._write(o),)
+            return json.JSONEncoder.iterencode(self, o, _one_shot)
+
+        # The header is only complete once the whole object has been encoded and the
+        # references only apply to a single document:
+        self._type_ids = {} if self.type_table else None
+        self._refs = {} if self.references else None
+        self._features = set()
+        try:
+            if self.columnar:
+                o = self._columnarize(o)
+            if self._find_named_tuples and _has_named_tuples((o,)):
+                o = self._encode_named_tuples(o)
+            try:
+                if self._write is not None:
+                    chunks = [self._write(o)]
+                else:
+                    chunks = list(json.JSONEncoder.iterencode(self, o, _one_shot))
+            except RuntimeError: # RecursionError
+                if self.references:
+                    self._check_cycles(o)
+                raise
+            table = None if self._type_ids is None else sorted(self._type_ids, key=self._type_ids.get)
+            if self._refs:
+                self._features.add("references")
+            features = sorted(self._features)
+        finally:
+            self._type_ids = None
+            self._refs = None
+            self._features = None
+        header = []
+        if features:
+            header.append(("__features__", features))
+        if table:
+            header.append(("__types__", [list(t) for t in table]))
+        if not header:
+            return chunks # Nothing specific, no header
+        separators = (self.item_separator, self.key_separator)
+        header = "{%s\"__data__\"%s" % ("".join('"%s"%s%s%s' % (k, self.key_separator, json.dumps(v, separators=separators),
+                                                              self.item_separator) for k, v in header), self.key_separator)
+        return itertools.chain((header,), chunks, ("}",))
+
+
+    def _check_cycles(self, o):
+        """
+        Encode the object again with the Python implementation of the JSON encoder,
+        only marking the lists, tuples and dictionaries: with references, the cycles
+        going through other objects are broken by the references, but not those of
+        the lists / dictionaries containing themselves (found when the encoding
+        failed, so it costs nothing otherwise).
+        Args:
+            o (object): The object that failed to be serialised.
+        Raises:
+            ValueError - If a list / dictionary contains itself.
+        """
+        if self.ensure_ascii:
+            _encoder = json.encoder.encode_basestring_ascii
+        else:
+            _encoder = json.encoder.encode_basestring
+
+        def floatstr(f):
+            if f != f:
+                text = "NaN"
+            elif f in (float("inf"), float("-inf")):
+                text = "Infinity" if f > 0 else "-Infinity"
+            else:
+                return float.__repr__(f)
+            if not self.allow_nan:
+                raise ValueError("Out of range float values are not JSON compliant: %r" % f)
+            return text
+
+        self._refs = {}
+        stats, self.stats = self.stats, None # Already counted
+        try:
+            iterencode = json.encoder._make_iterencode(
+                _ContainerMarkers(), self.default, _encoder, self.indent, floatstr, self.key_separator,
+                self.item_separator, self.sort_keys, self.skipkeys, False)
+            for _ in iterencode(o, 0):
+                pass
+        except RuntimeError: # Too deep, the original error is raised
+            pass
+        finally:
+            self.stats = stats
+
+
+    def iterencode_batches(self, o, batch_size=1000):
+        """
+        Encode the given object chunk by chunk like `iterencode()`, with the same
+        result. `iterencode()` walks the whole object in Python (the C encoder of
+        the standard library is only used to encode a document at once), instead
+        large lists and dictionaries are split into batches of items, each encoded
+        at once. Much faster, while still not holding the whole JSON string.
+        Documents that can't be split (with a type table, references, columns, a
+        schema, an indentation or a backend) are encoded by `iterencode()`.
+        Args:
+            o (object): The object to serialise.
+            batch_size (int): The number of items of a list / dictionary to encode
+                at once.
+        Return:
+            iterable - The chunks of the JSON string.
+        """
+        if self.indent is not None or self._encodes_at_once():
+            return self.iterencode(o)
+        return self._iterencode_batches(o, batch_size, {} if self.check_circular else None)
+
+
+    def _encodes_at_once(self):
+        """
+        Check whether the documents are entirely encoded before `iterencode()` yields
+        its first chunk: with a type table, references, columns, a schema or a backend.
+        Return:
+            bool - True if the documents can't be encoded chunk by chunk.
+        """
+        return bool(self.type_table or self.references or self.columnar) or \
+            self._schema_encode is not None or self._write is not None
+
+
+    def _iterencode_batches(self, o, batch_size, markers):
+        """Generator of `iterencode_batches()` (large lists and dictionaries are split)."""
+        t = type(o)
+        if (t is list or t is tuple) and len(o) > batch_size:
+            yield "["
+            for i in range(0, len(o), batch_size):
+                if i:
+                    yield self.item_separator
+                yield self.encode(o[i:i + batch_size])[1:-1] # Without the brackets
+            yield "]"
+        elif t is dict and all(isinstance(k, str) for k in o):
+            items = sorted(o.items()) if self.sort_keys else list(o.items())
+            if markers is not None:
+                if id(o) in markers:
+                    raise ValueError("Circular reference detected")
+                markers[id(o)] = o
+            yield "{"
+            if len(items) > batch_size:
+                for i in range(0, len(items), batch_size):
+                    if i:
+                        yield self.item_separator
+                    yield self.encode(dict(items[i:i + batch_size]))[1:-1]
+            else:
+                # Few keys, the values may be large lists / dictionaries themselves:
+                for i, (k, v) in enumerate(items):
+                    if i:
+                        yield self.item_separator
+                    yield self.encode(k)
+                    yield self.key_separator
+                    for chunk in self._iterencode_batches(v, batch_size, markers):
+                        yield chunk
+            yield "}"
+            if markers is not None:
+                del markers[id(o)]
+        else:
+            yield self.encode(o)
 
 
     def default(self, obj):
         """
         Extends the default behaviour of the default JSON encoder. It will try
         the different methods to encode the provided object in the following order:
-         - Default JSON encoder (for known types)
-         - Registered encoding function (if one is found)
+         - Registered encoding function (for the type itself or one of its bases)
          - `__json_encode__()` as provided by the custom class (if it's found)
-         - Use the default __dict__ property of the object (for custom classes)
+         - `__getstate__()` as provided by the custom class (if it's found)
+         - Use the __dict__ property and / or the __slots__ of the object (for custom classes)
+        The way to encode a given type is only resolved once and then cached (see
+        `_compile_plan()`), so encoding many instances of the same class only costs
+        the call to the selected method.
         Args:
             obj (object): The object to serialise.
         Return:
@@ -172,55 +566,256 @@ class UniversalJSONEncoder(json.JSONEncoder):
         Raises:
             TypeError - If none of the methods worked.
         """
-        # Default JSON encoder:
-        try:
-            return json.JSONEncoder.default(self, obj)
-        except TypeError:
-            pass
+        plan = self._plans.get(type(obj))
+        if plan is None:
+            if type(obj) is LazyObject:
+                return obj._materialize() # Encoded by the JSON encoder (calling default() again)
+            plan = self._compile_plan(obj)
+
+        refs = self._refs
+        if refs is not None:
+            ref = refs.get(id(obj))
+            if ref is not None:
+                return {"__ref__": ref[0]}
+            refs[id(obj)] = (len(refs), obj)
+        strategies, cls, mod = plan
+        stats = self.stats
+        if stats is not None:
+            start = _timer()
+
+        # Normally, the first strategy works and the others are never tried:
+        for encode, message in strategies:
+            try:
+                d = encode(obj)
+            except Exception:
+                if stats is not None:
+                    stats.record_failure("encode", "%s.%s" % (mod, cls), _get_function_name(encode))
+                if message is not None:
+                    warnings.warn(message % type(obj))
+                continue
+            break
+        else:
+            # If nothing worked, raise an exception like the default JSON encoder would:
+            raise TypeError("Type %s is not JSON serializable." % type(obj))
 
-        already_encoded = False
+        if stats is not None:
+            stats.record("encode", "%s.%s" % (mod, cls), _get_function_name(encode), _timer() - start)
 
-        # Use a registered encoding function:
-        if type(obj) in UniversalJSONEncoder._encoders:
-            try:
-                d = UniversalJSONEncoder._encoders[type(obj)](obj)
-                already_encoded = True
-            except:
-                warnings.warn("Encoding function %s used for type %s raised an exception. Trying something else." % \
-                    (UniversalJSONEncoder._encoders[type(obj)].__name__, type(obj)))
-
-        # Trying to use __json_encode__():
-        if not already_encoded:
-            try:
-                d = obj.__json_encode__()
-                already_encoded = True
-            except AttributeError: # No method __json_encode__() found
-                pass
-            except:
-                warnings.warn("Method __json_encode__() used for type %s raised an exception. Trying something else." % \
-                    type(obj))
+        # Add the metadata used to reconstruct the object (if necessary):
+        if self._type_ids is None:
+            if "__class__" not in d: d["__class__"] = cls
+            if "__module__" not in d: d["__module__"] = mod
+        else:
+            key = (d.pop("__module__", mod), d.pop("__class__", cls))
+            type_id = self._type_ids.get(key)
+            if type_id is None:
+                type_id = self._type_ids[key] = len(self._type_ids)
+            d["__type__"] = type_id
+        if refs is not None:
+            d["__id__"] = refs[id(obj)][0]
+
+        # The lists in the attributes have to be encoded in columns as well:
+        if self.columnar and not _SCALAR_TYPES.issuperset(map(type, d.values())):
+            for k, v in d.items():
+                if isinstance(v, _JSON_CONTAINERS):
+                    d[k] = self._columnarize(v)
+        if self._find_named_tuples and _has_named_tuples(d.values()):
+            d = self._encode_named_tuples(d)
 
-        # Trying the default __dict__ attribute:
-        if not already_encoded:
-            try:
-                d = dict(obj.__dict__)
-                already_encoded = True
-            except AttributeError: pass
+        return d
 
-        # If nothing worked, raise an exception like the default JSON encoder would:
-        if not already_encoded:
-            raise TypeError("Type %s is not JSON serializable." % type(obj))
 
-        # Add the metadata used to reconstruct the object (if necessary):
-        if "__class__" not in d: d["__class__"] = str(obj.__class__.__name__)
-        if "__module__" not in d: d["__module__"] = _get_object_module(obj)
+    def _encode_named_tuples(self, o, stack=()):
+        """
+        Replace the named tuples found in the lists, tuples and dictionaries of an
+        object with the dictionaries returned by `default()`: the JSON encoder would
+        write them as arrays, without their type. Only called if there are some (see
+        `_has_named_tuples()`), the containers holding other containers are copied.
+        Args:
+            o (object): The object to prepare.
+            stack (tuple): The ids of the containers being prepared (a cycle is left
+                to the JSON encoder to report).
+        Return:
+            object - The object to encode instead.
+        """
+        if isinstance(o, dict):
+            values = o.values()
+        elif isinstance(o, (list, tuple)):
+            if _is_named_tuple(type(o)):
+                return self.default(o)
+            values = o
+        else:
+            return o
+        if id(o) in stack or not any(issubclass(t, _JSON_CONTAINERS) for t in set(map(type, values))):
+            return o
+
+        # Plain loops, one frame per level (as deep as the JSON encoder can go):
+        stack += (id(o),)
+        if isinstance(o, dict):
+            prepared = {}
+            for k, v in o.items():
+                prepared[k] = self._encode_named_tuples(v, stack)
+        else:
+            prepared = []
+            for v in o:
+                prepared.append(self._encode_named_tuples(v, stack))
+        return prepared
+
+
+    def _columnarize(self, o, prepared=False):
+        """
+        Prepare an object for columnar encoding: in all the lists found in the object,
+        the runs of objects of the same class with the same attributes are replaced
+        by a single object holding a list of values per attribute. A list containing
+        such runs is replaced by an object holding its segments (`__runs__`).
+        Args:
+            o (object): The object to prepare.
+            prepared (bool): True if the items of the given list have already been
+                prepared (only the runs remain to be found).
+        Return:
+            object - The object to encode instead.
+        """
+        if isinstance(o, dict):
+            if _SCALAR_TYPES.issuperset(map(type, o.values())):
+                return o
+            return dict((k, self._columnarize(v)) for k, v in o.items())
+        if not isinstance(o, (list, tuple)) or _SCALAR_TYPES.issuperset(map(type, o)) or \
+                self._named_tuples and _is_named_tuple(type(o)):
+            return o
 
+        min_run = 4 if self.columnar is True else self.columnar
+        segments, plain = [], []
+        # The items are read by runs of the same type:
+        for t, run in itertools.groupby(o, type):
+            if t in _SCALAR_TYPES or issubclass(t, _JSON_TYPES) and not (self._named_tuples and _is_named_tuple(t)):
+                plain.extend(run if prepared or t in _SCALAR_TYPES else map(self._columnarize, run))
+                continue
+            run = list(run)
+            if len(run) < min_run:
+                plain.extend(run)
+                continue
+            # The objects are only encoded once, even if they can't be merged:
+            rows = list(map(self.default, run))
+            block = self._encode_columns(rows)
+            if block is None:
+                plain.extend(rows)
+            else:
+                if plain:
+                    segments.append(plain)
+                    plain = []
+                segments.append(block)
+
+        if not segments:
+            return plain
+        if plain:
+            segments.append(plain)
+        elif len(segments) == 1:
+            return segments[0] # Decoded as a list anyway
+        return {"__runs__": segments}
+
+
+    def _encode_columns(self, rows):
+        """
+        Merge objects of the same class, as encoded by `default()`, into a single
+        object holding a list of values per attribute.
+        Args:
+            rows (list): The encoded objects (left as they are).
+        Return:
+            dict - The merged objects or None if they can't be merged (if they don't
+                have the same attributes for instance).
+        """
+        first = rows[0]
+        tags = dict((k, first[k]) for k in ("__class__", "__module__", "__type__") if k in first)
+        if len(first) == len(tags):
+            return None
+        if not all(map(first.keys().__eq__, map(dict.keys, rows))):
+            return None
+        for k, v in tags.items():
+            if not all(map(operator.eq, map(operator.itemgetter(k), rows), itertools.repeat(v))):
+                return None
+
+        # The values have already been prepared by `default()`:
+        d = tags
+        d["__columns__"] = dict((k, self._columnarize(list(map(operator.itemgetter(k), rows)), prepared=True))
+                                for k in first if k not in tags)
+        if self._features is not None:
+            self._features.add("columnar")
         return d
 
 
+    def _compile_plan(self, obj):
+        """
+        Resolve how objects of the same type as the given object should be encoded.
+        The encoding methods are looked up along the MRO of the type so that an
+        encoding function registered for a base class (or a `__json_encode__()`
+        method inherited from it) is used for all its subclasses. The resulting plan
+        is cached until a new encoding function is registered.
+        Args:
+            obj (object): An instance of the type to compile a plan for.
+        Return:
+            tuple - The list of (function, warning message) to try in order, the
+                name of the class and the name of the module of the type.
+        """
+        t = type(obj)
+        strategies = []
+
+        # The most specific registered function or __json_encode__() method wins:
+        for k in t.__mro__:
+            f = self._encoders.get(k) or self._encoders.get(_get_qualified_name(k))
+            if f is not None:
+                strategies.append((f, "Encoding function %s used for type %%s raised an exception. "
+                                      "Trying something else." % getattr(f, "__name__", f)))
+                break
+            if "__json_encode__" in vars(k):
+                break
+
+        # Fallbacks if a registered function fails:
+        if hasattr(t, "__json_encode__"):
+            strategies.append((operator.methodcaller("__json_encode__"),
+                               "Method __json_encode__() used for type %s raised an exception. "
+                               "Trying something else."))
+        if _has_custom_method(t, "__getstate__"):
+            strategies.append((_copy_state, None)) # Its attributes if the state is not a dict
+        fields = _compile_fields(t)
+        if fields is not None:
+            strategies.append((_make_fields_encoder(t, fields), None)) # Dataclasses and named tuples
+        elif _is_named_tuple(t):
+            strategies.append((operator.methodcaller("_asdict"), None))
+        strategies.append((_make_attributes_encoder(t), None))
+
+        plan = (tuple(strategies), str(t.__name__), _get_object_module(obj))
+        self._plans[t] = plan
+        return plan
+
+
+class _ContainerMarkers(dict):
+    """
+    The markers of the Python implementation of the JSON encoder (the ids of the
+    containers being encoded) only keeping the lists, tuples and dictionaries (see
+    `UniversalJSONEncoder._check_cycles()`).
+    """
+    def __setitem__(self, key, value):
+        if isinstance(value, _JSON_CONTAINERS):
+            dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        self.pop(key, None)
+
+
 #########################################################################################
 
 
+# The keys of the header written before the data, in order, and the features a
+# document can use (see `UniversalJSONEncoder.iterencode()`):
+_HEADER_KEYS = ("__features__", "__types__")
+_FEATURES = ("columnar", "references")
+# The first key of a document with a header and the following keys:
+_HEADER_START_EXPRESSION = re.compile(r'\s*\{\s*"(__features__|__types__)"\s*:\s*')
+_HEADER_NEXT_EXPRESSION = re.compile(r'\s*,\s*"(__types__|__data__)"\s*:\s*')
+# Decoder used to read what doesn't need to be reconstructed:
+_plain_decoder = json.JSONDecoder()
+
+
 class UniversalJSONDecoder(json.JSONDecoder):
     """
     A universal JSON decoder for Python objects. To be used with JSON strings created
@@ -239,6 +834,8 @@ class UniversalJSONDecoder(json.JSONDecoder):
     """
     # The registered decoding functions:
     _decoders = {}
+    # The resolved classes, per (module, class) (see `_resolve_class()`):
+    _classes = {}
 
     @staticmethod
     def register(obj_type, decoding_function):
@@ -250,34 +847,249 @@ class UniversalJSONDecoder(json.JSONDecoder):
         the previously registered decoding function.
         Args:
             type (obj_type): The type to be decoded by the provided decoder. Can be
-                easily obtained by simply providing a class directly.
+                easily obtained by simply providing a class directly. The qualified
+                name of the type (e.g. "pytz.tzinfo.BaseTzInfo") can be provided
+                instead so that its module does not have to be imported beforehand.
             decoding_function (function): The function to use as a decoder for the
                 provided type. Takes a single argument, a returns an object.
         """
-        if not isinstance(obj_type, type):
-            raise ValueError("Expected a type/class, a %s was passed instead." % type(obj_type))
-        if not callable(decoding_function):
-            raise ValueError("Expected a function, a %s was passed instead." % type(decoding_function))
-
+        _check_registration(obj_type, decoding_function)
         UniversalJSONDecoder._decoders[obj_type] = decoding_function
+        UniversalJSONDecoder._classes.clear()
 
 
     # Required to redirect the hook for decoding.
     def __init__(self, *args, **kwargs):
-        """Constructor redirecting the hook for decoding JSON objects."""
+        """
+        Constructor redirecting the hook for decoding JSON objects. Takes the same
+        arguments as `json.JSONDecoder` plus the following keyword arguments:
+        Args:
+            allowed_modules (iterable of str): The names of the modules from which
+                classes can be retrieved (submodules included). Objects from other
+                modules raise a ValueError instead of being imported. If None (the
+                default), all modules are allowed.
+            fail_fast (bool): If True, objects are only decoded using the main method
+                available for their class (registered decoding function, static method
+                `__json_decode__()`, attributes for objects using `__slots__` or
+                `__setstate__()`, or the constructor taking the raw dictionary as
+                arguments, in that order) and its exceptions are raised instead of
+                trying the other methods. Default: False.
+            lazy (bool): If True, the objects are not built while decoding the
+                document but replaced by proxies (see `LazyObject`) holding their raw
+                dictionary. An object is only built (and its module imported) when
+                it's first used. Use `materialize()` to build them all. Default: False.
+            select (iterable of str): If provided, only the values found at the given
+                JSON Pointers (RFC 6901, e.g. "/config/limits/0") are decoded and
+                returned in a list, in the same order. The rest of the document is
+                parsed without building any object. A pointer designates a value of
+                the JSON document (not an attribute of a Python object). Objects
+                referred to with `__ref__` outside of the selected values can't be
+                resolved (a ValueError is raised). Default: None (the whole document
+                is decoded).
+            stats (unijson.stats.CodecStats): If provided, statistics about the
+                objects decoded are collected in it. Default: None.
+            codec (unijson.codec.Codec): If provided, the decoding functions registered
+                in that codec are used instead of those registered globally. Default: None.
+            backend (str or unijson.backends.Backend): The JSON library parsing the
+                documents: "json" (standard library), "simplejson", "orjson" or "auto"
+                (the fastest one installed, see `unijson.backends`). Default: "json".
+            schema (type): The type of the documents, as given to the encoder (see
+                `unijson.schema`). Can't be combined with `select`. Default: None.
+        Raises:
+            ValueError - If the backend is unknown, not installed or doesn't support
+                the options, or if both `schema` and `select` are provided.
+        """
+        codec = kwargs.pop("codec", None)
+        backend = kwargs.pop("backend", None)
+        schema = kwargs.pop("schema", None)
+        # The registry of the codec (a snapshot, see `unijson.codec.Codec`):
+        self._registry = None if codec is None else codec._registry
+        if self._registry is not None:
+            self._decoders, self._classes = self._registry.decoders, self._registry.classes
+        self.stats = kwargs.pop("stats", None)
+        select = kwargs.pop("select", None)
+        self.select = None if select is None else [_parse_pointer(p) for p in select]
+        allowed_modules = kwargs.pop("allowed_modules", None)
+        self.allowed_modules = None if allowed_modules is None else frozenset(allowed_modules)
+        # The (module, class) pairs checked against the allowed modules (see `_check_allowed()`):
+        self._allowed_classes = set()
+        self.fail_fast = kwargs.pop("fail_fast", False)
+        self.lazy = kwargs.pop("lazy", False)
+        # The function building the objects of the schema from their dictionaries:
+        self._schema_decode = None
+        if schema is not None:
+            if self.select is not None:
+                raise ValueError("Selected values have no schema, schema and select can't be used together.")
+            from .schema import compile_schema
+            self._schema_decode = compile_schema(schema).decode
         json.JSONDecoder.__init__(self, object_hook=self.universal_decoder, *args, **kwargs)
+        # The function parsing the documents if it's not the standard library:
+        self._parse = None
+        if backend is not None and backend != "json":
+            from .backends import bind
+            self._parse = bind(backend, self)
+        # The header of the document being decoded, its type table and features:
+        self._use_header(None)
+        # The objects decoded so far per `__id__` (see the `references` option of the
+        # encoder) and the number of references to objects not decoded yet (cycles):
+        self._refs = {}
+        self._unresolved = 0
+
+
+    def decode(self, s, *args, **kwargs):
+        """
+        Decode a JSON document. Extends the default behaviour to read the header
+        written by the `UniversalJSONEncoder` (if there is one) before anything else.
+        Args:
+            s (str): The JSON document.
+        Return:
+            object - A Python object corresponding to the JSON document (or the list
+                of the selected values if `select` was provided).
+        """
+        self._refs, self._unresolved = {}, 0
+        if self.select is not None:
+            return self._decode_selected(s)
+        self._use_header(_read_header(_iter_header(s)))
+        try:
+            return self._decode_document(s, *args, **kwargs)
+        finally:
+            self._use_header(None)
+
+
+    def _use_header(self, header):
+        """
+        Set the type table and features of the document being decoded.
+        Args:
+            header (dict): The header of the document (see `_read_header()`), or None.
+        """
+        self._header = header
+        self._types = None if header is None else header.get("__types__")
+        features = () if header is None else header.get("__features__", ())
+        self._columnar = "columnar" in features
+        self._references = "references" in features
+
+
+    def _decode_document(self, s, *args, **kwargs):
+        """
+        Parse a JSON document with the backend, decoding the objects as they're found,
+        then build the objects of the schema (if there is one).
+        Args:
+            s (str): The JSON document.
+        Return:
+            object - A Python object corresponding to the JSON document (its data if
+                it has a header).
+        """
+        if self._parse is None:
+            o = json.JSONDecoder.decode(self, s, *args, **kwargs)
+        else:
+            o = self._parse(s)
+            if self._unresolved:
+                self._unresolved = 0
+                o = _replace_references(o, self._refs)
+        if self._header is not None and len(o) == len(self._header) + 1:
+            o = o["__data__"]
+        if self._schema_decode is not None:
+            o = self._schema_decode(o)
+        return o
+
+
+    def _decode_selected(self, s):
+        """
+        Decode only the values selected by the JSON Pointers provided (see `select`).
+        The document is parsed without building any object, then the selected values
+        are rebuilt.
+        Args:
+            s (str): The JSON document.
+        Return:
+            list - The selected values, in the same order as the pointers.
+        Raises:
+            KeyError - If a key of a pointer can't be found.
+            IndexError - If an index of a pointer is out of range.
+        """
+        raw = json.JSONDecoder(parse_float=self.parse_float, parse_int=self.parse_int,
+                               parse_constant=self.parse_constant, strict=self.strict).decode(s)
+        header = _read_header(iter(raw.items())) if isinstance(raw, dict) else None
+        if header is not None and len(raw) == len(header) + 1:
+            self._use_header(header)
+            raw = raw["__data__"]
+        # The deepest values are rebuilt first so that the values containing them
+        # are rebuilt with them (and remain reachable by the other pointers):
+        results = [None] * len(self.select)
+        root = [raw]
+        try:
+            for i in sorted(range(len(self.select)), key=lambda i: -len(self.select[i])):
+                holder, key = root, 0
+                for token in self.select[i]:
+                    o = holder[key]
+                    if self._columnar and isinstance(o, dict) and ("__columns__" in o or ("__runs__" in o and len(o) == 1)):
+                        o = holder[key] = _expand_columns(o) # A list encoded in columns
+                    holder, key = o, _pointer_key(o, token, self.select[i])
+                results[i] = holder[key] = self._rebuild(holder[key])
+        finally:
+            self._use_header(None)
+        if self._unresolved:
+            self._unresolved = 0
+            results = _replace_references(results, self._refs)
+        return results
+
+
+    def _rebuild(self, o):
+        """
+        Rebuild the objects in a raw value, like `universal_decoder()` does while
+        parsing (from the innermost objects to the outermost).
+        Args:
+            o (object): The raw value (as parsed). Lists and dicts are rebuilt in place.
+        Return:
+            object - The rebuilt value.
+        """
+        if isinstance(o, list):
+            for i, v in enumerate(o):
+                if isinstance(v, (list, dict)):
+                    o[i] = self._rebuild(v)
+            return o
+        if isinstance(o, dict):
+            for k, v in o.items():
+                if isinstance(v, (list, dict)):
+                    o[k] = self._rebuild(v)
+            return self.universal_decoder(o)
+        return o
+
+
+    def raw_decode(self, s, *args, **kwargs):
+        """
+        Decode a JSON document from a string that may have extraneous data at the end.
+        Extends the default behaviour to replace the references to objects that were
+        not decoded yet when they were found (cycles) once the document is decoded.
+        Args:
+            s (str): The string starting with a JSON document.
+        Return:
+            tuple - The Python object and the index where the document ended.
+        """
+        o, end = json.JSONDecoder.raw_decode(self, s, *args, **kwargs)
+        if self._unresolved:
+            self._unresolved = 0
+            o = _replace_references(o, self._refs)
+        return o, end
 
 
     def universal_decoder(self, d):
         """
         Universal decoder for JSON objects encoded using the UniversalJSONEncoder.
-        It will try the following methods in order:
-         - Default JSON encoder (for known types)
-         - Registered encoding function (if one is found)
-         - `__json_encode__()` as provided by the custom class (if it's found)
+        The dictionaries without type tags are returned as they are. For the others,
+        the class is imported and the following methods are tried in order:
+         - Registered decoding function for the class itself (by class or by
+           qualified name, in the global registry or the codec's)
+         - Registered decoding function for one of its bases, looked up along its
+           MRO unless a more specific class defines `__json_decode__()`
+         - `__json_decode__()` as provided by the custom class (if it's found)
+         - Only if none of the above exists: the functions generated from the
+           fields of dataclasses and named tuples, then the attributes set without
+           calling the constructor (`__setstate__()`, `__slots__` or the fields not
+           taken by the constructor of a dataclass)
          - Use a constructor taking as argument the raw dictionary
          - Use the default constructor and replace the __dict__ property of the
            object (for custom classes)
+        The methods are resolved once per class (see `_resolve_class()`).
         Args:
             d (dict): A raw dictionnary obtained from the JSON string to be made
                 into a beautiful Python object.
@@ -285,59 +1097,406 @@ class UniversalJSONDecoder(json.JSONDecoder):
             object - A Python object corresponding to the provided JSON object. If
                 nothing could be done for that object, the raw dictionary is returned
                 as is.
+        Raises:
+            ValueError - If the module of the object is not in the allowed modules or
+                its type is not in the type table.
         """
-        # Base object:
-        if "__class__" not in d:
-            return d
-
         # Get the class and module of the object:
-        cls = d.pop("__class__")
-        mod = d.pop("__module__")
-
-        # Import the necessary module if not already imported:
-        # (necessary to retrieve the class as an attribute of the module)
-        all_mods = _get_imported_modules()
-        if mod not in all_mods:
-            m = importlib.import_module(mod)
-            c = getattr(m, cls)
+        if "__class__" in d:
+            cls = d.pop("__class__")
+            mod = d.pop("__module__")
+        elif self._types is not None and "__type__" in d:
+            t = d.pop("__type__")
+            if not isinstance(t, int) or not 0 <= t < len(self._types):
+                raise ValueError("Type %r not found in the type table of the document." % (t,))
+            mod, cls = self._types[t]
+        elif self._columnar and "__runs__" in d and len(d) == 1:
+            return list(itertools.chain.from_iterable(d["__runs__"])) # A list encoded in columns
+        elif self._references and "__ref__" in d and len(d) == 1:
+            return self._dereference(d["__ref__"]) # An object found earlier in the document
         else:
-            c = getattr(all_mods[mod], cls)
+            return d # Base object
+
+        if self.allowed_modules is not None and not self._is_allowed(mod):
+            raise ValueError("Module %s is not allowed, can't decode an object of class %s." % (mod, cls))
+        if self.lazy:
+            return self._defer(mod, cls, d)
+
+        # Retrieve the class and its decoding function (only resolved once):
+        resolved = self._classes.get((mod, cls))
+        if resolved is None:
+            resolved = self._resolve_class(mod, cls)
+        if self.allowed_modules is not None and resolved[0] not in self._allowed_classes:
+            self._check_allowed(resolved)
+
+        # Objects encoded in columns:
+        if self._columnar and "__columns__" in d:
+            columns = d["__columns__"]
+            return [self._construct(resolved, dict(zip(columns, values))) for values in zip(*columns.values())]
+
+        # Objects that may be referred to later on:
+        if self._references and "__id__" in d:
+            ref = d.pop("__id__")
+            o = self._refs[ref] = self._construct(resolved, d)
+            return o
 
-        # Registered decoder if any:
-        if c in UniversalJSONDecoder._decoders:
-            try:
-                return UniversalJSONDecoder._decoders[c](d)
-            except:
-                warnings.warn("Decoding function %s used for type %s raised an exception. Trying something else." % \
-                    (UniversalJSONDecoder._decoders[c].__name__, c))
+        return self._construct(resolved, d)
 
-        # __json_decode__() static method if any:
-        try:
-            return getattr(c, "__json_decode__")(d)
-        except AttributeError:
-            pass
-        except:
-            warnings.warn("Static method __json_deconde__ used for type %s raised an exception. Trying something else." % c)
 
-        # Try the constructor with the dictionary as arguments:
-        try:
-            return c(**d)
-        except:
-            pass
+    def _defer(self, mod, cls, d):
+        """
+        Replace an object (or objects encoded in columns) by a proxy building it when
+        it's first used.
+        Args:
+            mod (str): The name of the module containing the class of the object.
+            cls (str): The name of the class of the object.
+            d (dict): The raw dictionary, without its class and module.
+        Return:
+            LazyObject or list - The proxy (or proxies for objects encoded in columns).
+        """
+        if self._columnar and "__columns__" in d:
+            columns = d["__columns__"]
+            return [LazyObject(self, mod, cls, dict(zip(columns, values))) for values in zip(*columns.values())]
+        ref = d.pop("__id__", None) if self._references else None
+        o = LazyObject(self, mod, cls, d)
+        if ref is not None:
+            self._refs[ref] = o
+        return o
 
-        # Try the default constructor (no arguments)
-        # and replace __dict__
-        try:
-            o = c()
-            o.__dict__ = d
+
+    def _dereference(self, ref):
+        """
+        Get the object with the given `__id__`. If it's not decoded yet (a reference
+        to one of the objects containing it, i.e. a cycle), a placeholder is returned
+        and replaced by the object once the whole document is decoded.
+        Args:
+            ref (int): The id of the object.
+        Return:
+            object - The object or its placeholder.
+        Raises:
+            ValueError - If the id is not valid.
+        """
+        if not isinstance(ref, int):
+            raise ValueError("Invalid reference %r, ids are integers." % (ref,))
+        if ref in self._refs:
+            return self._refs[ref]
+        self._unresolved += 1
+        return _Reference(ref)
+
+
+    def _construct(self, resolved, d):
+        """
+        Build an object from its raw dictionary using the first method that works
+        (see `universal_decoder()`). When a method only works after others failed,
+        it will be tried first for the next objects of the same class (unless the
+        methods that failed were provided for that class specifically).
+        Args:
+            resolved (tuple): The (module, class) key, the class, its main decoding
+                function and all the (function, warning message) to try in order
+                (see `_resolve_class()`).
+            d (dict): The raw dictionary, without its metadata.
+        Return:
+            object - The object built or the raw dictionary if nothing worked.
+        """
+        key, c, main, strategies = resolved
+        stats = self.stats
+        if stats is not None:
+            return self._construct_with_stats(resolved, d, stats)
+        if self.fail_fast:
+            return main(d)
+
+        for i, (decode, message) in enumerate(strategies):
+            try:
+                o = decode(d)
+            except Exception:
+                if message is not None:
+                    warnings.warn(message % c)
+                continue
+            if i:
+                self._promote(resolved, i)
             return o
-        except:
-            pass
 
         # Default, return the raw dict:
         return d
 
 
+    def _promote(self, resolved, i):
+        """
+        Try a decoding method first for the next objects of a class, unless the
+        methods tried before it were provided for that class specifically.
+        Args:
+            resolved (tuple): The class and its decoding functions (see `_resolve_class()`).
+            i (int): The index of the method that worked.
+        """
+        key, c, main, strategies = resolved
+        if all(m is None for _, m in strategies[:i]):
+            strategies = (strategies[i],) + strategies[:i] + strategies[i + 1:]
+            self._classes[key] = (key, c, main, strategies)
+
+
+    def _construct_with_stats(self, resolved, d, stats):
+        """
+        Same as `_construct()` while collecting statistics about the object.
+        Args:
+            resolved (tuple): The class and its decoding functions (see `_resolve_class()`).
+            d (dict): The raw dictionary, without its metadata.
+            stats (unijson.stats.CodecStats): Where to collect the statistics.
+        Return:
+            object - The object built or the raw dictionary if nothing worked.
+        """
+        key, c, main, strategies = resolved
+        name = "%s.%s" % key
+        start = _timer()
+        if self.fail_fast:
+            o = main(d)
+            stats.record("decode", name, _get_function_name(main), _timer() - start)
+            return o
+
+        for i, (decode, message) in enumerate(strategies):
+            try:
+                o = decode(d)
+            except Exception:
+                stats.record_failure("decode", name, _get_function_name(decode))
+                if message is not None:
+                    warnings.warn(message % c)
+                continue
+            if i:
+                self._promote(resolved, i)
+            stats.record("decode", name, _get_function_name(decode), _timer() - start)
+            return o
+
+        stats.record("decode", name, "raw", _timer() - start)
+        return d
+
+
+    def _is_allowed(self, mod):
+        """
+        Check whether classes can be retrieved from the given module.
+        Args:
+            mod (str): The name of a module.
+        Return:
+            bool - True if the module or one of its parent packages is allowed.
+        """
+        while mod not in self.allowed_modules:
+            if "." not in mod:
+                return False
+            mod = mod.rsplit(".", 1)[0]
+        return True
+
+
+    def _check_allowed(self, resolved):
+        """
+        Check that the object retrieved for a (module, class) pair is a class (or a
+        function, e.g. `pytz.timezone`) defined in one of the allowed modules, and not
+        something else the allowed module happens to import (e.g. `Popen` after
+        `from subprocess import Popen`).
+        Args:
+            resolved (tuple): The result of `_resolve_class()`.
+        Raises:
+            ValueError - If the object is not a class / function of an allowed module.
+        """
+        (mod, cls), c = resolved[:2]
+        if not isinstance(c, (type, types.FunctionType)):
+            raise ValueError("%s.%s is not a class, can't decode it." % (mod, cls))
+        if not self._is_allowed(getattr(c, "__module__", None) or ""):
+            raise ValueError("%s.%s is defined in module %s which is not allowed, can't decode it." % \
+                (mod, cls, c.__module__))
+        self._allowed_classes.add((mod, cls))
+
+
+    def _resolve_class(self, mod, cls):
+        """
+        Retrieve a class from its module (importing it if necessary) and select
+        the functions to use to decode it. The registered functions are looked up
+        along the MRO of the class, like the encoder does (see
+        `UniversalJSONEncoder._compile_plan()`), so that the subclasses encoded with
+        the function registered for a base class are decoded with its function too.
+        The result is cached until a new decoding function is registered.
+        Args:
+            mod (str): The name of the module containing the class.
+            cls (str): The name of the class.
+        Return:
+            tuple - The (module, class) key, the class, its main decoding function
+                and all the (function, warning message) to try in order.
+        """
+        m = sys.modules.get(mod)
+        if m is None:
+            start = _timer()
+            m = importlib.import_module(mod)
+            if self.stats is not None:
+                self.stats.record_import(mod, _timer() - start)
+        c = getattr(m, cls)
+
+        # The most specific registered function first, then __json_decode__() if it fails:
+        strategies = []
+        decode = None
+        for k in getattr(c, "__mro__", (c,)):
+            decode = self._decoders.get(k) or self._decoders.get(_get_qualified_name(k))
+            if decode is not None or "__json_decode__" in getattr(k, "__dict__", ()):
+                break
+        if decode is not None:
+            strategies.append((decode, "Decoding function %s used for type %%s raised an exception. "
+                                       "Trying something else." % getattr(decode, "__name__", decode)))
+        if getattr(c, "__json_decode__", None) is not None:
+            strategies.append((c.__json_decode__, "Static method __json_decode__ used for type %s "
+                                                   "raised an exception. Trying something else."))
+        if not strategies:
+            # Dataclasses and named tuples are built from their fields, objects using
+            # __slots__ or __setstate__() without their constructor:
+            fields = _compile_fields(c)
+            if fields is not None:
+                strategies.append((_make_fields_decoder(c, fields), "Building an object of type %s from its fields raised an "
+                                                  "exception. Trying something else."))
+            decode = _make_dataclass_decoder(c) or _make_attributes_decoder(c)
+            if decode is not None:
+                strategies.append((decode, "Setting the attributes of an object of type %s raised an "
+                                           "exception. Trying something else."))
+
+        # Try the constructor with the dictionary as arguments,
+        # then the default constructor (no arguments) and replace __dict__:
+        strategies.append((_make_constructor(c), None))
+        strategies.append((_make_default_constructor(c), None))
+
+        resolved = ((mod, cls), c, strategies[0][0], tuple(strategies))
+        self._classes[(mod, cls)] = resolved
+        return resolved
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# -------------
+# Lazy objects:
+# -------------
+
+
+# Value of the proxies not built yet / being built:
+_NOT_BUILT = object()
+_BUILDING = object()
+
+
+class LazyObject(object):
+    """
+    Proxy of an object decoded with the `lazy` option of the `UniversalJSONDecoder`.
+    It holds the raw dictionary of the object and only builds it (importing its
+    module and building the objects it contains first) when one of its attributes
+    is accessed. The proxy then forwards everything to the object: attributes, `==`,
+    `hash()`, `len()`, iteration, indexing, `str()`, `bool()` and `isinstance()`.
+    Other operators are not forwarded, use `materialize()` to get the object itself.
+    In a cycle of objects, the object built last refers to the proxy of the first one.
+    """
+    # A single slot holding [decoder, (module, class), raw dictionary, object]
+    # since proxies are created for every object of the document:
+    __slots__ = ("_lazy",)
+
+    def __init__(self, decoder, mod, cls, d):
+        """
+        Constructor of the proxy.
+        Args:
+            decoder (UniversalJSONDecoder): The decoder used to build the object.
+            mod (str): The name of the module containing the class of the object.
+            cls (str): The name of the class of the object.
+            d (dict): The raw dictionary, without its class and module.
+        """
+        object.__setattr__(self, "_lazy", [decoder, (mod, cls), d, _NOT_BUILT])
+
+
+    def _materialize(self):
+        """
+        Build the object (only the first time).
+        Return:
+            object - The object.
+        """
+        state = self._lazy
+        if state[3] is _NOT_BUILT:
+            decoder, key, d = state[:3]
+            resolved = decoder._classes.get(key)
+            if resolved is None:
+                resolved = decoder._resolve_class(*key)
+            if decoder.allowed_modules is not None and key not in decoder._allowed_classes:
+                decoder._check_allowed(resolved)
+            state[3] = _BUILDING
+            try:
+                state[3] = decoder._construct(resolved, materialize(d))
+            except BaseException:
+                state[3] = _NOT_BUILT
+                raise
+            state[0] = state[2] = None
+        elif state[3] is _BUILDING:
+            return self # Contains itself (cycle), the proxy stays until it's built
+        return state[3]
+
+    __class__ = property(lambda self: type(self._materialize()))
+
+    def __getattr__(self, name):
+        o = self._materialize()
+        if o is self:
+            raise AttributeError("Object %s.%s is being built, can't get its attribute %s." % (self._lazy[1] + (name,)))
+        return getattr(o, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._materialize(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._materialize(), name)
+
+    def __repr__(self):
+        if self._lazy[3] in (_NOT_BUILT, _BUILDING):
+            return "<LazyObject %s.%s (not built yet)>" % self._lazy[1]
+        return repr(self._lazy[3])
+
+    def __str__(self):
+        return str(self._materialize())
+
+    def __eq__(self, other):
+        return self._materialize() == materialize(other)
+
+    def __ne__(self, other):
+        return self._materialize() != materialize(other)
+
+    def __hash__(self):
+        return hash(self._materialize())
+
+    def __bool__(self):
+        return bool(self._materialize())
+    __nonzero__ = __bool__
+
+    def __len__(self):
+        return len(self._materialize())
+
+    def __iter__(self):
+        return iter(self._materialize())
+
+    def __contains__(self, item):
+        return item in self._materialize()
+
+    def __getitem__(self, key):
+        return self._materialize()[key]
+
+
+def materialize(o):
+    """
+    Build all the objects decoded lazily (see the `lazy` option of the
+    `UniversalJSONDecoder`) in the given object, replacing the proxies in lists
+    and dictionaries in place.
+    Args:
+        o (object): A decoded object, possibly a proxy or containing proxies.
+    Return:
+        object - The object without proxies.
+    """
+    if type(o) is LazyObject:
+        return o._materialize()
+    if isinstance(o, list):
+        for i, v in enumerate(o):
+            o[i] = materialize(v)
+    elif isinstance(o, dict):
+        for k, v in o.items():
+            o[k] = materialize(v)
+    return o
+
+
 #########################################################################################
 #########################################################################################
 #########################################################################################
@@ -351,16 +1510,57 @@ class UniversalJSONDecoder(json.JSONDecoder):
 def json_encode_timezone(t):
     """Encoder for timezones (from pytz)."""
     return {"zone" : t.zone, "__class__" : "timezone", "__module__":"pytz"}
-UniversalJSONEncoder.register(pytz.tzinfo.BaseTzInfo, json_encode_timezone)
-UniversalJSONEncoder.register(pytz.tzinfo.DstTzInfo, json_encode_timezone)
-UniversalJSONEncoder.register(pytz.tzinfo.StaticTzInfo, json_encode_timezone)
-# Register all timezones since they all have various classes and whatever all that mess is:
-for tz in pytz.all_timezones:
-    UniversalJSONEncoder.register(type(pytz.timezone(tz)), json_encode_timezone)
+# All the timezones have their own class but they all inherit from BaseTzInfo.
+# Registered by name so that pytz doesn't need to be imported before it's used.
+UniversalJSONEncoder.register("pytz.tzinfo.BaseTzInfo", json_encode_timezone)
 # Won't need a decoder since I use `timezone` instead of the classes.
 
 #########################################################################################
 
+# Fast ISO 8601 parsers (only available from Python 3.7):
+_date_fromisoformat     = getattr(datetime.date, "fromisoformat", None)
+_datetime_fromisoformat = getattr(datetime.datetime, "fromisoformat", None)
+_time_fromisoformat     = getattr(datetime.time, "fromisoformat", None)
+
+
+def _split_zone(s):
+    """
+    Split an ISO 8601 string produced by the compact encoders into the datetime / time
+    itself and the name of its pytz timezone (e.g. "12:00:00[Europe/Dublin]").
+    Args:
+        s (str): The string to split.
+    Return:
+        tuple - The ISO 8601 string and the timezone (None if there is none).
+    """
+    if not s.endswith("]"):
+        return s, None
+    s, _, zone = s[:-1].partition("[")
+    tz = _timezones.get(zone)
+    if tz is None:
+        import pytz
+        tz = _timezones[zone] = pytz.timezone(zone)
+    return s, tz
+
+# The pytz timezones already retrieved by name:
+_timezones = {}
+
+
+def _iso_with_zone(d):
+    """
+    Produce the ISO 8601 string of a datetime / time followed by the name of its
+    timezone if it comes from pytz. Other timezones are only kept as UTC offsets.
+    Args:
+        d (datetime.datetime or datetime.time): The datetime / time to format.
+    Return:
+        str - The formatted datetime / time.
+    """
+    zone = getattr(d.tzinfo, "zone", None)
+    if zone is None:
+        return d.isoformat()
+    return "%s[%s]" % (d.isoformat(), zone)
+
+#########################################################################################
+
 def json_encode_date(d):
     """Encoder for dates (from module datetime)."""
     return {"date" : str(d)}
@@ -368,6 +1568,9 @@ UniversalJSONEncoder.register(datetime.date, json_encode_date)
 
 def json_decode_date(d):
     """Decoder for dates (from module datetime)."""
+    if _date_fromisoformat is not None:
+        return _date_fromisoformat(d["date"])
+    import parse
     p = parse.parse("{year:d}-{month:d}-{day:d}", d["date"])
     return datetime.date(p["year"], p["month"], p["day"])
 UniversalJSONDecoder.register(datetime.date, json_decode_date)
@@ -380,8 +1583,21 @@ def json_encode_datetime(d):
             "tzinfo"   : d.tzinfo}
 UniversalJSONEncoder.register(datetime.datetime, json_encode_datetime)
 
+def json_encode_datetime_iso(d):
+    """Compact encoder for datetimes (from module datetime)."""
+    return {"datetime" : _iso_with_zone(d)}
+UniversalJSONEncoder._iso_encoders[datetime.datetime] = json_encode_datetime_iso
+
 def json_decode_datetime(d):
-    """Decoder for datetimes (from module datetime)."""
+    """Decoder for datetimes (from module datetime), compact or not."""
+    if "tzinfo" not in d:
+        s, tz = _split_zone(d["datetime"])
+        o = _datetime_fromisoformat(s)
+        if tz is None:
+            return o
+        return tz.localize(o) if o.tzinfo is None else o.astimezone(tz)
+    if _datetime_fromisoformat is not None:
+        return _datetime_fromisoformat(d["datetime"]).replace(tzinfo=d["tzinfo"])
     return datetime.datetime.strptime(d["datetime"], "%Y-%m-%d %H:%M:%S.%f").replace(tzinfo=d["tzinfo"])
 UniversalJSONDecoder.register(datetime.datetime, json_decode_datetime)
 
@@ -393,8 +1609,20 @@ def json_encode_time(t):
             "tzinfo" : t.tzinfo}
 UniversalJSONEncoder.register(datetime.time, json_encode_time)
 
+def json_encode_time_iso(t):
+    """Compact encoder for times (from module datetime)."""
+    return {"time" : _iso_with_zone(t)}
+UniversalJSONEncoder._iso_encoders[datetime.time] = json_encode_time_iso
+
 def json_decode_time(d):
-    """Decoder for times (from module datetime)."""
+    """Decoder for times (from module datetime), compact or not."""
+    if "tzinfo" not in d:
+        s, tz = _split_zone(d["time"])
+        o = _time_fromisoformat(s)
+        return o if tz is None else o.replace(tzinfo=tz)
+    if _time_fromisoformat is not None:
+        return _time_fromisoformat(d["time"]).replace(tzinfo=d["tzinfo"])
+    import parse
     p = parse.parse("{hh:d}:{mm:d}:{ss:d}.{ms:d}", d["time"])
     return datetime.time(p["hh"], p["mm"], p["ss"], p["ms"], tzinfo=d["tzinfo"])
 UniversalJSONDecoder.register(datetime.time, json_decode_time)
@@ -407,6 +1635,115 @@ def json_encode_timedelta(t):
 UniversalJSONEncoder.register(datetime.timedelta, json_encode_timedelta)
 # Won't require a decoder since "seconds" will be automatically passed to a constructor.
 
+#########################################################################################
+
+# Binary buffers are encoded as base64 strings, decoded straight from the str:
+_b64encode = base64.b64encode
+_b64decode = binascii.a2b_base64
+
+
+def json_encode_bytes(b):
+    """Encoder for bytes and bytearrays."""
+    return {"base64" : _b64encode(b).decode("ascii")}
+if bytes is not str: # Python 3 only, they are strings in Python 2
+    UniversalJSONEncoder.register(bytes, json_encode_bytes)
+    UniversalJSONEncoder.register(bytearray, json_encode_bytes)
+
+def json_decode_bytes(d):
+    """Decoder for bytes."""
+    return _b64decode(d["base64"])
+UniversalJSONDecoder.register(bytes, json_decode_bytes)
+
+def json_decode_bytearray(d):
+    """Decoder for bytearrays."""
+    return bytearray(_b64decode(d["base64"]))
+UniversalJSONDecoder.register(bytearray, json_decode_bytearray)
+
+def json_encode_memoryview(m):
+    """
+    Encoder for memoryviews, with their format and shape. Only native formats can be
+    decoded (see `memoryview.cast()`): formats with a byte order (e.g. ">f" or "<i",
+    as written by ctypes and NumPy) are converted to the native ones first, other
+    formats (e.g. structures) raise a ValueError.
+    """
+    shape = list(m.shape)
+    native = m.format[1:] if m.format[:1] in "<>=!" else m.format
+    memoryview(b"").cast(native) # ValueError if it can't be decoded
+    if native != m.format:
+        values = [v for v, in struct.iter_unpack(m.format, m.tobytes())]
+        m = memoryview(struct.pack("%d%s" % (len(values), native), *values)).cast(native)
+    return {"base64" : _b64encode(m if m.c_contiguous else m.tobytes()).decode("ascii"),
+            "format" : m.format,
+            "shape"  : shape}
+UniversalJSONEncoder.register(memoryview, json_encode_memoryview)
+
+def json_decode_memoryview(d):
+    """Decoder for memoryviews, viewing the decoded bytes without copying them."""
+    m = memoryview(_b64decode(d["base64"]))
+    if d["format"] == "B" and len(d["shape"]) == 1:
+        return m
+    return m.cast(d["format"], d["shape"])
+UniversalJSONDecoder.register(memoryview, json_decode_memoryview)
+
+def json_encode_array(a):
+    """Encoder for arrays (from module array), with the byte order of the machine."""
+    return {"typecode"  : a.typecode,
+            "base64"    : _b64encode(a.tobytes() if bytes is str else a).decode("ascii"),
+            "byteorder" : sys.byteorder}
+UniversalJSONEncoder.register(array.array, json_encode_array)
+
+def json_decode_array(d):
+    """Decoder for arrays (from module array)."""
+    a = array.array(d["typecode"])
+    a.frombytes(_b64decode(d["base64"]))
+    if d.get("byteorder", sys.byteorder) != sys.byteorder:
+        a.byteswap()
+    return a
+UniversalJSONDecoder.register(array.array, json_decode_array)
+
+def json_encode_ndarray(a):
+    """Encoder for NumPy arrays, as their raw buffer with their dtype and shape."""
+    # Structured dtypes are described by their fields:
+    dtype = a.dtype.str if a.dtype.fields is None else a.dtype.descr
+    if a.dtype.hasobject:
+        return {"dtype" : dtype, "shape" : list(a.shape), "items" : a.tolist()}
+    order = "C"
+    if not a.flags.c_contiguous:
+        if a.flags.f_contiguous:
+            order, a = "F", a.T # Same buffer, C-contiguous
+        else:
+            import numpy
+            a = numpy.ascontiguousarray(a)
+    return {"dtype"  : dtype,
+            "shape"  : list(a.shape[::-1] if order == "F" else a.shape),
+            "order"  : order,
+            "base64" : _b64encode(a.data).decode("ascii")}
+# Registered by name so that NumPy doesn't need to be imported (nor installed):
+UniversalJSONEncoder.register("numpy.ndarray", json_encode_ndarray)
+
+def json_decode_ndarray(d):
+    """
+    Decoder for NumPy arrays. The arrays are built over the decoded bytes without
+    copying them, which makes them read-only (use `.copy()` to modify them).
+    """
+    import numpy
+    dtype = numpy.dtype(_numpy_dtype(d["dtype"]))
+    if "items" in d:
+        return numpy.array([tuple(i) for i in d["items"]] if dtype.fields else d["items"], dtype=dtype) \
+                    .reshape(d["shape"])
+    a = numpy.frombuffer(_b64decode(d["base64"]), dtype=dtype)
+    return a.reshape(d["shape"], order=d.get("order", "C"))
+UniversalJSONDecoder.register("numpy.ndarray", json_decode_ndarray)
+
+def _numpy_dtype(descr):
+    """
+    Rebuild the description of a NumPy dtype from JSON: a string, or the list of
+    fields of a structured dtype as [name, dtype] or [name, dtype, shape].
+    """
+    if isinstance(descr, str):
+        return descr
+    return [tuple([f[0], _numpy_dtype(f[1])] + [tuple(s) for s in f[2:]]) for f in descr]
+
 
 #########################################################################################
 #########################################################################################
@@ -418,6 +1755,526 @@ UniversalJSONEncoder.register(datetime.timedelta, json_encode_timedelta)
 # -----------------------------------
 
 
+def _copy_dict(obj):
+    """
+    Copy the __dict__ property of the given object (so that the metadata can be
+    added to the copy without modifying the object).
+    Args:
+        obj (object): Any object with a __dict__ property.
+    Return:
+        dict - A copy of the __dict__ property of the object.
+    """
+    return dict(obj.__dict__)
+
+
+def _copy_state(obj):
+    """
+    Copy the state of the given object as returned by its __getstate__() method.
+    Args:
+        obj (object): Any object with a __getstate__() method returning a dict.
+    Return:
+        dict - A copy of the state of the object.
+    Raises:
+        TypeError - If the state of the object is not a dict.
+    """
+    state = obj.__getstate__()
+    if not isinstance(state, dict):
+        raise TypeError("The state of type %s is not a dict." % type(obj))
+    return dict(state)
+
+
+def _get_slots(t):
+    """
+    Get the names of the attributes stored in the __slots__ of a type and its bases
+    (as they must be used with getattr(), i.e. mangled if they are private).
+    Args:
+        t (type): Any type.
+    Return:
+        tuple of str - The names of the attributes.
+    """
+    names = []
+    for k in reversed(t.__mro__):
+        slots = vars(k).get("__slots__", ())
+        for name in ((slots,) if isinstance(slots, str) else slots):
+            if name in ("__dict__", "__weakref__"):
+                continue
+            if name.startswith("__") and not name.endswith("__"):
+                name = "_%s%s" % (k.__name__.lstrip("_"), name)
+            if name not in names:
+                names.append(name)
+    return tuple(names)
+
+
+def _has_custom_method(t, name):
+    """
+    Check whether a type (or one of its bases) overrides a method of `object`.
+    Args:
+        t (type): Any type.
+        name (str): The name of the method.
+    Return:
+        bool - True if the type has the method and it doesn't come from `object`.
+    """
+    return getattr(t, name, None) not in (None, getattr(object, name, None))
+
+
+def _make_attributes_encoder(t):
+    """
+    Build the function reading the attributes of the objects of a given type: its
+    __dict__ and / or its __slots__ (see `_copy_state()` for __getstate__()).
+    Args:
+        t (type): Any type.
+    Return:
+        function - The function taking an object of that type and returning a new
+            dictionary of its attributes.
+    """
+    names = _get_slots(t)
+    if not names:
+        return _copy_dict
+    has_dict = any("__dict__" in vars(k) for k in t.__mro__)
+
+    def encode_attributes(obj):
+        d = dict(obj.__dict__) if has_dict else {}
+        for name in names:
+            try:
+                d[name] = getattr(obj, name)
+            except AttributeError: # Slot not set
+                pass
+        return d
+    return encode_attributes
+
+
+def _make_attributes_decoder(c):
+    """
+    Build the function creating objects of a given class from their attributes
+    without calling their constructor: using their __setstate__() method if they
+    define one, or setting their attributes one by one if they use __slots__.
+    Args:
+        c (type): Any class.
+    Return:
+        function - The function taking a dictionary of attributes and returning a new
+            object, or None if the class should be built using its constructor.
+    """
+    if not isinstance(c, type):
+        return None
+    if _has_custom_method(c, "__setstate__"):
+        def decode_state(d):
+            o = c.__new__(c)
+            o.__setstate__(d)
+            return o
+        return decode_state
+    if not _get_slots(c):
+        return None
+
+    def decode_attributes(d):
+        o = c.__new__(c)
+        for k, v in d.items():
+            setattr(o, k, v)
+        return o
+    return decode_attributes
+
+
+def _is_named_tuple(t):
+    """Check whether a class is a named tuple (from `typing` or `collections`)."""
+    return issubclass(t, tuple) and hasattr(t, "_fields")
+
+
+# The types found while looking for named tuples (see `_has_named_tuples()`), each type
+# being checked once: the types of the values with nothing to look into (the scalars and
+# the objects left to `default()`) and the types of the values walked (the garbage
+# collector finds nothing in the scalars):
+_leaf_types = set(_SCALAR_TYPES)
+_walked_types = set(_SCALAR_TYPES).union(_JSON_CONTAINERS)
+
+
+def _has_named_tuples(values):
+    """
+    Check whether named tuples are found in some values or in the lists, tuples and
+    dictionaries they contain (the other objects are left to `default()`). The
+    containers are walked level by level, each level read at once by the garbage
+    collector (in C), so checking a document without named tuples costs little.
+    Args:
+        values (iterable): The values.
+    Return:
+        bool - True if there is at least one named tuple.
+    """
+    level = values
+    # Deeper documents (or cycles) are rejected by the JSON encoder anyway:
+    for _ in range(sys.getrecursionlimit()):
+        types = set(map(type, level))
+        if types <= _leaf_types:
+            return False
+        if not types <= _walked_types:
+            for t in types - _leaf_types - _walked_types:
+                if _is_named_tuple(t):
+                    return True
+                (_walked_types if issubclass(t, _JSON_CONTAINERS) else _leaf_types).add(t)
+            if not types <= _walked_types:
+                # The objects are left to default():
+                level = [v for v in level if type(v) in _walked_types]
+        level = gc.get_referents(*level)
+    return False
+
+
+def _compile_fields(c):
+    """
+    Get the functions generated to encode / decode the objects of a dataclass or a
+    named tuple from their fields (see `unijson.schema.compile_tagged()`).
+    Args:
+        c (type): Any class.
+    Return:
+        unijson.schema.Schema - The functions, or None if the class is not such a
+            class (its subclasses aren't, they may have other attributes), customises
+            its state (`__getstate__()` / `__setstate__()`) or if they can't be
+            generated (Python < 3.7).
+    """
+    if not isinstance(c, type) or \
+            not ("__dataclass_fields__" in vars(c) or "_fields" in vars(c) and _is_named_tuple(c)) or \
+            _has_custom_method(c, "__getstate__") or _has_custom_method(c, "__setstate__"):
+        return None
+    try:
+        from .schema import compile_tagged
+    except ImportError: # No dataclasses module
+        return None
+    return compile_tagged(c)
+
+
+def _get_instance_fields(c):
+    """
+    Get the names of the fields of a dataclass whose objects have a __dict__, in which
+    other attributes can be set (see `_make_fields_encoder()`).
+    Args:
+        c (type): A class with generated functions (see `_compile_fields()`).
+    Return:
+        frozenset - The names of the fields, or None if the objects can't have other
+            attributes (named tuples, dataclasses with __slots__).
+    """
+    if not hasattr(c, "__dataclass_fields__") or not any("__dict__" in vars(k) for k in c.__mro__):
+        return None
+    import dataclasses
+    return frozenset(f.name for f in dataclasses.fields(c))
+
+
+def _make_fields_encoder(t, fields):
+    """
+    Build the function encoding the objects of a dataclass or a named tuple with the
+    function generated from its fields (see `_compile_fields()`). The objects with
+    other attributes are encoded with all their attributes instead, like any object.
+    Args:
+        t (type): The dataclass or named tuple.
+        fields (unijson.schema.Schema): Its generated functions.
+    Return:
+        function - The function taking an object of that type and returning a new
+            dictionary.
+    """
+    names = _get_instance_fields(t)
+    if names is None:
+        return fields.encode
+    encode_fields, encode_attributes = fields.encode, _make_attributes_encoder(t)
+
+    def encode_dataclass(obj):
+        if obj.__dict__.keys() <= names:
+            return encode_fields(obj)
+        return encode_attributes(obj)
+    return encode_dataclass
+
+
+def _make_fields_decoder(c, fields):
+    """
+    Build the function creating the objects of a dataclass or a named tuple with the
+    function generated from its fields (see `_compile_fields()`), then setting the
+    other attributes found, if any (see `_make_fields_encoder()`).
+    Args:
+        c (type): The dataclass or named tuple.
+        fields (unijson.schema.Schema): Its generated functions.
+    Return:
+        function - The function taking a dictionary and returning a new object.
+    """
+    names = _get_instance_fields(c)
+    if names is None:
+        return fields.decode
+    decode_fields = fields.decode
+
+    def decode_dataclass(d):
+        o = decode_fields(d)
+        if not d.keys() <= names:
+            for name in d.keys() - names:
+                object.__setattr__(o, name, d[name])
+        return o
+    return decode_dataclass
+
+
+def _make_dataclass_decoder(c):
+    """
+    Build the function creating dataclasses with fields that are not taken by their
+    constructor (`field(init=False)`): the other fields are passed to the constructor
+    and those are set afterwards (even if the dataclass is frozen).
+    Args:
+        c (type): Any class.
+    Return:
+        function - The function taking a dictionary of fields and returning a new
+            object, or None if the class is not such a dataclass.
+    """
+    if not isinstance(c, type) or not hasattr(c, "__dataclass_fields__") or _has_custom_method(c, "__setstate__"):
+        return None
+    import dataclasses
+    late = tuple(f.name for f in dataclasses.fields(c) if not f.init)
+    if not late:
+        return None # Built by the constructor with the dictionary as arguments
+
+    def decode_dataclass(d):
+        d = dict(d)
+        values = [(name, d.pop(name)) for name in late if name in d]
+        o = c(**d)
+        for name, value in values:
+            object.__setattr__(o, name, value)
+        return o
+    return decode_dataclass
+
+
+def _parse_pointer(pointer):
+    """
+    Split a JSON Pointer (RFC 6901) into its unescaped tokens.
+    Args:
+        pointer (str): The pointer (e.g. "/config/limits", "" for the whole document).
+    Return:
+        tuple of str - The tokens.
+    Raises:
+        ValueError - If the pointer doesn't start with "/".
+    """
+    if pointer == "":
+        return ()
+    if not pointer.startswith("/"):
+        raise ValueError("Invalid JSON Pointer %r, it must start with '/'." % pointer)
+    return tuple(t.replace("~1", "/").replace("~0", "~") for t in pointer[1:].split("/"))
+
+
+def _pointer_key(o, token, pointer):
+    """
+    Get the key / index designated by a token of a JSON Pointer in a raw value.
+    Args:
+        o (object): The raw value (as parsed).
+        token (str): The token (unescaped).
+        pointer (tuple of str): The whole pointer (for the error messages).
+    Return:
+        str or int - The key (for dicts) or the index (for lists) of the value.
+    Raises:
+        KeyError - If the key can't be found.
+        IndexError - If the index is invalid or out of range.
+    """
+    if isinstance(o, list):
+        if not token.isdigit() or (token.startswith("0") and token != "0"):
+            raise IndexError("Invalid index %s in pointer %s." % (token, _format_pointer(pointer)))
+        if int(token) >= len(o):
+            raise IndexError("Index %s out of range in pointer %s." % (token, _format_pointer(pointer)))
+        return int(token)
+    if isinstance(o, dict) and token in o:
+        return token
+    raise KeyError("Key %s not found in pointer %s." % (token, _format_pointer(pointer)))
+
+
+def _expand_columns(o):
+    """
+    Turn a raw list encoded in columns (see the `columnar` option of the encoder)
+    back into a raw list of objects, without building them.
+    Args:
+        o (dict): The raw list encoded in columns (`__runs__` or `__columns__`).
+    Return:
+        list - The raw objects.
+    """
+    if "__runs__" in o:
+        items = []
+        for segment in o["__runs__"]:
+            items.extend(_expand_columns(segment) if isinstance(segment, dict) else segment)
+        return items
+    tags = dict((k, v) for k, v in o.items() if k != "__columns__")
+    columns = o["__columns__"]
+    items = []
+    for values in zip(*columns.values()):
+        d = dict(tags)
+        d.update(zip(columns, values))
+        items.append(d)
+    return items
+
+
+def _iter_header(s):
+    """
+    Go through the keys at the beginning of a document that could be its header (see
+    `_read_header()`).
+    Args:
+        s (str): The JSON document.
+    Return:
+        generator - The (key, raw value) pairs, up to `__data__` (with None as value).
+    """
+    m = _HEADER_START_EXPRESSION.match(s)
+    while m is not None:
+        key = m.group(1)
+        if key == "__data__":
+            yield key, None
+            return
+        try:
+            value, end = _plain_decoder.raw_decode(s, m.end())
+        except ValueError:
+            return
+        yield key, value
+        m = _HEADER_NEXT_EXPRESSION.match(s, end)
+
+
+def _read_header(entries):
+    """
+    Read the header written by the `UniversalJSONEncoder` at the beginning of a
+    document (see `UniversalJSONEncoder.iterencode()`). Only the header written by
+    the encoder is recognised, anything else is plain data.
+    Args:
+        entries (iterable): The (key, raw value) pairs at the beginning of the document,
+            up to `__data__`.
+    Return:
+        dict or None - The header: the features used (`__features__`, a frozenset) and
+            the (module, class) pairs of the type table (`__types__`, a list). None if
+            the document has no header.
+    """
+    header = {}
+    for key, value in entries:
+        if key == "__data__":
+            return header or None
+        if key not in _HEADER_KEYS or any(k in header for k in _HEADER_KEYS[_HEADER_KEYS.index(key):]):
+            return None # Unknown or out of order
+        if not isinstance(value, list) or not value:
+            return None
+        if key == "__features__":
+            if not all(f in _FEATURES for f in value):
+                return None
+            header[key] = frozenset(value)
+        else:
+            if not all(isinstance(t, list) and len(t) == 2 for t in value):
+                return None
+            header[key] = [tuple(t) for t in value]
+    return None
+
+
+def _format_pointer(tokens):
+    """Join the tokens of a JSON Pointer (see `_parse_pointer()`)."""
+    return "".join("/" + t.replace("~", "~0").replace("/", "~1") for t in tokens)
+
+
+class _Reference(object):
+    """Placeholder for an object referred to before being decoded (see `_replace_references()`)."""
+    __slots__ = ("ref",)
+
+    def __init__(self, ref):
+        self.ref = ref
+
+
+def _replace_references(o, refs):
+    """
+    Replace the placeholders of the objects referred to before being decoded in the
+    given object graph: in lists, dictionaries and the attributes (__dict__ and
+    __slots__) of the objects. Placeholders consumed otherwise by a decoding function
+    can't be replaced.
+    Args:
+        o (object): The decoded document.
+        refs (dict): The objects decoded, per id.
+    Return:
+        object - The document without placeholders.
+    Raises:
+        ValueError - If an object referred to was not found.
+    """
+    if isinstance(o, _Reference):
+        o = _get_reference(refs, o)
+    seen = set()
+    stack = [o]
+    while stack:
+        x = stack.pop()
+        if type(x) is LazyObject: # Checked first, isinstance() would build the object
+            stack.append(x._lazy[2] if x._lazy[3] in (_NOT_BUILT, _BUILDING) else x._lazy[3])
+            continue
+        if x is None or isinstance(x, (str, int, float)) or id(x) in seen:
+            continue
+        seen.add(id(x))
+        if isinstance(x, list):
+            items = enumerate(x)
+        elif isinstance(x, dict):
+            items = list(x.items())
+        else:
+            d = getattr(x, "__dict__", None)
+            if d is not None:
+                stack.append(d)
+            slots = _get_slots(type(x))
+            for name in slots:
+                v = getattr(x, name, None)
+                if isinstance(v, _Reference):
+                    setattr(x, name, _get_reference(refs, v))
+                else:
+                    stack.append(v)
+            continue
+        for k, v in items:
+            if isinstance(v, _Reference):
+                x[k] = _get_reference(refs, v)
+            else:
+                stack.append(v)
+    return o
+
+
+def _get_reference(refs, placeholder):
+    """Get the object replacing a placeholder, raising a ValueError if it was never decoded."""
+    try:
+        return refs[placeholder.ref]
+    except KeyError:
+        raise ValueError("Reference to an unknown object (__ref__ %d)." % placeholder.ref)
+
+
+def _make_constructor(c):
+    """
+    Build the function creating objects of a given class by passing their raw
+    dictionary as keyword arguments to the constructor.
+    Args:
+        c (callable): Any class.
+    Return:
+        function - The function taking a dictionary and returning a new object.
+    """
+    def construct(d):
+        return c(**d)
+    return construct
+
+
+def _make_default_constructor(c):
+    """
+    Build the function creating objects of a given class using the default
+    constructor (no arguments) and replacing their __dict__ with the raw dictionary.
+    Args:
+        c (callable): Any class.
+    Return:
+        function - The function taking a dictionary and returning a new object.
+    """
+    def construct_default(d):
+        o = c()
+        o.__dict__ = d
+        return o
+    return construct_default
+
+
+def _get_function_name(f):
+    """
+    Get the name of an encoding / decoding function, as shown in the statistics.
+    Args:
+        f (callable): The function.
+    Return:
+        str - The name of the function (or its representation if it has none).
+    """
+    return getattr(f, "__name__", None) or repr(f)
+
+
+def _get_qualified_name(t):
+    """
+    Get the qualified name of a type, as used to register encoders / decoders
+    for types that should not be imported by unijson itself.
+    Args:
+        t (type): Any type.
+    Return:
+        str - The name of the type prefixed by the name of its module.
+    """
+    return "%s.%s" % (getattr(t, "__module__", None), getattr(t, "__name__", None))
+
+
 def _get_object_module(obj):
     """
     Get the name of the module from which the given object was created.
@@ -454,22 +2311,9 @@ def _get_type_module(t):
     # 2) Get the chain of submodules separated by dots.
     # 3) Join them together while getting rid of the last one.
     try:
-        return ".".join(__class_expression.search(str(t)).group(1).split(".")[:-1])
+        r = ".".join(__class_expression.search(str(t)).group(1).split(".")[:-1])
     except AttributeError: # A type instead of a class
-        return ".".join(__type_expression.search(str(t)).group(1).split(".")[:-1])
-
+        r = ".".join(__type_expression.search(str(t)).group(1).split(".")[:-1])
+    # Builtin types (e.g. bytes) have no module in their name:
+    return r or getattr(t, "__module__", r)
 
-def _get_imported_modules():
-    """
-    Get all the already imported modules.
-    Found here: http://stackoverflow.com/a/4858123/5321016
-    Return:
-        dict[str:module] - A dictionary of the already imported modules.
-            Keys are modules' names.
-    """
-    result = {}
-    for name, val in (globals().items() if sys.version_info[0] == 3 else
-                      globals().iteritems()): # Python 2 and 3 compatible dict iteration
-        if isinstance(val, types.ModuleType):
-            result[val.__name__] = val
-    return result
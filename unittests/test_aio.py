@@ -0,0 +1,136 @@
+"""
+Copyright (c) 2018 Bastien Pietropaoli
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import unittest
+import asyncio, datetime, threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Relative import from parent directory as found here:
+# https://gist.github.com/JungeAlexander/6ce0a5213f3af56d7369
+import os,sys,inspect
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import unijson
+from unijson import aio
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# -------------
+# Test classes:
+# -------------
+
+class Reading(object):
+    def __init__(self, sensor, when, values):
+        self.sensor = sensor
+        self.when = when
+        self.values = values
+    def __eq__(self, other):
+        return self.__dict__ == other.__dict__
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
+class Writer(object):
+    """Minimal stream writer keeping what's written in memory."""
+    def __init__(self):
+        self.chunks = []
+        self.drained = 0
+    def write(self, data):
+        self.chunks.append(data)
+    async def drain(self):
+        self.drained += 1
+    def reader(self):
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"".join(self.chunks))
+        reader.feed_eof()
+        return reader
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+class TestAio(unittest.TestCase):
+
+    def setUp(self):
+        self.readings = [Reading("s%d" % i, datetime.datetime(2018, 8, 13, 18, 53, i % 60), list(range(i)))
+                         for i in range(100)]
+
+    def test_documents(self):
+        async def run(executor):
+            writer = Writer()
+            await aio.dump(self.readings, writer, executor=executor, chunk_size=1000)
+            self.assertGreater(len(writer.chunks), 1)
+            self.assertEqual(len(writer.chunks), writer.drained)
+            self.assertEqual(b"".join(writer.chunks).decode("utf-8"), unijson.dumps(self.readings))
+            return await aio.load(writer.reader(), executor=executor)
+
+        self.assertEqual(asyncio.run(run(None)), self.readings)
+        with ThreadPoolExecutor(1) as executor:
+            self.assertEqual(asyncio.run(run(executor)), self.readings)
+
+        # Documents encoded at once are encoded outside of the event loop:
+        async def run_at_once(**kwargs):
+            threads = set()
+            stats = unijson.CodecStats([lambda *args: threads.add(threading.get_ident())])
+            writer = Writer()
+            await aio.dump(self.readings, writer, chunk_size=1000, stats=stats, **kwargs)
+            self.assertNotIn(threading.get_ident(), threads)
+            self.assertEqual(b"".join(writer.chunks).decode("utf-8"), unijson.dumps(self.readings, **kwargs))
+            return await aio.load(writer.reader())
+
+        for kwargs in ({"type_table": True}, {"columnar": True}, {"references": True}):
+            self.assertEqual(asyncio.run(run_at_once(**kwargs)), self.readings)
+
+    def test_lines(self):
+        async def run(executor):
+            writer = Writer()
+            self.assertEqual(await aio.dump_lines(self.readings, writer), len(self.readings))
+            return [o async for o in aio.load_lines(writer.reader(), executor=executor, batch_size=7)]
+
+        self.assertEqual(asyncio.run(run(None)), self.readings)
+        with ThreadPoolExecutor(1) as executor:
+            self.assertEqual(asyncio.run(run(executor)), self.readings)
+
+        # Lines longer than the limit of the reader (64 KiB by default):
+        async def run_long(executor):
+            writer = Writer()
+            readings = [Reading("long", None, list(range(20000))), Reading("short", None, [])]
+            await aio.dump_lines(readings, writer)
+            self.assertGreater(len(writer.chunks[0]), 65536)
+            return readings, [o async for o in aio.load_lines(writer.reader(), executor=executor, batch_size=1)]
+
+        readings, loaded = asyncio.run(run_long(None))
+        self.assertEqual(loaded, readings)
+        with ThreadPoolExecutor(1) as executor:
+            readings, loaded = asyncio.run(run_long(executor))
+            self.assertEqual(loaded, readings)
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+if __name__ == "__main__":
+    unittest.main()
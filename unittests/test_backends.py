@@ -0,0 +1,120 @@
+"""
+Copyright (c) 2018 Bastien Pietropaoli
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+import unittest
+import collections, datetime
+
+# Relative import from parent directory as found here:
+# https://gist.github.com/JungeAlexander/6ce0a5213f3af56d7369
+import os,sys,inspect
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import unijson, json
+from unijson.backends import available_backends
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# -------------
+# Test classes:
+# -------------
+
+class Point(object):
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+    def __eq__(self, other):
+        return type(other) is Point and self.__dict__ == other.__dict__
+
+
+class Number(float):
+    pass
+
+
+Pair = collections.namedtuple("Pair", "a b")
+
+
+# Documents that must be decoded to the same objects whatever the backend:
+CORPUS = [Point(1, [Point(2, None), {"k": Point(3, "é")}]),
+          [Number(1.5), Pair(1, 2), (1, 2), True, None, -0.0, 1e-7, 1.5e300],
+          {1: "a", 2.5: "b", "c": {}},
+          datetime.datetime(2018, 8, 13, 18, 53, 42, 123),
+          [2 ** 70, -2 ** 64, 18446744073709551615],
+          {"__x": 1, "\\u005f_y": [1, 2]},
+          [Point(i, i) for i in range(8)], [Pair(i, (i, Pair(i, i))) for i in range(8)]]
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+class TestBackends(unittest.TestCase):
+
+    def test_identical_results(self):
+        backends = available_backends() + ["auto"]
+        for kwargs in ({}, {"type_table": True}, {"columnar": True}, {"references": True}, {"indent": 2},
+                       {"named_tuples": True}, {"named_tuples": True, "columnar": True}):
+            for o in CORPUS:
+                s = unijson.dumps(o, **kwargs)
+                expected = unijson.loads(s)
+                for backend in backends:
+                    written = unijson.dumps(o, backend=backend, **kwargs)
+                    self.assertEqual(json.loads(written), json.loads(s), (backend, kwargs, s))
+                    self.assertEqual(unijson.loads(written, backend=backend), expected, (backend, kwargs, s))
+                    self.assertEqual(unijson.loads(s, backend=backend), expected, (backend, kwargs, s))
+
+        # Errors and extensions are the same too:
+        for backend in backends:
+            self.assertTrue(unijson.loads("[NaN]", backend=backend)[0] != 0)
+            with self.assertRaises(ValueError):
+                unijson.loads('{"a": 1} x', backend=backend)
+
+
+    def test_selection(self):
+        self.assertIn("json", available_backends())
+        with self.assertRaises(ValueError):
+            unijson.dumps([], backend="unknown")
+        # Backends only picked automatically if they write the same documents:
+        self.assertEqual(unijson.dumps([1, 2], backend="auto"), "[1, 2]")
+        self.assertEqual(unijson.Codec().dumps(Point(1, 2), backend="auto"), unijson.dumps(Point(1, 2)))
+
+
+    @unittest.skipUnless("orjson" in available_backends(), "orjson is not installed.")
+    def test_orjson(self):
+        self.assertEqual(unijson.dumps({"a": [1, 2]}, backend="orjson"), '{"a":[1,2]}')
+        self.assertEqual(unijson.dumps({"a": [1]}, backend="orjson", indent=2), '{\n  "a": [\n    1\n  ]\n}')
+        with self.assertRaises(ValueError):
+            unijson.dumps([], backend="orjson", indent=4)
+        with self.assertRaises(ValueError):
+            unijson.loads("[]", backend="orjson", parse_float=str)
+        # Unsupported options are left to the standard library with "auto":
+        self.assertEqual(unijson.loads("[1.5]", backend="auto", parse_float=str), ["1.5"])
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+if __name__ == "__main__":
+    unittest.main()
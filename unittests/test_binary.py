@@ -0,0 +1,224 @@
+"""
+Copyright (c) 2018 Bastien Pietropaoli
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import unittest
+import collections, datetime, enum, pickle
+
+# Relative import from parent directory as found here:
+# https://gist.github.com/JungeAlexander/6ce0a5213f3af56d7369
+import os,sys,inspect
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import unijson, pytz
+from unijson.binary import dumpb, loadb
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# -------------
+# Test classes:
+# -------------
+
+class Item(object):
+    def __init__(self, name, value, parent=None):
+        self.name = name
+        self.value = value
+        self.parent = parent
+    def __eq__(self, other):
+        return (self.name, self.value) == (other.name, other.value)
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
+class Encoded(object):
+    def __init__(self, a1):
+        self.a1 = a1
+    def __json_encode__(self):
+        return {"value": self.a1}
+    @staticmethod
+    def __json_decode__(d):
+        return Encoded(d["value"])
+    def __eq__(self, other):
+        return self.a1 == other.a1
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
+class MyDict(dict):
+    pass
+
+
+class MyList(list):
+    pass
+
+
+class Color(enum.IntEnum):
+    RED = 1
+
+
+Pair = collections.namedtuple("Pair", ["a", "b"])
+
+
+class Sink(object):
+    calls = []
+    def __init__(self, name):
+        self.name = name
+    def append(self, item):
+        Sink.calls.append("append")
+    def extend(self, items):
+        Sink.calls.append("extend")
+    def add(self, item):
+        Sink.calls.append("add")
+    def __setitem__(self, key, value):
+        Sink.calls.append("__setitem__")
+    def __call__(self, *args):
+        Sink.calls.append("__call__")
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+class TestBinary(unittest.TestCase):
+
+    def test_round_trip(self):
+        tz = pytz.timezone("Europe/Dublin")
+        objects = [None, True, 12, -2 ** 70, 0.5, "été", [1, [2, {"a": None}]], {"k": (1, 2)},
+                   Item("i", [Encoded(1), datetime.date(2018, 8, 13)]), datetime.datetime(2018, 8, 13, 18, tzinfo=tz),
+                   datetime.timedelta(seconds=3672), [Item("i%d" % i, i) for i in range(100)],
+                   [b"\x00\xff", bytearray(b"\x01")]]
+        for o in objects:
+            b = dumpb(o)
+            self.assertTrue(b.startswith(b"UJB\x01"))
+            self.assertEqual(loadb(b), o)
+            self.assertEqual(loadb(bytearray(b)), o)
+        o = tz.localize(datetime.datetime(2018, 8, 13, 18))
+        self.assertEqual(loadb(dumpb(o, iso_datetimes=True)), o)
+
+        # Repeated strings are written once:
+        o = [Item("i%d" % i, i) for i in range(100)]
+        self.assertLess(len(dumpb(o)), len(unijson.dumps(o)) / 2)
+        self.assertRaises(TypeError, dumpb, object())
+        self.assertRaises(ValueError, dumpb, o, type_table=True)
+
+
+    def test_native_subclasses(self):
+        # Written like JSON would write them, except that tuples stay tuples (named
+        # tuples are objects with the named_tuples option):
+        counter = collections.Counter("abca")
+        objects = [MyDict(a=1), MyList([1, 2]), collections.OrderedDict(a=1, b=[2]), Color.RED,
+                   collections.defaultdict(list, a=[1]), counter, [MyDict(k=MyList([Item("i", 1)]))]]
+        for o in objects:
+            self.assertEqual(loadb(dumpb(o)), unijson.loads(unijson.dumps(o)))
+        r = loadb(dumpb([Pair(1, Color.RED), {"k": counter}]))
+        self.assertEqual(r, [(1, 1), {"k": {"a": 2, "b": 1, "c": 1}}])
+        self.assertIs(type(r[0]), tuple)
+        self.assertIs(type(r[0][1]), int)
+        self.assertIs(type(r[1]["k"]), dict)
+        r = loadb(dumpb([Pair(1, Color.RED), (1, [Pair(2, 3)])], named_tuples=True))
+        self.assertEqual(r, [Pair(1, 1), (1, [Pair(2, 3)])])
+        self.assertIs(type(r[0]), Pair)
+        self.assertIs(type(r[1]), tuple)
+
+        d = MyDict()
+        d["self"] = d
+        self.assertRaises(ValueError, dumpb, d)
+
+        # Unlike JSON, sets and the keys of dictionaries keep their types:
+        for o in ({1, 2}, frozenset([1]), {(1, 2): 3}, [1, {"a": {1, 2}}], (frozenset(), set()),
+                  {1: 2, None: 3, 1.5: 4, False: 5, b"k": 6}, [{2: {3: [4]}}] * 2):
+            r = loadb(dumpb(o))
+            self.assertEqual(r, o)
+            self.assertIs(type(r), type(o))
+        self.assertEqual(list(loadb(dumpb({Color.RED: 1}))), [1])
+        self.assertIs(type(list(loadb(dumpb({Color.RED: 1})))[0]), int)
+        d = {1: None}
+        d[1] = d
+        r = loadb(dumpb(d))
+        self.assertIs(r[1], r)
+
+
+    def test_references(self):
+        root = Item("root", None)
+        root.value = [Item("c%d" % i, i, root) for i in range(3)]
+        self.assertRaises(ValueError, dumpb, root)
+        r = loadb(dumpb(root, references=True))
+        self.assertEqual([c.name for c in r.value], ["c0", "c1", "c2"])
+        for c in r.value:
+            self.assertIs(c.parent, r)
+
+        # Only the data encoded with references is decoded as such:
+        o = [Item("i", {"__ref__": 0}), {"__ref__": 1}]
+        self.assertEqual(loadb(dumpb(o)), o)
+        self.assertEqual(loadb(dumpb(o, references=True)), o)
+
+
+    def test_safety(self):
+        self.assertRaises(ValueError, loadb, b"not binary")
+        self.assertRaises(ValueError, loadb, dumpb([1, 2, 3])[:-2])
+        self.assertRaises(ValueError, loadb, dumpb([1, 2, 3]) + b"\x00")
+
+        # Nothing else than native types and the universal decoder can be loaded:
+        self.assertRaises(ValueError, loadb, b"UJB\x01" + pickle.dumps(datetime.date(2018, 8, 13), protocol=4))
+        self.assertRaises(ValueError, loadb, dumpb(Item("i", 1)), allowed_modules=["datetime"])
+        for o in (datetime.date(2018, 8, 13), collections.OrderedDict(a=1), Item("i", 1)):
+            self.assertRaises(ValueError, loadb, b"UJB\x01" + pickle.dumps(o, protocol=5))
+        self.assertRaises(ValueError, loadb, b"UJB\x01\x80\x05K\x01P0\n.") # Persistent id
+
+        # The opcodes adding items or setting a state can't be applied to the objects
+        # decoded (APPEND, APPENDS, SETITEM, SETITEMS, ADDITEMS, BUILD, REDUCE), even
+        # through the memo, nor to the markers:
+        obj = dumpb(Sink("s"))[:-1]
+        self.assertEqual(loadb(obj + b"0]h\x0ba.")[0].name, "s") # Into a list, through the memo
+        for opcodes in (b"K\x01a", b"(K\x01e", b"K\x01K\x02s", b"(K\x01K\x02u", b"(K\x01\x90",
+                        b"(\x8c\x04name\x8c\x04evildb", b"Nb", b")R", b"0h\x0bK\x01a"):
+            b = obj + opcodes + b"."
+            self.assertRaises(ValueError, loadb, b, allowed_modules=["test_binary"])
+        self.assertEqual(Sink.calls, [])
+        b = dumpb([1, Color.RED])
+        self.assertEqual(loadb(b), [1, 1])
+        marker = b.index(b"\x93") + 1 # After STACK_GLOBAL
+        for opcodes in (b"}b", b"Nb", b"K\x01a"):
+            self.assertRaises(ValueError, loadb, b[:marker] + opcodes + b[marker:])
+
+        # Lengths larger than the data raise a ValueError:
+        for opcode in (pickle.BINBYTES8, pickle.BYTEARRAY8, pickle.BINUNICODE8):
+            b = b"UJB\x01\x80\x05" + opcode + (2 ** 40).to_bytes(8, "little") + b"x."
+            self.assertRaises(ValueError, loadb, b)
+
+        # Corrupted data only raises ValueError:
+        b = dumpb([Item("i%d" % i, [i, 0.5, b"\x00", (i, "s")]) for i in range(10)], references=True)
+        for i in range(4, len(b)):
+            for byte in (0, 0x7f, 0xff):
+                try:
+                    loadb(b[:i] + bytes([byte]) + b[i + 1:])
+                except ValueError:
+                    pass
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+if __name__ == "__main__":
+    unittest.main()
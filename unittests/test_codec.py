@@ -0,0 +1,132 @@
+"""
+Copyright (c) 2018 Bastien Pietropaoli
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+import unittest
+import datetime, threading
+
+# Relative import from parent directory as found here:
+# https://gist.github.com/JungeAlexander/6ce0a5213f3af56d7369
+import os,sys,inspect
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import unijson, json
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# -------------
+# Test classes:
+# -------------
+
+class Point(object):
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+def json_encode_point(p):
+    return {"xy": [p.x, p.y]}
+
+
+def json_decode_point(d):
+    return Point(*d["xy"])
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+class TestCodec(unittest.TestCase):
+
+    def test_registry(self):
+        codec = unijson.Codec()
+        codec.register_encoder(Point, json_encode_point)
+        codec.register_decoder(Point, json_decode_point)
+        s = codec.dumps([Point(1, 2), datetime.date(2018, 8, 13)])
+        self.assertIn('"xy": [1, 2]', s)
+        p, d = codec.loads(s)
+        self.assertEqual((p.x, p.y), (1, 2))
+        self.assertEqual(d, datetime.date(2018, 8, 13))
+
+        # The global registry is not modified:
+        self.assertNotIn("xy", unijson.dumps(Point(1, 2)))
+        self.assertIsInstance(unijson.loads(s)[0], dict)
+
+        # Codecs can be used with the other functions:
+        self.assertEqual(unijson.dumps(Point(1, 2), codec=codec), codec.dumps(Point(1, 2)))
+        self.assertEqual(codec.loads(unijson.dumps(Point(1, 2), codec=codec).encode()).y, 2)
+
+        # Codecs starting empty don't know dates:
+        with self.assertRaises(TypeError):
+            unijson.Codec(inherit=False).dumps(datetime.date(2018, 8, 13))
+        with self.assertRaises(ValueError):
+            codec.register_encoder(Point(1, 2), json_encode_point)
+
+
+    def test_reuse(self):
+        codec = unijson.Codec()
+        codec.dumps(Point(1, 2))
+        encoder = codec._local.encoders[1][()]
+        codec.dumps(Point(3, 4))
+        self.assertIs(codec._local.encoders[1][()], encoder)
+        self.assertEqual(codec.dumps(Point(1, 2), indent=1), unijson.dumps(Point(1, 2), indent=1))
+
+        # Registering a function replaces the encoders:
+        codec.register_encoder(Point, json_encode_point)
+        self.assertIn("xy", codec.dumps(Point(1, 2)))
+        self.assertIsNot(codec._local.encoders[1][()], encoder)
+
+        # Functions of the codec using the codec themselves get their own decoder:
+        codec.register_decoder(Point, lambda d: Point(*codec.loads(json.dumps(d["xy"]))))
+        p = codec.loads(codec.dumps([Point(1, 2), Point(3, 4)], type_table=True))[1]
+        self.assertEqual((p.x, p.y), (3, 4))
+
+
+    def test_threads(self):
+        codec = unijson.Codec()
+        errors = []
+
+        def run():
+            try:
+                for i in range(500):
+                    p = codec.loads(codec.dumps(Point(i, i), type_table=True))
+                    self.assertEqual((p.x, p.y), (i, i))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run) for _ in range(4)]
+        for t in threads:
+            t.start()
+        codec.register_encoder(Point, lambda p: {"x": p.x, "y": p.y})
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+if __name__ == "__main__":
+    unittest.main()
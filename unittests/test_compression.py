@@ -0,0 +1,123 @@
+"""
+Copyright (c) 2018 Bastien Pietropaoli
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+import unittest
+import datetime, io
+
+# Relative import from parent directory as found here:
+# https://gist.github.com/JungeAlexander/6ce0a5213f3af56d7369
+import os,sys,inspect
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import unijson
+from unijson.compression import detect_compression, _DecompressedStream, _CHUNK_SIZE
+import bz2, gzip, lzma, zlib
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+class TestCompression(unittest.TestCase):
+
+    def test_round_trip(self):
+        o = {"when": datetime.date(2018, 8, 13), "records": [{"id": i, "name": "été %d" % i} for i in range(3000)]}
+        for compression in ("gzip", "zlib", "bz2", "lzma"):
+            fp = io.BytesIO()
+            unijson.dump(o, fp, compression=compression, compresslevel=1)
+            b = fp.getvalue()
+            self.assertEqual(detect_compression(b), compression)
+            self.assertLess(len(b), len(unijson.dumps(o)) / 4)
+            self.assertEqual(unijson.load(io.BytesIO(b), compression=compression), o)
+            self.assertEqual(unijson.load(io.BytesIO(b), compression="auto"), o)
+            self.assertEqual(unijson.load_path(io.BytesIO(b), "/records/2999/id", compression="auto"), 2999)
+
+        # Readable by the standard library, which can write concatenated streams:
+        fp = io.BytesIO()
+        unijson.dump(o, fp, compression="gzip")
+        self.assertEqual(unijson.loads(gzip.decompress(fp.getvalue())), o)
+        s = unijson.dumps(o).encode("utf-8")
+        self.assertEqual(unijson.load(io.BytesIO(gzip.compress(s[:100]) + gzip.compress(s[100:])), compression="auto"), o)
+
+        # Documents not compressed, truncated or with unknown formats:
+        self.assertEqual(unijson.load(io.BytesIO(s), compression="auto"), o)
+        self.assertRaises(EOFError, unijson.load, io.BytesIO(zlib.compress(s)[:-10]), compression="auto")
+        self.assertRaises(ValueError, unijson.dump, o, io.BytesIO(), compression="zip")
+        self.assertRaises(ValueError, unijson.load, io.BytesIO(s), compression="zip")
+
+        # Documents starting like a zlib header (0x38 0x30) are not compressed:
+        self.assertEqual(detect_compression(b"80"), None)
+        self.assertEqual(detect_compression(zlib.compress(b"80")), "zlib")
+        self.assertEqual(unijson.load(io.BytesIO(b"80"), compression="auto"), 80)
+        self.assertEqual(list(unijson.load_lines(io.BytesIO(b"800\n801\n"), compression="auto")), [800, 801])
+
+
+    def test_bounded_decompression(self):
+        # Each chunk decompressed is bounded, however compressible the data is:
+        s = b"0" * (_CHUNK_SIZE * 10) + b"1" * _CHUNK_SIZE
+        for compress in (gzip.compress, zlib.compress, bz2.compress, lzma.compress):
+            for data in (compress(s), compress(s) + compress(s)):
+                stream = _DecompressedStream(io.BytesIO(data), "auto")
+                parts = []
+                while not stream.eof:
+                    stream.fill()
+                    self.assertLessEqual(len(stream.buf) - stream.pos, _CHUNK_SIZE)
+                    parts.append(stream.buf[stream.pos:])
+                    stream.pos = len(stream.buf)
+                self.assertEqual(b"".join(parts), s * (len(data) // len(compress(s))))
+
+
+    def test_streaming(self):
+        events = [{"id": i, "when": datetime.datetime(2018, 8, 13, 18, i % 60)} for i in range(2000)]
+        fp = io.BytesIO()
+        self.assertEqual(unijson.dump_lines(events, fp, compression="bz2"), 2000)
+        self.assertEqual(list(unijson.load_lines(io.BytesIO(fp.getvalue()), compression="auto")), events)
+
+        s = unijson.dumps({"skip": [1, 2], "events": events}).encode("utf-8")
+        fp = io.BytesIO(zlib.compress(s))
+        self.assertEqual(list(unijson.iter_items(fp, path=["events"], compression="zlib")), events)
+
+        codec = unijson.Codec()
+        fp = io.BytesIO()
+        codec.dump(events, fp, compression="lzma")
+        self.assertEqual(codec.load(io.BytesIO(fp.getvalue()), compression="auto"), events)
+
+
+    def test_batches(self):
+        # Same documents as iterencode():
+        docs = [list(range(2500)), tuple(range(1001)), {"k%d" % i: [i] for i in range(2500)}, {1: 2}, [], {}, "s",
+                {"b": list(range(3000)), "a": {"x": [datetime.date(2018, 8, 13)] * 1500, "y": None}}]
+        for kwargs in ({}, {"sort_keys": True, "separators": (",", ":")}, {"type_table": True}, {"indent": 2}):
+            encoder = unijson.UniversalJSONEncoder(**kwargs)
+            for o in docs:
+                self.assertEqual("".join(encoder.iterencode_batches(o)), "".join(encoder.iterencode(o)))
+
+        o = {"a": [1]}
+        o["b"] = o
+        self.assertRaises(ValueError, "".join, unijson.UniversalJSONEncoder().iterencode_batches(o))
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+"""
+Copyright (c) 2018 Bastien Pietropaoli
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+import unittest
+import datetime, io, pickle
+
+# Relative import from parent directory as found here:
+# https://gist.github.com/JungeAlexander/6ce0a5213f3af56d7369
+import os,sys,inspect
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import unijson
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# -------------
+# Test classes:
+# -------------
+
+class Message(object):
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+    def __eq__(self, other):
+        return self.__dict__ == other.__dict__
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
+class Point(object):
+    def __init__(self, x, y):
+        self.x, self.y = x, y
+    def __eq__(self, other):
+        return self.__dict__ == other.__dict__
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
+def json_encode_point(p):
+    return {"xy": [p.x, p.y]}
+
+
+def json_decode_point(d):
+    return Point(*d["xy"])
+
+
+def json_encode_point_polar(p):
+    return {"r": (p.x ** 2 + p.y ** 2) ** 0.5, "x": p.x, "y": p.y}
+
+
+def json_decode_point_polar(d):
+    return Point(d["x"], d["y"])
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+class TestParallel(unittest.TestCase):
+
+    def setUp(self):
+        unijson.UniversalJSONEncoder.register(Point, json_encode_point)
+        unijson.UniversalJSONDecoder.register(Point, json_decode_point)
+
+    def tearDown(self):
+        del unijson.UniversalJSONEncoder._encoders[Point]
+        del unijson.UniversalJSONDecoder._decoders[Point]
+        unijson.UniversalJSONEncoder._plans.clear()
+        unijson.UniversalJSONDecoder._classes.clear()
+
+    def test_batches(self):
+        messages = [Message("t%d" % (i % 7), [Point(i, -i), datetime.date(2018, 8, 1 + i % 28)]) for i in range(500)]
+        expected = [unijson.dumps(m) for m in messages]
+
+        # In the current process:
+        self.assertEqual(unijson.dumps_many(messages), expected)
+        self.assertEqual(unijson.loads_many(expected), messages)
+
+        # In a pool of processes, with the registered functions:
+        with unijson.create_executor(2) as executor:
+            strings = unijson.dumps_many(messages, executor=executor, chunksize=64, min_batch=0)
+            self.assertEqual(strings, expected)
+            self.assertEqual(unijson.loads_many(strings, executor=executor, chunksize=64, min_batch=0), messages)
+
+        strings = unijson.dumps_many(messages, workers=2, min_batch=0, sort_keys=True)
+        self.assertEqual(strings, [unijson.dumps(m, sort_keys=True) for m in messages])
+
+
+    def test_single_document(self):
+        messages = [Message("t%d" % (i % 7), [Point(i, -i), datetime.date(2018, 8, 1 + i % 28)]) for i in range(500)]
+        documents = [messages, tuple(messages[:130]), {"m%d" % i: m for i, m in enumerate(messages)}, [], {1: messages}]
+        with unijson.create_executor(2) as executor:
+            for o in documents:
+                for kwargs in ({}, {"indent": 2}, {"sort_keys": True, "separators": (",", ":")}):
+                    s = unijson.dumps_parallel(o, executor=executor, chunksize=64, min_batch=0, **kwargs)
+                    self.assertEqual(s, unijson.dumps(o, **kwargs))
+
+            # Written as the fragments come back:
+            fp = io.BytesIO()
+            unijson.dump_parallel(messages, fp, executor=executor, chunksize=64, min_batch=0, compression="gzip")
+            self.assertEqual(unijson.load(io.BytesIO(fp.getvalue()), compression="auto"), messages)
+
+        self.assertEqual(unijson.dumps_parallel(messages[:10], workers=2), unijson.dumps(messages[:10]))
+        self.assertRaises(ValueError, unijson.dumps_parallel, messages, references=True)
+
+
+    def test_stats(self):
+        messages = [Message("t%d" % (i % 7), [Point(i, -i), datetime.date(2018, 8, 1 + i % 28)]) for i in range(100)]
+
+        def counts(stats, event):
+            return dict((name, (s["calls"], s["methods"])) for name, s in stats.snapshot()[event].items())
+
+        # The statistics collected in the processes are merged:
+        expected = unijson.CodecStats()
+        strings = unijson.dumps_many(messages, stats=expected)
+        unijson.loads_many(strings, stats=expected)
+        with unijson.create_executor(2) as executor:
+            stats = unijson.CodecStats()
+            self.assertEqual(unijson.dumps_many(messages, executor=executor, chunksize=16, min_batch=0, stats=stats),
+                             strings)
+            self.assertEqual(unijson.loads_many(strings, executor=executor, chunksize=16, min_batch=0, stats=stats),
+                             messages)
+            for event in ("encode", "decode"):
+                self.assertEqual(counts(stats, event), counts(expected, event))
+
+            stats = unijson.CodecStats()
+            unijson.dumps_parallel(messages, executor=executor, chunksize=16, min_batch=0, stats=stats)
+            self.assertEqual(counts(stats, "encode"), counts(expected, "encode"))
+
+
+    def test_codec(self):
+        messages = [Message("t%d" % (i % 7), [Point(i, -i), datetime.date(2018, 8, 1 + i % 28)]) for i in range(100)]
+        codec = unijson.Codec()
+        codec.register_encoder(Point, lambda p: {"x": p.x, "y": p.y})
+        self.assertRaises((pickle.PicklingError, AttributeError), unijson.dumps_many, messages, workers=2, min_batch=0, codec=codec)
+
+        # The codec is sent to the processes with its registered functions:
+        codec.register_encoder(Point, json_encode_point_polar)
+        codec.register_decoder(Point, json_decode_point_polar)
+        expected = [codec.dumps(m) for m in messages]
+        self.assertNotEqual(expected, unijson.dumps_many(messages))
+        with unijson.create_executor(2) as executor:
+            strings = unijson.dumps_many(messages, executor=executor, chunksize=16, min_batch=0, codec=codec)
+            self.assertEqual(strings, expected)
+            self.assertEqual(unijson.loads_many(strings, executor=executor, chunksize=16, min_batch=0, codec=codec),
+                             messages)
+            s = unijson.dumps_parallel(messages, executor=executor, chunksize=16, min_batch=0, codec=codec)
+            self.assertEqual(s, codec.dumps(messages))
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+if __name__ == "__main__":
+    unittest.main()
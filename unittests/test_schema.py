@@ -0,0 +1,180 @@
+"""
+Copyright (c) 2018 Bastien Pietropaoli
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+import unittest
+import dataclasses, datetime, typing
+
+# Relative import from parent directory as found here:
+# https://gist.github.com/JungeAlexander/6ce0a5213f3af56d7369
+import os,sys,inspect
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import unijson, json
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# -------------
+# Test classes:
+# -------------
+
+@dataclasses.dataclass
+class Point:
+    x: float
+    y: float = 0.0
+
+
+@dataclasses.dataclass
+class Tree:
+    name: str
+    children: typing.List["Tree"] = dataclasses.field(default_factory=list)
+    origin: typing.Optional[Point] = None
+    points: typing.Dict[str, typing.Tuple[Point, int]] = dataclasses.field(default_factory=dict)
+    tags: typing.FrozenSet[str] = frozenset()
+    created: typing.Any = None
+
+
+class Pair(typing.NamedTuple):
+    first: Point
+    second: typing.Optional[Point] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class Derived:
+    x: int
+    double: int = dataclasses.field(init=False, default=0)
+    def __post_init__(self):
+        object.__setattr__(self, "double", self.x * 2)
+
+
+class SubPoint(Point):
+    pass
+
+
+class LabelledPoint(Point):
+    def __init__(self, x, y, label="l"):
+        Point.__init__(self, x, y)
+        self.label = label
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+class TestSchema(unittest.TestCase):
+
+    def test_nested_fields(self):
+        tree = Tree("root", [Tree("a", origin=Point(1, 2)), Tree("b", points={"p": (Point(3), 4)})],
+                    tags=frozenset(["x"]), created=datetime.date(2018, 8, 13))
+        s = unijson.dumps(tree, schema=Tree)
+        self.assertNotIn('"__class__": "Tree"', s)
+        self.assertNotIn('"__class__": "Point"', s)
+        self.assertIn('"__class__": "date"', s) # Not described by the schema
+        self.assertEqual(unijson.loads(s, schema=Tree), tree)
+
+        pairs = [Pair(Point(1, 2)), Pair(Point(3), Point(4, 5))]
+        s = unijson.dumps(pairs, schema=typing.List[Pair])
+        self.assertEqual(json.loads(s)[0], {"first": {"x": 1, "y": 2}, "second": None})
+        self.assertEqual(unijson.loads(s, schema=typing.List[Pair]), pairs)
+
+        # Works with the other options and the codecs:
+        for kwargs in ({"type_table": True}, {"references": True}, {"backend": "auto"}):
+            s = unijson.dumps(tree, schema=Tree, **kwargs)
+            self.assertEqual(unijson.loads(s, schema=Tree), tree)
+        self.assertEqual(unijson.Codec().loads(unijson.Codec().dumps(tree, schema=Tree), schema=Tree), tree)
+
+
+    def test_fallbacks(self):
+        # Subclasses keep their type tags:
+        points = [Point(1), SubPoint(2)]
+        s = unijson.dumps(points, schema=typing.List[Point])
+        self.assertEqual(json.loads(s)[0], {"x": 1, "y": 0.0})
+        decoded = unijson.loads(s, schema=typing.List[Point])
+        self.assertEqual(type(decoded[1]), SubPoint)
+        self.assertEqual(decoded, points)
+
+        # Documents with type tags are decoded with a schema too:
+        self.assertEqual(unijson.loads(unijson.dumps(points), schema=typing.List[Point]), points)
+
+        # Missing fields:
+        with self.assertRaises(KeyError):
+            unijson.loads('{"y": 1}', schema=Point)
+        self.assertEqual(unijson.loads('{"x": 1}', schema=Point), Point(1))
+        trees = unijson.loads('[{"name": "a"}, {"name": "b"}]', schema=typing.List[Tree])
+        self.assertEqual(trees, [Tree("a"), Tree("b")])
+        self.assertIsNot(trees[0].children, trees[1].children)
+        with self.assertRaises(TypeError): # Fields with a default factory are not optional
+            unijson.loads('{"name": "a", "children": null}', schema=Tree)
+        with self.assertRaises(ValueError):
+            unijson.loads("[]", schema=Point, select=["/0"])
+
+
+    def test_dataclasses_with_tags(self):
+        # Fields not taken by the constructor:
+        d = unijson.loads(unijson.dumps(Derived(2)))
+        self.assertEqual((type(d), d.x, d.double), (Derived, 2, 4))
+        s = unijson.dumps(Derived(2), schema=Derived)
+        self.assertEqual(json.loads(s), {"x": 2, "double": 4})
+        self.assertEqual(unijson.loads(s, schema=Derived), Derived(2))
+
+        # The generated functions are used with the type tags as well (the objects with
+        # other attributes than their fields are written with all their attributes) and
+        # named tuples are objects with the named_tuples option:
+        point = Point(1, 2)
+        point.extra = 3
+        pairs = {"k": (Pair(point, Point(3)), [Pair(Point(4))])}
+        self.assertEqual(unijson.loads(unijson.dumps(pairs)), {"k": [[Point(1, 2), Point(3)], [[Point(4), None]]]})
+        d = json.loads(unijson.dumps(pairs, named_tuples=True))
+        self.assertEqual(d["k"][0], {"__class__": "Pair", "__module__": "test_schema", "second":
+                         {"__class__": "Point", "__module__": "test_schema", "x": 3, "y": 0.0},
+                         "first": {"__class__": "Point", "__module__": "test_schema", "x": 1, "y": 2, "extra": 3}})
+        for kwargs in ({}, {"type_table": True}, {"references": True}, {"columnar": 1}, {"backend": "auto"}):
+            decoded = unijson.loads(unijson.dumps(pairs, named_tuples=True, **kwargs))
+            self.assertEqual(decoded, {"k": [Pair(Point(1, 2), Point(3)), [Pair(Point(4))]]})
+            self.assertEqual(type(decoded["k"][1][0]), Pair)
+            self.assertEqual(decoded["k"][0].first.extra, 3)
+            self.assertFalse(hasattr(decoded["k"][0].second, "extra"))
+        self.assertEqual(unijson.loads(unijson.dumps(Derived(3))), Derived(3))
+
+        # Subclasses that are not dataclasses are encoded like any other class:
+        labelled = LabelledPoint(1, 2, "e")
+        self.assertEqual(json.loads(unijson.dumps(labelled)), {"__class__": "LabelledPoint", "__module__":
+                         "test_schema", "x": 1, "y": 2, "label": "e"})
+        decoded = unijson.loads(unijson.dumps([labelled]))[0]
+        self.assertEqual((type(decoded), decoded.x, decoded.y, decoded.label), (LabelledPoint, 1, 2, "e"))
+
+        # Classes whose name is not an identifier:
+        cls = dataclasses.make_dataclass("my-point", [("x", int), ("y", int, 0)])
+        self.assertEqual(json.loads(unijson.dumps(cls(1)))["__class__"], "my-point")
+        s = unijson.dumps([cls(1, 2)], schema=typing.List[cls])
+        self.assertEqual(json.loads(s), [{"x": 1, "y": 2}])
+        self.assertEqual(unijson.loads(s, schema=typing.List[cls]), [cls(1, 2)])
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+if __name__ == "__main__":
+    unittest.main()
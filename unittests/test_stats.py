@@ -0,0 +1,112 @@
+"""
+Copyright (c) 2018 Bastien Pietropaoli
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+import unittest
+import datetime
+
+# Relative import from parent directory as found here:
+# https://gist.github.com/JungeAlexander/6ce0a5213f3af56d7369
+import os,sys,inspect
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import unijson, json
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# -------------
+# Test classes:
+# -------------
+
+class Point(object):
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class BrokenDecoder(object):
+    def __init__(self, x):
+        self.x = x
+    @staticmethod
+    def __json_decode__(d):
+        raise ValueError("Broken on purpose.")
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+class TestStats(unittest.TestCase):
+
+    def test_encode(self):
+        stats = unijson.CodecStats()
+        unijson.dumps([Point(1, 2), Point(3, 4), datetime.date(2018, 8, 13)], stats=stats)
+        s = stats.snapshot()
+        self.assertEqual(s["encode"]["test_stats.Point"]["calls"], 2)
+        self.assertEqual(s["encode"]["test_stats.Point"]["methods"], {"_copy_dict": 2})
+        self.assertEqual(s["encode"]["datetime.date"]["methods"], {"json_encode_date": 1})
+        self.assertGreaterEqual(s["encode"]["datetime.date"]["time"], 0)
+        self.assertEqual(s["decode"], {})
+        json.dumps(s) # Snapshots are JSON serialisable
+
+        stats.reset()
+        self.assertEqual(stats.snapshot(), {"encode": {}, "decode": {}, "imports": {}})
+
+
+    def test_decode(self):
+        stats = unijson.CodecStats()
+        s = unijson.dumps([Point(1, 2), BrokenDecoder(3)])
+        with self.assertWarns(UserWarning):
+            unijson.loads(s, stats=stats)
+        s = stats.snapshot()["decode"]
+        self.assertEqual(s["test_stats.Point"]["methods"], {"construct": 1})
+        self.assertEqual(s["test_stats.BrokenDecoder"]["methods"], {"construct": 1})
+        self.assertEqual(s["test_stats.BrokenDecoder"]["failures"], {"__json_decode__": 1})
+
+        # Objects that can't be built are left as raw dictionaries:
+        unijson.loads('{"__module__": "test_stats", "__class__": "Point", "z": 1}', stats=stats)
+        self.assertEqual(stats.snapshot()["decode"]["test_stats.Point"]["methods"], {"construct": 1, "raw": 1})
+
+
+    def test_hooks(self):
+        events = []
+        stats = unijson.CodecStats(hooks=[lambda *args: events.append(args[:3])])
+        unijson.UniversalJSONDecoder._classes.clear()
+        unijson.loads(unijson.dumps(Point(1, 2)), stats=stats)
+        self.assertEqual(events, [("decode", "test_stats.Point", "construct")])
+
+        # Modules imported to decode objects are recorded:
+        sys.modules.pop("xml.dom.minidom", None)
+        s = '{"__module__": "xml.dom.minidom", "__class__": "Text"}'
+        unijson.loads(s, stats=stats)
+        self.assertEqual(events[1], ("import", "xml.dom.minidom", None))
+        self.assertEqual(stats.snapshot()["imports"]["xml.dom.minidom"]["calls"], 1)
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+if __name__ == "__main__":
+    unittest.main()
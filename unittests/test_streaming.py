@@ -0,0 +1,168 @@
+"""
+Copyright (c) 2018 Bastien Pietropaoli
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+import unittest
+import datetime, io, tempfile
+
+# Relative import from parent directory as found here:
+# https://gist.github.com/JungeAlexander/6ce0a5213f3af56d7369
+import os,sys,inspect
+current_dir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+import unijson, json
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+# -------------
+# Test classes:
+# -------------
+
+class Event(object):
+    def __init__(self, name, when):
+        self.name = name
+        self.when = when
+    def __eq__(self, other):
+        return self.__dict__ == other.__dict__
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+class TestStreaming(unittest.TestCase):
+
+    def test_lines(self):
+        events = [Event("start", datetime.datetime(2018, 8, 13, 18, 53, 42)), {"peuh": 12}, [1, None],
+                  Event("stop", datetime.date(2018, 8, 14))]
+
+        lines = list(unijson.iter_dumps(events))
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(lines[1], '{"peuh": 12}')
+        self.assertEqual(list(unijson.iter_loads(lines)), events)
+
+        fp = io.StringIO()
+        self.assertEqual(unijson.dump_lines(events, fp, buffer_size=10), 4)
+        self.assertEqual(fp.getvalue(), "\n".join(lines) + "\n")
+
+        fp = io.StringIO(fp.getvalue() + "\n")
+        self.assertEqual(list(unijson.load_lines(fp)), events)
+
+        # Files opened in binary mode:
+        fp = io.StringIO()
+        unijson.dump_lines(events + [{"é": "ü"}], fp, ensure_ascii=False)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "events.jsonl")
+            with open(path, "wb") as f:
+                f.write(fp.getvalue().encode("utf-8"))
+            with open(path, "rb") as f:
+                self.assertEqual(list(unijson.load_lines(f)), events + [{"é": "ü"}])
+        self.assertEqual(list(unijson.iter_loads([b'{"a": 1}', bytearray(b"[2]"), b"\n"])), [{"a": 1}, [2]])
+
+        # Options are passed to the encoder / decoder:
+        lines = list(unijson.iter_dumps(events, iso_datetimes=True))
+        self.assertEqual(list(unijson.iter_loads(lines)), events)
+        self.assertRaises(ValueError, list, unijson.iter_loads(lines, allowed_modules=["datetime"]))
+        self.assertRaises(ValueError, list, unijson.iter_dumps(events, indent=2))
+
+
+    def test_items(self):
+        events = [Event("e%d" % i, datetime.datetime(2018, 8, 13, 18, 53, i % 60)) for i in range(200)]
+        s = unijson.dumps(events)
+
+        # Small chunks to make sure values are split between them:
+        for chunk_size in (1, 7, 100, 65536):
+            items = unijson.iter_items(io.StringIO(s), chunk_size=chunk_size)
+            self.assertEqual(list(items), events)
+        items = unijson.iter_items(io.BytesIO(s.encode("utf-8")), chunk_size=3)
+        self.assertEqual(list(items), events)
+        # Characters split between chunks of bytes:
+        names = ["é", "ü€", "𝄞", {"clé": "日本"}]
+        for chunk_size in (1, 2, 3):
+            items = unijson.iter_items(io.BytesIO(json.dumps(names, ensure_ascii=False).encode("utf-8")),
+                                       chunk_size=chunk_size)
+            self.assertEqual(list(items), names)
+
+        # Arrays found inside the document:
+        doc = {"version": 12345, "other": [{"a": [1, 2]}, "]"], "data": {"skip": [], "events": events}}
+        s = unijson.dumps(doc)
+        self.assertEqual(list(unijson.iter_items(io.StringIO(s), path=["data", "events"], chunk_size=5)), events)
+        self.assertEqual(list(unijson.iter_items(io.StringIO(s), path=["other", 0, "a"], chunk_size=5)), [1, 2])
+        self.assertEqual(list(unijson.iter_items(io.StringIO(s), path=["data", "skip"])), [])
+        self.assertRaises(KeyError, list, unijson.iter_items(io.StringIO(s), path=["missing"]))
+        self.assertRaises(IndexError, list, unijson.iter_items(io.StringIO(s), path=["other", 2]))
+        self.assertRaises(ValueError, list, unijson.iter_items(io.StringIO(s), path=["version"]))
+        self.assertRaises(ValueError, list, unijson.iter_items(io.StringIO("[1, 2")))
+
+        # Documents with a type table (the path starts from the data):
+        s = unijson.dumps(doc, type_table=True)
+        for chunk_size in (1, 7, 65536):
+            items = unijson.iter_items(io.StringIO(s), path=["data", "events"], chunk_size=chunk_size)
+            self.assertEqual(list(items), events)
+        s = unijson.dumps(events, type_table=True)
+        self.assertEqual(list(unijson.iter_items(io.StringIO(s), chunk_size=2)), events)
+        s = json.dumps({"__types__": [], "__data__": [1, 2]})
+        self.assertEqual(list(unijson.iter_items(io.StringIO(s), path=["__data__"], chunk_size=2)), [1, 2])
+
+        # Arrays encoded in columns:
+        for kwargs in ({"columnar": True}, {"columnar": True, "type_table": True}):
+            s = unijson.dumps(doc, **kwargs)
+            self.assertEqual(list(unijson.iter_items(io.StringIO(s), path=["data", "events"], chunk_size=5)), events)
+            self.assertEqual(list(unijson.iter_items(io.StringIO(s), path=["other", 0, "a"], chunk_size=5)), [1, 2])
+        # Objects shared between the items:
+        s = unijson.dumps([events[0], events[:2]], references=True)
+        items = list(unijson.iter_items(io.StringIO(s), chunk_size=3))
+        self.assertIs(items[1][0], items[0])
+        s = unijson.dumps([events], columnar=True)
+        self.assertRaises(ValueError, list, unijson.iter_items(io.StringIO(s), path=[0, 1]))
+
+        # Each item is decoded once, and its errors are raised without reading further:
+        s = unijson.dumps(events)
+        stats = unijson.CodecStats()
+        self.assertEqual(list(unijson.iter_items(io.StringIO(s), chunk_size=16, stats=stats)), events)
+        self.assertEqual(stats.snapshot()["decode"]["test_streaming.Event"]["calls"], len(events))
+        f = io.StringIO(s)
+        self.assertRaises(ValueError, list, unijson.iter_items(f, chunk_size=16, allowed_modules=["other"]))
+        self.assertLess(f.tell(), 1000)
+
+
+    def test_numbers(self):
+        # Numbers split between chunks (e.g. "1." and "5"), as items and while following a path:
+        numbers = [1.5, 2.25, 1e10, -3.5e-7, 12345678901234567890, 0, -1, 2.5E+3, True, None]
+        s = json.dumps(numbers)
+        doc = json.dumps({"n": 1.25e-3, "skip": [-10.5, 3e3], "items": numbers})
+        for chunk_size in range(1, 24):
+            self.assertEqual(list(unijson.iter_items(io.StringIO(s), chunk_size=chunk_size)), numbers)
+            self.assertEqual(list(unijson.iter_items(io.StringIO(doc), path=["items"], chunk_size=chunk_size)), numbers)
+            self.assertEqual(list(unijson.iter_items(io.StringIO("[0.5]"), chunk_size=chunk_size)), [0.5])
+
+
+#########################################################################################
+#########################################################################################
+#########################################################################################
+
+
+if __name__ == "__main__":
+    unittest.main()
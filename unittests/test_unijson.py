@@ -26,6 +26,14 @@ parent_dir = os.path.dirname(current_dir)
 sys.path.insert(0, parent_dir)
 
 import unijson, json
+import io, subprocess, tempfile
+from subprocess import Popen # Re-exported name (see test_class_resolution())
+import array, ctypes
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 #########################################################################################
@@ -90,6 +98,97 @@ class DefineBoth(object):
         return not self.__eq__(other)
 
 
+class InheritEncoder(DefineEncoder):
+    pass
+
+
+class RegisteredBase(object):
+    def __init__(self, a1):
+        self.a1 = a1
+
+
+class RegisteredChild(RegisteredBase):
+    pass
+
+
+class MyDate(datetime.datetime):
+    pass
+
+
+def json_encode_registered_base(o):
+    return {"a1": o.a1, "source": "registered"}
+
+
+class Slotted(object):
+    __slots__ = ("a1", "__a2")
+    def __init__(self, a1, a2):
+        self.a1 = a1
+        self.__a2 = a2
+    def __eq__(self, other):
+        return (self.a1, self._Slotted__a2) == (other.a1, other._Slotted__a2)
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
+class SlottedChild(Slotted):
+    __slots__ = "a3"
+    def __init__(self, a1, a2, a3):
+        Slotted.__init__(self, a1, a2)
+        self.a3 = a3
+    def __eq__(self, other):
+        return Slotted.__eq__(self, other) and self.a3 == other.a3
+
+
+class SlottedWithDict(Slotted):
+    def __init__(self, a1, a2, a3):
+        Slotted.__init__(self, a1, a2)
+        self.a3 = a3
+    def __eq__(self, other):
+        return Slotted.__eq__(self, other) and self.__dict__ == other.__dict__
+
+
+class DefineState(object):
+    def __init__(self, a1):
+        self.a1 = a1
+        self.cache = object()
+    def __getstate__(self):
+        return {"a1": self.a1}
+    def __setstate__(self, state):
+        self.a1 = state["a1"]
+        self.cache = "restored"
+
+
+class Coordinates(ctypes.Structure):
+    _fields_ = [("x", ctypes.c_int), ("y", ctypes.c_double)]
+
+
+class TupleState(object):
+    def __init__(self, a1):
+        self.a1 = a1
+    def __getstate__(self):
+        return (self.a1,)
+    def __setstate__(self, state):
+        self.a1 = state[0]
+    def __eq__(self, other):
+        return self.__dict__ == other.__dict__
+
+
+class Node(object):
+    def __init__(self, name, parent=None, children=None):
+        self.name = name
+        self.parent = parent
+        self.children = children or []
+
+
+class DefaultConstructor(object):
+    def __init__(self):
+        self.a1 = None
+    def __eq__(self, other):
+        return self.__dict__ == other.__dict__
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
 #########################################################################################
 #########################################################################################
 #########################################################################################
@@ -217,6 +316,405 @@ class Testunijson(unittest.TestCase):
         self.assertEqual(o, expected)
 
 
+    def test_encoding_plans(self):
+        # Methods and registered functions are found along the MRO:
+        d = json.loads(unijson.dumps(InheritEncoder(1, 2)))
+        expected = {"__module__": "test_unijson", "__class__": "InheritEncoder", "a1": 1, "a2": 2,
+                    "source": "__json_encode__"}
+        self.assertDictEqual(d, expected)
+
+        d = json.loads(unijson.dumps(RegisteredChild(1)))
+        expected = {"__module__": "test_unijson", "__class__": "RegisteredChild", "a1": 1}
+        self.assertDictEqual(d, expected)
+
+        # Registering a new function invalidates the cached plans:
+        unijson.UniversalJSONEncoder.register(RegisteredBase, json_encode_registered_base)
+        try:
+            d = json.loads(unijson.dumps([RegisteredBase(1), RegisteredChild(2)]))
+            expected = [{"__module__": "test_unijson", "__class__": "RegisteredBase", "a1": 1, "source": "registered"},
+                        {"__module__": "test_unijson", "__class__": "RegisteredChild", "a1": 2, "source": "registered"}]
+            self.assertEqual(d, expected)
+        finally:
+            del unijson.UniversalJSONEncoder._encoders[RegisteredBase]
+            unijson.UniversalJSONEncoder._plans.clear()
+
+        # Objects that can't be encoded still raise a TypeError:
+        self.assertRaises(TypeError, unijson.dumps, object())
+
+
+    def test_class_resolution(self):
+        s = unijson.dumps([NothingDefined(1, 2), NothingDefined(3, 4)])
+        self.assertEqual(unijson.loads(s), [NothingDefined(1, 2), NothingDefined(3, 4)])
+        self.assertIn(("test_unijson", "NothingDefined"), unijson.UniversalJSONDecoder._classes)
+
+        # Only the allowed modules (and their submodules) can be used:
+        self.assertEqual(unijson.loads(s, allowed_modules=["test_unijson"]), [NothingDefined(1, 2), NothingDefined(3, 4)])
+        self.assertRaises(ValueError, unijson.loads, s, allowed_modules=["datetime", "pytz"])
+        s = unijson.dumps(pytz.timezone("Europe/Dublin"))
+        self.assertEqual(unijson.loads(s, allowed_modules=["pytz"]), pytz.timezone("Europe/Dublin"))
+        s = '{"__module__": "pytz.tzinfo", "__class__": "BaseTzInfo"}'
+        self.assertIsInstance(unijson.loads(s, allowed_modules=["pytz"]), pytz.tzinfo.BaseTzInfo)
+        self.assertRaises(ValueError, unijson.loads, s, allowed_modules=["pytz.reference"])
+
+        # Subclasses encoded with the function registered for a base class are decoded
+        # with its function too:
+        o = MyDate(2018, 8, 13, 18, 53, 42, 123)
+        self.assertEqual(json.loads(unijson.dumps(o))["__class__"], "MyDate")
+        self.assertEqual(unijson.loads(unijson.dumps(o)), o)
+        self.assertIsInstance(unijson.loads(unijson.dumps([o]))[0], datetime.datetime)
+
+        # Names an allowed module imports from other modules can't be used:
+        self.assertRaises(ValueError, unijson.loads, '{"__module__": "os", "__class__": "DirEntry"}', allowed_modules=["os"])
+        self.assertRaises(ValueError, unijson.loads, '{"__module__": "json", "__class__": "codecs"}', allowed_modules=["json"])
+        self.assertRaises(ValueError, unijson.loads, '{"__module__": "os", "__class__": "system", "command": "true"}',
+                          allowed_modules=["os"])
+        s = '{"__module__": "test_unijson", "__class__": "Popen", "args": ["true"]}'
+        self.assertRaises(ValueError, unijson.loads, s, allowed_modules=["test_unijson"])
+        self.assertRaises(ValueError, lambda: unijson.loads(s, allowed_modules=["test_unijson"], lazy=True).pid)
+
+
+    def test_decoding_strategies(self):
+        o = DefaultConstructor()
+        o.a1 = [1, 2]
+        s = unijson.dumps([o, o])
+        self.assertEqual(unijson.loads(s), [o, o])
+
+        # The method that worked is tried first for the next objects:
+        key, c, main, strategies = unijson.UniversalJSONDecoder._classes[("test_unijson", "DefaultConstructor")]
+        self.assertEqual(strategies[0][0].__name__, "construct_default")
+        self.assertEqual(main.__name__, "construct")
+
+        # Registering a decoder forgets what was learned:
+        unijson.UniversalJSONDecoder.register(DefaultConstructor, lambda d: "registered")
+        self.assertEqual(unijson.loads(s), ["registered", "registered"])
+        del unijson.UniversalJSONDecoder._decoders[DefaultConstructor]
+        unijson.UniversalJSONDecoder._classes.clear()
+
+        # __json_decode__() is still tried if the registered function fails:
+        unijson.UniversalJSONDecoder.register(DefineDecoder, lambda d: d["missing"])
+        d = '{"a1": 1, "a2": 2, "__class__": "DefineDecoder", "__module__": "test_unijson"}'
+        with self.assertWarns(UserWarning):
+            decoded = unijson.loads("[%s, %s]" % (d, d))
+        self.assertEqual([o.source for o in decoded], ["__json_decode__", "__json_decode__"])
+        del unijson.UniversalJSONDecoder._decoders[DefineDecoder]
+        unijson.UniversalJSONDecoder._classes.clear()
+
+        # Failing fast uses the main method only:
+        self.assertRaises(TypeError, unijson.loads, s, fail_fast=True)
+        self.assertEqual(unijson.loads(unijson.dumps(DefineBoth(1, 2)), fail_fast=True), DefineBoth(1, 2))
+        self.assertEqual(unijson.loads(unijson.dumps(NothingDefined(1, 2)), fail_fast=True), NothingDefined(1, 2))
+
+
+    def test_lazy(self):
+        o = {"a": [NothingDefined(1, DefineBoth(2, datetime.date(2018, 8, 13)))], "b": Node("n")}
+        s = unijson.dumps(o)
+        r = unijson.loads(s, lazy=True)
+        self.assertIs(type(r["a"][0]), unijson.LazyObject)
+        self.assertIn("not built yet", repr(r["b"]))
+
+        # Built on first use, with the objects it contains:
+        self.assertEqual(r["a"][0].a1, 1)
+        self.assertIsInstance(r["a"][0], NothingDefined)
+        self.assertIsInstance(r["a"][0].a2, DefineBoth)
+        self.assertEqual(r["a"][0].a2.a2, datetime.date(2018, 8, 13))
+        self.assertEqual(r["a"][0], o["a"][0])
+        self.assertIn("not built yet", repr(r["b"]))
+
+        # Built all at once:
+        r = unijson.materialize(unijson.loads(s, lazy=True))
+        self.assertIs(type(r["a"][0]), NothingDefined)
+        self.assertIs(type(r["b"]), Node)
+        self.assertEqual(unijson.materialize(12), 12)
+
+        # Modules are only checked, not imported, and proxies can be encoded again:
+        s = '[{"__module__": "test_unijson", "__class__": "Missing"}, 12]'
+        r = unijson.loads(s, lazy=True)
+        self.assertEqual(r[1], 12)
+        self.assertRaises(AttributeError, unijson.materialize, r)
+        self.assertRaises(ValueError, unijson.loads, s, lazy=True, allowed_modules=["datetime"])
+        r = unijson.loads(unijson.dumps(o), lazy=True)
+        self.assertEqual(json.loads(unijson.dumps(r)), json.loads(unijson.dumps(o)))
+
+        # Shared objects and cycles:
+        root = Node("root")
+        root.children = [Node("c%d" % i, root) for i in range(3)]
+        r = unijson.loads(unijson.dumps(root, references=True), lazy=True)
+        self.assertIs(unijson.materialize(r.children[1].parent), unijson.materialize(r))
+        self.assertEqual([c.name for c in r.children], ["c0", "c1", "c2"])
+
+
+    def test_select(self):
+        o = {"config": {"limits": [1, NothingDefined(2, DefineBoth(3, 4))], "a/b": {"~": 5}},
+             "data": [NothingDefined(i, None) for i in range(10)]}
+        s = unijson.dumps(o)
+        r = unijson.loads(s, select=["/config/limits/1", "/config/limits/1/a2", "/config/a~1b/~0", "/data/3", ""])
+        self.assertEqual(r[:4], [o["config"]["limits"][1], DefineBoth(3, 4), 5, NothingDefined(3, None)])
+        self.assertEqual(r[4]["data"], o["data"])
+
+        # With a type table and lists encoded in columns:
+        for kwargs in ({"type_table": True}, {"columnar": True}, {"type_table": True, "columnar": True}):
+            s = unijson.dumps(o, **kwargs)
+            self.assertEqual(unijson.loads(s, select=["/data/3", "/config"]), [o["data"][3], o["config"]])
+        self.assertEqual(unijson.load_path(io.StringIO(s), "/data/9/a1"), 9)
+
+        # Only the selected objects are built:
+        stats = unijson.CodecStats()
+        unijson.loads(unijson.dumps(o), select=["/data/3"], stats=stats)
+        self.assertEqual(stats.snapshot()["decode"]["test_unijson.NothingDefined"]["calls"], 1)
+
+        self.assertRaises(KeyError, unijson.loads, s, select=["/config/missing"])
+        self.assertRaises(IndexError, unijson.loads, s, select=["/data/10"])
+        self.assertRaises(IndexError, unijson.loads, s, select=["/data/01"])
+        self.assertRaises(ValueError, unijson.loads, s, select=["data"])
+
+
+    def test_buffers(self):
+        o = [NothingDefined(1, "\u00e9t\u00e9"), datetime.date(2018, 8, 13)]
+        s = unijson.dumps(o)
+        for encoding in ("utf-8", "utf-16", "utf-32-le"):
+            b = s.encode(encoding)
+            for buf in (b, bytearray(b), memoryview(b)):
+                self.assertEqual(unijson.loads(buf), o)
+            self.assertEqual(unijson.load(io.BytesIO(b)), o)
+
+        # Memory-mapped files:
+        fd, path = tempfile.mkstemp(suffix=".json")
+        try:
+            with os.fdopen(fd, "w") as f:
+                unijson.dump(o, f)
+            self.assertEqual(unijson.load_mmap(path), o)
+            open(path, "w").close()
+            self.assertRaises(ValueError, unijson.load_mmap, path)
+        finally:
+            os.remove(path)
+
+
+    def test_binary_data(self):
+        for o in (b"\x00\xffdata", bytearray(b"\x01\x02"), b""):
+            d = json.loads(unijson.dumps(o))
+            self.assertEqual(d["__class__"], type(o).__name__)
+            r = unijson.loads(unijson.dumps(o))
+            self.assertEqual((type(r), r), (type(o), o))
+
+        # Memoryviews keep their format and shape:
+        m = memoryview(array.array("i", range(6))).cast("B").cast("i", [2, 3])
+        r = unijson.loads(unijson.dumps(m))
+        self.assertEqual((r.format, r.shape, r.tolist()), ("i", (2, 3), [[0, 1, 2], [3, 4, 5]]))
+        self.assertEqual(unijson.loads(unijson.dumps(memoryview(b"abc")[::2])).tobytes(), b"ac")
+
+        # Formats with a byte order are converted to the native ones, others can't be encoded:
+        for m, expected in ((memoryview((ctypes.c_float.__ctype_be__ * 3)(1.5, 2, -3)), [1.5, 2, -3]),
+                            (memoryview(((ctypes.c_int16.__ctype_le__ * 3) * 2)((1, 2, 3), (4, 5, -6))), [[1, 2, 3], [4, 5, -6]])):
+            r = unijson.loads(unijson.dumps(m))
+            self.assertEqual((r.format, r.shape, r.tolist()), (m.format[1:], m.shape, expected))
+        with self.assertWarns(UserWarning), self.assertRaises(TypeError):
+            unijson.dumps(memoryview(Coordinates(1, 2)))
+
+        # Arrays, written in the byte order of the machine:
+        for a in (array.array("d", [0.5, -1.25, 3e100]), array.array("H", range(10)), array.array("u", "\u00e9t\u00e9")):
+            self.assertEqual(unijson.loads(unijson.dumps(a)), a)
+        d = json.loads(unijson.dumps(array.array("H", [1, 2])))
+        d["byteorder"] = "big" if sys.byteorder == "little" else "little"
+        self.assertEqual(unijson.loads(json.dumps(d)), array.array("H", [256, 512]))
+
+
+    @unittest.skipUnless(numpy is not None, "numpy is not installed.")
+    def test_numpy_arrays(self):
+        a = numpy.arange(12, dtype=">i4").reshape(3, 4)
+        d = json.loads(unijson.dumps(a))
+        self.assertEqual((d["__module__"], d["dtype"], d["shape"]), ("numpy", ">i4", [3, 4]))
+        arrays = [a, a.T, a[::2, 1:], numpy.float32(1.5) * numpy.ones((2, 0)), numpy.array(3.25),
+                  numpy.array([(1, 2.5), (3, 4.5)], dtype=[("id", "u2"), ("v", "f8", (1,))]),
+                  numpy.array([{"k": 1}, None], dtype=object)]
+        for a in arrays:
+            r = unijson.loads(unijson.dumps(a))
+            self.assertEqual((r.dtype, r.shape), (a.dtype, a.shape))
+            self.assertEqual(r.tolist(), a.tolist())
+
+        # Built over the decoded bytes, hence read-only:
+        r = unijson.loads(unijson.dumps(numpy.zeros(4)))
+        self.assertFalse(r.flags.writeable)
+
+
+    def test_lazy_imports(self):
+        # Importing unijson should not import the libraries only used by some codecs:
+        script = "import sys, unijson; print(sorted(m for m in ('pytz', 'parse') if m in sys.modules))"
+        out = subprocess.check_output([sys.executable, "-c", script], cwd=parent_dir)
+        self.assertEqual(out.decode().strip(), "[]")
+
+        # Timezones are found through their base class without being registered one by one:
+        for tz in ("UTC", "Europe/Dublin", "Asia/Kolkata", "Etc/GMT+5"):
+            d = json.loads(unijson.dumps(pytz.timezone(tz)))
+            self.assertDictEqual(d, {"__module__":"pytz", "__class__":"timezone", "zone":tz})
+
+
+    def test_iso_datetimes(self):
+        tz = pytz.timezone("Europe/Dublin")
+        o = tz.localize(datetime.datetime(2018, 8, 13, 18, 53, 42, 12))
+        d = json.loads(unijson.dumps(o, iso_datetimes=True))
+        expected = {"__module__":"datetime", "__class__":"datetime", "datetime":"2018-08-13T18:53:42.000012+01:00[Europe/Dublin]"}
+        self.assertDictEqual(d, expected)
+        r = unijson.loads(unijson.dumps(o, iso_datetimes=True))
+        self.assertEqual(r, o)
+        self.assertEqual(r.tzinfo, o.tzinfo)
+
+        o = datetime.time(18, 53, 42, tzinfo=tz)
+        d = json.loads(unijson.dumps(o, iso_datetimes=True))
+        expected = {"__module__":"datetime", "__class__":"time", "time":"18:53:42[Europe/Dublin]"}
+        self.assertDictEqual(d, expected)
+
+        objects = [datetime.datetime(2018, 8, 13, 18, 53, 42, tzinfo=tz), datetime.datetime(2018, 8, 13),
+                   pytz.utc.localize(datetime.datetime(2018, 8, 13, 18, 53, 42)), datetime.time(18, 53, 42, 12),
+                   datetime.time(18, 53, 42, tzinfo=tz), datetime.date(2018, 8, 13)]
+        for o in objects:
+            self.assertEqual(o, unijson.loads(unijson.dumps(o, iso_datetimes=True)))
+
+        # The default encoding is unchanged:
+        self.assertIn('"tzinfo"', unijson.dumps(datetime.datetime(2018, 8, 13)))
+
+
+    def test_type_table(self):
+        o = [NothingDefined(1, DefineBoth(2, 3)), {"k": NothingDefined(4, 5)}, pytz.timezone("UTC")]
+        s = unijson.dumps(o, type_table=True)
+        d = json.loads(s)
+        expected = {"__types__": [["test_unijson", "NothingDefined"], ["test_unijson", "DefineBoth"], ["pytz", "timezone"]],
+                    "__data__": [{"a1": 1, "a2": {"a1": 2, "a2": 3, "__type__": 1}, "__type__": 0},
+                                 {"k": {"a1": 4, "a2": 5, "__type__": 0}}, {"zone": "UTC", "__type__": 2}]}
+        self.assertDictEqual(d, expected)
+        self.assertEqual(unijson.loads(s), o)
+        self.assertEqual(unijson.loads(unijson.dumps(o, type_table=True, indent=2)), o)
+
+        # The same encoder can be used for several documents:
+        encoder = unijson.UniversalJSONEncoder(type_table=True)
+        self.assertEqual(encoder.encode(NothingDefined(1, 2)), encoder.encode(NothingDefined(1, 2)))
+
+        # Documents without objects and other documents are unchanged:
+        self.assertEqual(unijson.loads(unijson.dumps([1, {"a": 2}], type_table=True)), [1, {"a": 2}])
+        self.assertEqual(unijson.loads('{"__types__": 1}'), {"__types__": 1})
+        self.assertEqual(unijson.dumps([1, {"a": 2}], type_table=True), '[1, {"a": 2}]')
+        for d in ({"__types__": [], "__data__": 1}, {"__types__": [["a", "b"]], "x": 1, "__data__": 1},
+                  {"__types__": [["a", "b", "c"]], "__data__": 1}, {"__types__": [["a", "b"]], "__data__": 1, "x": 2}):
+            self.assertEqual(unijson.loads(json.dumps(d)), d)
+            self.assertEqual(unijson.loads(json.dumps(d), select=["/__data__"]), [1])
+        self.assertRaises(ValueError, unijson.loads, '{"__types__": [["a", "b"]], "__data__": {"__type__": 1}}')
+
+
+    def test_columnar(self):
+        o = [NothingDefined(i, [DefineBoth(j, None) for j in range(4)]) for i in range(5)]
+        s = unijson.dumps(o, columnar=True)
+        self.assertEqual(json.loads(s)["__features__"], ["columnar"])
+        d = json.loads(s)["__data__"]
+        self.assertEqual(d["__class__"], "NothingDefined")
+        self.assertEqual(d["__columns__"]["a1"], [0, 1, 2, 3, 4])
+        self.assertEqual(d["__columns__"]["a2"][0]["__columns__"], {"a1": [0, 1, 2, 3], "a2": [None] * 4})
+        self.assertEqual(unijson.loads(s), o)
+
+        # Runs mixed with other values or too short:
+        o = [1, "a"] + [NothingDefined(i, i) for i in range(3)] + [DefineBoth(i, i) for i in range(4)] + \
+            [{"k": [NothingDefined(i, None) for i in range(4)]}, NothingDefined(1, 2)] + [pytz.timezone("UTC")] * 5
+        s = unijson.dumps(o, columnar=True)
+        self.assertEqual(len(json.loads(s)["__data__"]["__runs__"]), 4)
+        self.assertEqual(unijson.loads(s), o)
+        self.assertEqual(unijson.loads(s, select=["/2", "/9/k/1"]), [o[2], o[9]["k"][1]])
+        self.assertEqual(unijson.loads(unijson.dumps(o, columnar=2, type_table=True)), o)
+        self.assertEqual(unijson.loads(unijson.dumps(o, columnar=2, type_table=True), lazy=True), o)
+        self.assertEqual(json.loads(unijson.dumps(o, columnar=10)), json.loads(unijson.dumps(o)))
+
+        # Runs of objects with different attributes are written as they are, encoded once:
+        o = [DefaultConstructor() for _ in range(5)]
+        o[2].a2 = 2
+        stats = unijson.CodecStats()
+        s = unijson.dumps(o, columnar=True, stats=stats)
+        self.assertEqual(json.loads(s)[2], {"__class__": "DefaultConstructor", "__module__": "test_unijson",
+                                            "a1": None, "a2": 2})
+        self.assertEqual(stats.snapshot()["encode"]["test_unijson.DefaultConstructor"]["calls"], 5)
+        self.assertEqual(unijson.loads(s), o)
+
+        # Only the documents with columns are decoded as such:
+        d = {"__runs__": [[1], [2]]}
+        self.assertEqual(unijson.loads(json.dumps(d)), d)
+        self.assertEqual(unijson.loads(json.dumps(d), select=[""]), [d])
+        d = {"__class__": "NothingDefined", "__module__": "test_unijson", "__columns__": {"a1": [1, 2], "a2": [3, 4]}}
+        self.assertNotIsInstance(unijson.loads(json.dumps(d)), list)
+        self.assertEqual(unijson.loads('{"__features__": ["columnar", "unknown"], "__data__": {"__runs__": [[1]]}}'),
+                         {"__features__": ["columnar", "unknown"], "__data__": {"__runs__": [[1]]}})
+
+
+    def test_references(self):
+        root = Node("root")
+        shared = NothingDefined(1, 2)
+        root.children = [Node("c%d" % i, root, [shared]) for i in range(3)]
+        s = unijson.dumps(root, references=True)
+        self.assertEqual(json.loads(s)["__features__"], ["references"])
+        d = json.loads(s)["__data__"]
+        self.assertEqual(d["__id__"], 0)
+        self.assertEqual(d["children"][1]["parent"], {"__ref__": 0})
+        self.assertEqual(d["children"][1]["children"], [{"__ref__": 2}])
+
+        # The shared objects and the cycles are rebuilt:
+        r = unijson.loads(s)
+        self.assertEqual([c.name for c in r.children], ["c0", "c1", "c2"])
+        for c in r.children:
+            self.assertIs(c.parent, r)
+            self.assertIs(c.children[0], r.children[0].children[0])
+        self.assertEqual(r.children[0].children[0], shared)
+
+        # Cycles through slots and with a type table:
+        o = Slotted(None, None)
+        o.a1 = o
+        r = unijson.loads(unijson.dumps([o, o], references=True, type_table=True))
+        self.assertIs(r[0], r[1])
+        self.assertIs(r[0].a1, r[0])
+
+        # Without references, objects are copied and cycles fail:
+        r = unijson.loads(unijson.dumps([shared, shared]))
+        self.assertIsNot(r[0], r[1])
+        self.assertRaises(ValueError, unijson.dumps, root)
+        self.assertRaises(ValueError, unijson.dumps, root, references=True, columnar=True)
+
+        # Lists / dictionaries containing themselves aren't objects that can be referred to:
+        l, d = [1], {"a": 1}
+        l.append(l)
+        d["d"] = d
+        for o in (l, d, [{"a": [d]}], Slotted(l, 2)):
+            self.assertRaises(ValueError, unijson.dumps, o, references=True)
+
+        # Only the documents encoded with references are decoded as such:
+        for d in ({"__ref__": 5}, {"a": {"__ref__": "x"}}, [{"__ref__": 0}, {"__ref__": 0}]):
+            self.assertEqual(unijson.loads(json.dumps(d)), d)
+        self.assertEqual(unijson.loads(unijson.dumps({"__ref__": 0}, references=True)), {"__ref__": 0})
+        self.assertEqual(unijson.loads(unijson.dumps([1, {"__ref__": 0}], references=True)), [1, {"__ref__": 0}])
+        for data in ({"__ref__": 5}, {"a": {"__ref__": "x"}}, [{"__ref__": [1]}]):
+            s = json.dumps({"__features__": ["references"], "__data__": data})
+            self.assertRaises(ValueError, unijson.loads, s)
+
+
+    def test_attributes(self):
+        # Objects using __slots__:
+        d = json.loads(unijson.dumps(Slotted(1, [2])))
+        expected = {"__module__": "test_unijson", "__class__": "Slotted", "a1": 1, "_Slotted__a2": [2]}
+        self.assertDictEqual(d, expected)
+        for o in (Slotted(1, [2]), SlottedChild(1, 2, Slotted(3, None)), SlottedWithDict(1, 2, {"a": 3})):
+            self.assertEqual(unijson.loads(unijson.dumps(o)), o)
+
+        # Slots not set are not encoded:
+        o = SlottedChild(1, 2, 3)
+        del o.a3
+        d = json.loads(unijson.dumps(o))
+        self.assertNotIn("a3", d)
+        self.assertFalse(hasattr(unijson.loads(unijson.dumps(o)), "a3"))
+
+        # Objects using __getstate__() / __setstate__():
+        d = json.loads(unijson.dumps(DefineState(12)))
+        self.assertDictEqual(d, {"__module__": "test_unijson", "__class__": "DefineState", "a1": 12})
+        o = unijson.loads(unijson.dumps(DefineState(12)))
+        self.assertEqual((o.a1, o.cache), (12, "restored"))
+        d = json.loads(unijson.dumps(TupleState(12)))
+        self.assertDictEqual(d, {"__module__": "test_unijson", "__class__": "TupleState", "a1": 12})
+        with self.assertWarns(UserWarning): # __setstate__() expects the tuple
+            self.assertEqual(unijson.loads(unijson.dumps(TupleState(12))), TupleState(12))
+
+
     def test_serialiser(self):
         # Test equality of various objects before and after
         # a round of encoding and decoding.